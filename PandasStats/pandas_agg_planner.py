@@ -0,0 +1,267 @@
+import time
+
+import pandas as pd
+
+from pandas_grouping_sets import first_by_unique_key, grouping_sets_agg
+
+# Rough costs in nanoseconds per row and column, from timing the pandas
+# kernels each strategy uses on 3k- and 60k-row datasets. Only their ratios
+# matter for choosing a plan; the printed estimates show how close they are.
+CALL_NS = 500000      # fixed overhead of one pandas group-by call
+COLUMN_NS = 2000000   # fixed overhead per column of the shared scan and the projection
+SCAN_NS = 35          # one share of the count/sum/sum-of-squares/min/max scan
+MEDIAN_NS = 22        # grouped median
+PROJECTION_NS = 20    # copying a column out of the key-sorted rows
+COUNT_NS = 45         # grouped non-null count
+NUNIQUE_NS = 60       # grouped nunique over object values, plus CHAR_NS per character
+CHAR_NS = 0.5         # hashing cost per character of an object value
+HASH_NS = 25          # hashing a value to 64 bits once, shared by every key set
+HASHED_NUNIQUE_NS = 25
+SORT_NS = 110         # per row and comparison of the object key sort behind projections
+KEY_INDEX_NS = 1000   # per row and key column of the index built over the sorted keys
+
+# Object values at least this long on average are hashed before nunique
+HASH_MIN_CHARS = 32
+
+# Non-null values sampled for a column's average string length
+LENGTH_SAMPLE = 1000
+
+
+class PlanStep:
+    """One aggregation of the plan, with its estimated and (once run) actual cost"""
+
+    def __init__(self, key_set, what, strategy, estimated_ms, note=''):
+        self.key_set = key_set
+        self.what = what
+        self.strategy = strategy
+        self.estimated_ms = estimated_ms
+        self.note = note
+        self.actual_ms = None
+
+    def describe(self):
+        keys = ' + '.join(self.key_set) if self.key_set else '(all sets)'
+        actual = f"{self.actual_ms:8.1f}" if self.actual_ms is not None else '       -'
+        note = f"  ({self.note})" if self.note else ''
+        return f"  {keys:<24} {self.what:<40} {self.strategy:<10} {self.estimated_ms:8.1f} {actual}{note}"
+
+class AggregationPlan:
+    """Strategies for the grouping_sets_describe() statistics, chosen from estimated costs
+
+    Key sets containing the unique key are singleton groups: one key sort of
+    the rows serves every statistic (median, min and max are the value, std
+    is undefined). Elsewhere the mergeable numeric statistics share one scan
+    and per-column nunique is picked by cost: derived from the count for
+    columns that are unique or constant overall, hashed to 64-bit integers
+    first for long free text, exact otherwise. With a budget, the most
+    expensive remaining nunique steps are skipped until the estimate fits.
+    """
+
+    def __init__(self, df, key_sets, numerical_cols, categorical_cols, unique_counts=None, unique_key=None,
+                 budget_ms=None):
+        self.key_sets = [tuple(key_set) for key_set in key_sets]
+        self.numerical_cols = list(numerical_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.unique_key = unique_key
+        self.steps = []
+        self.hashed = {}
+        self.strategies = {}
+        self.unique_overall = set()
+        rows = len(df)
+        unique_counts = unique_counts or {}
+
+        self.singletons = [key_set for key_set in self.key_sets if unique_key and set(unique_key) <= set(key_set)]
+        grouped_sets = [key_set for key_set in self.key_sets if key_set not in self.singletons]
+
+        if self.numerical_cols and grouped_sets:
+            self._add((), 'numeric count/mean/std/min/max', 'scan', len(self.numerical_cols) * (COLUMN_NS + rows * SCAN_NS),
+                      'one pass, coarser sets rolled up')
+        for key_set in self.singletons:
+            sort_ns = rows * max(1, rows.bit_length()) * SORT_NS + rows * len(key_set) * KEY_INDEX_NS
+            columns = len(self.numerical_cols) + len(self._categorical(key_set))
+            self._add(key_set, 'every statistic', 'projection', sort_ns + columns * (COLUMN_NS + rows * PROJECTION_NS),
+                      'singleton groups: one key sort, no group-by')
+
+        # (non-null count, distinct count, average length) per categorical column
+        profiles = {}
+        nunique_steps = []
+        for key_set in grouped_sets:
+            if self.numerical_cols:
+                self._add(key_set, 'numeric median', 'groupby', CALL_NS + rows * len(self.numerical_cols) * MEDIAN_NS)
+            for col in self._categorical(key_set):
+                if col not in profiles:
+                    distinct = unique_counts.get(col)
+                    profiles[col] = (int(df[col].notna().sum()), df[col].nunique() if distinct is None else distinct,
+                                     self._average_length(df[col]))
+                non_null, distinct, length = profiles[col]
+                self._add(key_set, f'{col} count', 'groupby', CALL_NS + rows * COUNT_NS)
+                if distinct == non_null:
+                    strategy, cost, note = 'derived', 0, 'unique overall: nunique = count'
+                    self.unique_overall.add(col)
+                elif distinct <= 1:
+                    strategy, cost, note = 'derived', 0, 'constant overall: nunique = min(count, 1)'
+                elif length >= HASH_MIN_CHARS:
+                    strategy, cost, note = 'hashed', CALL_NS + rows * HASHED_NUNIQUE_NS, f'{length:.0f} chars on average'
+                    if col not in self.hashed:
+                        self.hashed[col] = None
+                        self._add((), f'{col} 64-bit hashes', 'hash', rows * (HASH_NS + CHAR_NS * length),
+                                  'shared by every key set')
+                else:
+                    strategy, cost, note = 'exact', CALL_NS + rows * (NUNIQUE_NS + CHAR_NS * length), f'{distinct} distinct'
+                self.strategies[(key_set, col)] = strategy
+                nunique_steps.append((key_set, col, self._add(key_set, f'{col} nunique', strategy, cost, note)))
+
+        if budget_ms is not None:
+            # Drop the costliest nunique steps until the estimate fits the budget
+            for key_set, col, step in sorted(nunique_steps, key=lambda entry: entry[2].estimated_ms, reverse=True):
+                if self.estimated_ms() <= budget_ms or step.estimated_ms == 0:
+                    break
+                step.strategy, step.note = 'skipped', f'over the {budget_ms:.0f} ms budget'
+                self.strategies[(key_set, col)] = 'skipped'
+
+    def _add(self, key_set, what, strategy, cost_ns, note=''):
+        step = PlanStep(key_set, what, strategy, cost_ns / 1e6, note)
+        self.steps.append(step)
+        return step
+
+    def _categorical(self, key_set):
+        return [col for col in self.categorical_cols if col not in key_set]
+
+    @staticmethod
+    def _average_length(values):
+        sample = values.dropna().head(LENGTH_SAMPLE)
+        return float(sample.astype(str).str.len().mean()) if len(sample) else 0.0
+
+    def estimated_ms(self):
+        return sum(step.estimated_ms for step in self.steps if step.strategy != 'skipped')
+
+    def _timed(self, key_set, what):
+        """Context for timing the step(s) of key_set whose description starts with what"""
+        steps = [step for step in self.steps if step.key_set == key_set and step.what.startswith(what)]
+        return _StepTimer(steps)
+
+    def execute(self, df):
+        """{key_set: DataFrame} shaped like grouping_sets_describe(), recording actual costs"""
+        grouped_sets = [key_set for key_set in self.key_sets if key_set not in self.singletons]
+        mergeable = {}
+        if self.numerical_cols and grouped_sets:
+            with self._timed((), 'numeric'):
+                mergeable = grouping_sets_agg(df, grouped_sets, self.numerical_cols)
+        for col in self.hashed:
+            with self._timed((), f'{col} 64-bit'):
+                values = df[col].dropna()
+                self.hashed[col] = pd.util.hash_pandas_object(values, index=False)
+
+        results = {}
+        for key_set in self.key_sets:
+            if key_set in self.singletons:
+                with self._timed(key_set, 'every'):
+                    results[key_set] = self._singleton(df, key_set)
+            else:
+                results[key_set] = self._grouped(df, key_set, mergeable[key_set] if mergeable else None)
+        return results
+
+    def _singleton(self, df, key_set):
+        keys = list(key_set)
+        group_categorical = self._categorical(key_set)
+        rows = first_by_unique_key(df, keys, self.numerical_cols + group_categorical)
+        parts = {}
+        for col in self.numerical_cols:
+            values = rows[col]
+            as_float = values.astype('float64')
+            stats = {
+                'count': values.notna().astype('int64'),
+                'mean': as_float,
+                'median': as_float,
+                'std': pd.Series(float('nan'), index=rows.index),
+                'min': values,
+                'max': values
+            }
+            for agg in ('count', 'mean', 'median', 'std', 'min', 'max'):
+                parts[(col, agg)] = stats[agg].to_numpy()
+        for col in group_categorical:
+            present = rows[col].notna().astype('int64').to_numpy()
+            parts[(col, 'count')] = present
+            parts[(col, 'nunique')] = present
+        return pd.DataFrame(parts, index=rows.index)
+
+    def _grouped(self, df, key_set, rolled):
+        keys = list(key_set)
+        grouped = df.groupby(keys)
+        columns = {}
+        index = rolled.index if rolled is not None else None
+
+        if self.numerical_cols:
+            with self._timed(key_set, 'numeric median'):
+                medians = grouped[self.numerical_cols].median()
+            if index is None:
+                index = medians.index
+            medians = _same_index(medians, index)
+            for col in self.numerical_cols:
+                for agg in ('count', 'mean', 'median', 'std', 'min', 'max'):
+                    source = medians[col] if agg == 'median' else rolled[(col, agg)]
+                    columns[(col, agg)] = source.to_numpy()
+
+        for col in self._categorical(key_set):
+            with self._timed(key_set, f'{col} count'):
+                count = grouped[col].count()
+            if index is None:
+                index = count.index
+            count = _same_index(count, index)
+            columns[(col, 'count')] = count.to_numpy()
+
+            strategy = self.strategies[(key_set, col)]
+            if strategy == 'skipped':
+                continue
+            with self._timed(key_set, f'{col} nunique'):
+                if strategy == 'derived':
+                    nunique = count if col in self.unique_overall else (count > 0).astype('int64')
+                elif strategy == 'hashed':
+                    hashes = self.hashed[col]
+                    frame = df.loc[hashes.index, keys].assign(_hash=hashes.to_numpy())
+                    nunique = frame.groupby(keys)['_hash'].nunique().reindex(index, fill_value=0)
+                else:
+                    nunique = _same_index(grouped[col].nunique(), index)
+            columns[(col, 'nunique')] = nunique.to_numpy()
+        return pd.DataFrame(columns, index=index)
+
+    def report(self):
+        """The plan as printable lines, with actual costs once executed"""
+        lines = ["Aggregation plan:",
+                 f"  {'key set':<24} {'aggregation':<40} {'strategy':<10} {'est ms':>8} {'act ms':>8}"]
+        lines += [step.describe() for step in self.steps]
+        actual = [step.actual_ms for step in self.steps if step.actual_ms is not None]
+        total_actual = f"{sum(actual):8.1f}" if actual else '       -'
+        lines.append(f"  {'total':<24} {'':<40} {'':<10} {self.estimated_ms():8.1f} {total_actual}")
+        return lines
+
+class _StepTimer:
+    """Adds the elapsed time of a block to every step it covers, split evenly"""
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        for step in self.steps:
+            step.actual_ms = (step.actual_ms or 0.0) + elapsed / len(self.steps)
+        return False
+
+def _same_index(frame, index):
+    """frame aligned to index, checking equality once instead of per column"""
+    if frame is None or frame.index.equals(index):
+        return frame
+    return frame.reindex(index)
+
+def planned_grouping_sets_describe(df, key_sets, numerical_cols, categorical_cols, unique_counts=None,
+                                   unique_key=None, budget_ms=None):
+    """grouping_sets_describe() run through an AggregationPlan; returns (results, plan)
+
+    Without a budget the results hold the same values, except that nunique
+    of hashed columns could undercount on a 64-bit hash collision.
+    """
+    plan = AggregationPlan(df, key_sets, numerical_cols, categorical_cols, unique_counts, unique_key, budget_ms)
+    return plan.execute(df), plan
@@ -0,0 +1,345 @@
+import numpy as np
+import pandas as pd
+
+from pandas_input import read_csv_input
+
+DEFAULT_CHUNKSIZE = 100000
+
+# Distinct values kept per group before its quantiles are only approximated
+DEFAULT_SKETCH_SIZE = 20000
+
+# Chunk partials buffered before they are merged into the running totals
+MERGE_EVERY = 8
+
+# agg() names a lambda '<lambda>', which is the column name the outputs already
+# use, so the mode stays a lambda; the chunked group-by recognises it by identity
+mode_or_nan = lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan
+
+
+def _lerp(low, high, fraction):
+    """numpy's linear interpolation, so exact quantiles match Series.quantile bit for bit"""
+    difference = high - low
+    result = low + difference * fraction
+    upper = fraction >= 0.5
+    result[upper] = high[upper] - difference[upper] * (1 - fraction[upper])
+    return result
+
+def _combined_dtype(dtypes):
+    """The dtype a whole-file read_csv infers for a column read as chunks of these dtypes"""
+    kinds = {dtype.kind for dtype in dtypes}
+    if 'O' in kinds or ('b' in kinds and kinds != {'b'}):
+        return np.dtype(object)
+    if kinds == {'b'}:
+        return np.dtype(bool)
+    return np.result_type(*dtypes)
+
+class ValueCounts:
+    """Mergeable per-group value counts of one column, behind modes and quantiles
+
+    Counts stay exact, and so do the modes and quantiles read from them, until
+    a group holds more than size distinct values. That group is then
+    compressed into size equal-weight centroids (a mergeable quantile sketch
+    in the style of a t-digest) and approximate is set. size=None never
+    compresses. ordered=False keeps values in order of first appearance, the
+    order value_counts() breaks ties in, instead of sorting them.
+    """
+
+    def __init__(self, keys, column, size=DEFAULT_SKETCH_SIZE, ordered=True):
+        self.keys = list(keys)
+        self.column = column
+        self.size = size
+        self.ordered = ordered
+        self.table = None
+        self.pending = []
+        self.approximate = False
+
+    def add(self, chunk):
+        self.pending.append(chunk.groupby(self.keys + [self.column], sort=False).size())
+        if len(self.pending) >= MERGE_EVERY:
+            self._merge()
+
+    def _merge(self):
+        if not self.pending:
+            return
+        parts = ([self.table] if self.table is not None else []) + self.pending
+        self.pending = []
+        levels = list(range(len(self.keys) + 1))
+        table = pd.concat(parts).groupby(level=levels, sort=self.ordered).sum()
+        self.table = self._compress(table) if self.size else table
+
+    def _compress(self, table):
+        frame = self._as_frame(table)
+        if self.keys:
+            sizes = frame.groupby(self.keys, sort=False)['weight'].transform('size')
+        else:
+            sizes = pd.Series(len(frame), index=frame.index)
+        large = sizes > self.size
+        if not large.any():
+            return table
+        self.approximate = True
+
+        # Cut each oversized group into size buckets of equal weight and keep
+        # the weighted mean of every bucket
+        groups = frame[large]
+        weight = groups['weight']
+        before = (groups.groupby(self.keys)['weight'].cumsum() if self.keys else weight.cumsum()) - weight
+        total = groups.groupby(self.keys)['weight'].transform('sum') if self.keys else weight.sum()
+        groups = groups.assign(bucket=before * self.size // total, mass=groups['value'] * weight)
+        centroids = groups.groupby(self.keys + ['bucket']).agg(mass=('mass', 'sum'), weight=('weight', 'sum')).reset_index()
+        centroids['value'] = centroids['mass'] / centroids['weight']
+
+        merged = pd.concat([frame[~large], centroids[self.keys + ['value', 'weight']]])
+        merged = merged.rename(columns={'value': self.column})
+        return merged.set_index(self.keys + [self.column])['weight'].sort_index()
+
+    def _as_frame(self, table):
+        frame = table.rename('weight').reset_index()
+        frame.columns = self.keys + ['value', 'weight']
+        return frame
+
+    def counts(self):
+        """The merged counts, indexed by keys and value"""
+        self._merge()
+        if self.table is None:
+            index = pd.MultiIndex.from_arrays([[]] * (len(self.keys) + 1), names=self.keys + [self.column]) if self.keys else pd.Index([], name=self.column)
+            return pd.Series([], index=index, dtype='int64')
+        return self.table
+
+    def quantile(self, q):
+        """Linear-interpolated quantile per group (a scalar without keys), as Series.quantile computes it"""
+        frame = self._as_frame(self.counts())
+        values = frame['value'].to_numpy(dtype='float64')
+        cumulative = frame['weight'].cumsum().to_numpy()
+        if self.keys:
+            totals = frame.groupby(self.keys)['weight'].sum()
+        else:
+            totals = pd.Series([cumulative[-1]] if len(cumulative) else [], dtype='int64')
+        counts = totals.to_numpy(dtype='float64')
+        offsets = np.cumsum(counts) - counts
+
+        # numpy's virtual index for the linear method
+        position = counts * q + (1 - q) - 1
+        below = np.floor(position)
+        above = np.minimum(below + 1, counts - 1)
+        low = values[np.searchsorted(cumulative, offsets + below, side='right')]
+        high = values[np.searchsorted(cumulative, offsets + above, side='right')]
+        result = _lerp(low, high, position - below)
+        if not self.keys:
+            return result[0] if len(result) else np.nan
+        return pd.Series(result, index=totals.index)
+
+    def mode(self):
+        """Most frequent value per group, the smallest on ties like Series.mode().iloc[0]"""
+        frame = self._as_frame(self.counts())
+        top = frame.loc[frame.groupby(self.keys)['weight'].idxmax()]
+        return top.set_index(self.keys)['value']
+
+class ChunkedCsv:
+    """A CSV summarised chunk by chunk from mergeable partial aggregates
+
+    The first pass settles each column's dtype the way a whole-file read_csv
+    infers it, while collecting per-chunk moments and min/max of the numeric
+    columns and value-count tables of every other column. Numeric columns
+    also get exact value counts (a quantile sketch past sketch_size distinct
+    values) for the describe() percentiles. Group-bys re-read only the
+    columns they need. numeric_columns are coerced with
+    pd.to_numeric(errors='coerce') in every chunk. Memory is bounded by the
+    chunk size and the distinct values, not by the row count.
+    """
+
+    def __init__(self, path, chunksize=DEFAULT_CHUNKSIZE, numeric_columns=(), sketch_size=DEFAULT_SKETCH_SIZE):
+        self.path = path
+        self.chunksize = chunksize
+        self.numeric_columns = list(numeric_columns)
+        self.sketch_size = sketch_size
+        self.rows = 0
+        chunk_dtypes = {}
+        moments = []
+        numeric_counts = {}
+        other_counts = {}
+        numeric_seen = set()
+
+        for chunk in self._read():
+            self.rows += len(chunk)
+            numeric = []
+            for column in chunk.columns:
+                chunk_dtypes.setdefault(column, []).append(chunk[column].dtype)
+                if chunk[column].dtype.kind in 'iuf':
+                    numeric.append(column)
+                    if chunk[column].notna().any():
+                        numeric_seen.add(column)
+                    numeric_counts.setdefault(column, ValueCounts([], column, sketch_size)).add(chunk)
+                else:
+                    other_counts.setdefault(column, ValueCounts([], column, None, ordered=False)).add(chunk)
+            moments.append(self._moments(chunk[numeric]))
+
+        self.dtypes = pd.Series({column: _combined_dtype(dtypes) for column, dtypes in chunk_dtypes.items()},
+                                dtype=object)
+        # A zero-row frame with the settled dtypes, for select_dtypes() and printing
+        self.schema = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in self.dtypes.items()})
+
+        numerical = self.schema.select_dtypes(include=[np.number]).columns
+        self._moments_total = self._merge_moments(moments, numerical)
+        self._quantiles = {column: numeric_counts[column] for column in numerical}
+
+        # Chunks parsed as numbers lost the text of columns that are text overall;
+        # those columns are counted again from a pass that keeps every value as read
+        self._value_counts = other_counts
+        recount = [column for column in self.dtypes.index
+                   if self.dtypes[column] == object and column in numeric_seen]
+        if recount:
+            self._value_counts.update({column: ValueCounts([], column, None, ordered=False) for column in recount})
+            for chunk in read_csv_input(path, usecols=recount, dtype=object, chunksize=chunksize):
+                for column in recount:
+                    self._value_counts[column].add(chunk)
+
+    @property
+    def shape(self):
+        return (self.rows, len(self.dtypes))
+
+    def _read(self, columns=None, dtype=None):
+        for chunk in read_csv_input(self.path, usecols=columns, dtype=dtype, chunksize=self.chunksize):
+            for column in self.numeric_columns:
+                if column in chunk.columns:
+                    chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+            yield chunk
+
+    def chunks(self, columns):
+        """Chunks of the given columns with the dtypes a whole-file read would give them"""
+        dtype = {column: object for column in columns
+                 if self.dtypes[column] == object and column not in self.numeric_columns}
+        for chunk in self._read(columns, dtype):
+            for column in columns:
+                if self.dtypes[column].kind in 'iuf' and chunk[column].dtype != self.dtypes[column]:
+                    chunk[column] = chunk[column].astype(self.dtypes[column])
+            yield chunk
+
+    @staticmethod
+    def _moments(frame):
+        """count/sum/mean/M2/min/max per column of one chunk"""
+        values = frame.astype('float64')
+        mean = values.mean()
+        return pd.DataFrame({
+            'count': values.count(),
+            'sum': values.sum(),
+            'mean': mean,
+            'm2': ((values - mean) ** 2).sum(),
+            'min': values.min(),
+            'max': values.max()
+        })
+
+    @staticmethod
+    def _merge_moments(parts, columns):
+        """Combine per-chunk moments with Chan's parallel update of the mean and M2"""
+        count = pd.Series(0.0, index=columns)
+        total = pd.Series(0.0, index=columns)
+        mean = pd.Series(0.0, index=columns)
+        m2 = pd.Series(0.0, index=columns)
+        minimum = pd.Series(np.nan, index=columns)
+        maximum = pd.Series(np.nan, index=columns)
+        for part in parts:
+            part = part.reindex(columns)
+            part_count = part['count'].fillna(0)
+            merged = count + part_count
+            delta = part['mean'].fillna(0) - mean
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = (mean + delta * part_count / merged).where(merged > 0, 0.0)
+                m2 = m2 + part['m2'].fillna(0) + (delta ** 2 * count * part_count / merged).where(merged > 0, 0.0)
+            total = total + part['sum'].fillna(0)
+            count = merged
+            minimum = np.fmin(minimum, part['min'])
+            maximum = np.fmax(maximum, part['max'])
+        return pd.DataFrame({'count': count, 'sum': total, 'm2': m2, 'min': minimum, 'max': maximum})
+
+    def describe(self, columns):
+        """df[columns].describe() for numeric columns"""
+        moments = self._moments_total
+        stats = {}
+        for column in columns:
+            count, total, m2, minimum, maximum = moments.loc[column, ['count', 'sum', 'm2', 'min', 'max']]
+            quantiles = self._quantiles[column]
+            stats[column] = [
+                count,
+                total / count if count else np.nan,
+                np.sqrt(m2 / (count - 1)) if count > 1 else np.nan,
+                minimum,
+                quantiles.quantile(0.25),
+                quantiles.quantile(0.5),
+                quantiles.quantile(0.75),
+                maximum
+            ]
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], columns=list(columns))
+
+    def approximate_quantiles(self):
+        """Numeric columns whose percentiles come from a compressed sketch"""
+        return [column for column, quantiles in self._quantiles.items() if quantiles.approximate]
+
+    def value_counts(self, column):
+        """df[column].value_counts() for a non-numeric column"""
+        counts = self._value_counts[column].counts()
+        counts.index.name = column
+        return counts.rename('count').sort_values(ascending=False)
+
+    def groupby_agg(self, keys, spec):
+        """df.groupby(keys).agg(spec) from one pass over the columns it uses
+
+        spec maps columns to count, sum, mean, median, first or mode_or_nan
+        (or a list of them), as in groupby().agg().
+        """
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        nested = any(isinstance(funcs, list) for funcs in spec.values())
+        requests = [(column, func) for column, funcs in spec.items()
+                    for func in (funcs if isinstance(funcs, list) else [funcs])]
+        unknown = [func for _, func in requests if func not in ('count', 'sum', 'mean', 'median', 'first', mode_or_nan)]
+        if unknown:
+            raise ValueError(f"Aggregations {unknown} have no mergeable chunked form")
+
+        additive = list(dict.fromkeys(column for column, func in requests if func in ('count', 'sum', 'mean')))
+        firsts = list(dict.fromkeys(column for column, func in requests if func == 'first'))
+        counted = {column: ValueCounts(keys, column, self.sketch_size)
+                   for column, func in requests if func in ('median', mode_or_nan)}
+        sizes, sums, counts, first = [], [], [], []
+        levels = list(range(len(keys)))
+
+        for chunk in self.chunks(list(dict.fromkeys(keys + list(spec)))):
+            grouped = chunk.groupby(keys, sort=False)
+            sizes.append(grouped.size())
+            if additive:
+                counts.append(grouped[additive].count())
+                sums.append(grouped[additive].sum())
+            if firsts:
+                first.append(grouped[firsts].first())
+            for values in counted.values():
+                values.add(chunk)
+            if len(sizes) >= MERGE_EVERY:
+                sizes = [pd.concat(sizes).groupby(level=levels).sum()]
+                if additive:
+                    counts = [pd.concat(counts).groupby(level=levels).sum()]
+                    sums = [pd.concat(sums).groupby(level=levels).sum()]
+                if firsts:
+                    first = [pd.concat(first).groupby(level=levels, sort=False).first()]
+
+        index = pd.concat(sizes).groupby(level=levels).sum().index
+        if additive:
+            counts = pd.concat(counts).groupby(level=levels).sum().reindex(index)
+            sums = pd.concat(sums).groupby(level=levels).sum().reindex(index)
+        if firsts:
+            first = pd.concat(first).groupby(level=levels).first().reindex(index)
+
+        results = {}
+        for column, func in requests:
+            if func == 'count':
+                result = counts[column]
+            elif func == 'sum':
+                result = sums[column]
+            elif func == 'mean':
+                result = sums[column] / counts[column].where(counts[column] > 0)
+            elif func == 'median':
+                result = counted[column].quantile(0.5).reindex(index)
+            elif func == 'first':
+                result = first[column]
+            else:
+                result = counted[column].mode().reindex(index)
+            name = func if isinstance(func, str) else func.__name__
+            results[(column, name) if nested else column] = result
+        return pd.DataFrame(results, index=index)
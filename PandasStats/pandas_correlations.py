@@ -0,0 +1,102 @@
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# The mergeable co-moment accumulators are shared with the pure engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PurePythonStats'))
+from comoments import RANK_BUCKETS_PER_OCTAVE, CoMoments, CorrelationScan, PairMoments
+
+
+def rank_buckets(values):
+    """comoments.rank_bucket of every value of a float array"""
+    buckets = np.floor(np.log2(1.0 + np.abs(values)) * RANK_BUCKETS_PER_OCTAVE).astype('int64')
+    return np.where(values >= 0, buckets, -buckets - 1)
+
+def _pair_moments(x, y):
+    n = len(x)
+    if not n:
+        return PairMoments()
+    mean_x, mean_y = x.mean(), y.mean()
+    dx, dy = x - mean_x, y - mean_y
+    return PairMoments(n, float(mean_x), float(mean_y), float(dx @ dx), float(dy @ dy), float(dx @ dy))
+
+def _rank_table(bx, by):
+    if not len(bx):
+        return Counter()
+    pairs, counts = np.unique(np.stack([bx, by]), axis=1, return_counts=True)
+    return Counter(dict(zip(zip(pairs[0].tolist(), pairs[1].tolist()), counts.tolist())))
+
+def frame_correlations(frame, columns, group_column=None):
+    """CorrelationScan of one frame (a whole dataset or one chunk), computed column-wise
+
+    Matches comoments.correlation_pass: values that are not finite numbers
+    are missing, each pair uses the rows where both are present, and groups
+    keep first-appearance order. Returns None with fewer than two columns.
+    """
+    present = [col for col in columns if col in frame.columns]
+    if len(present) < 2:
+        return None
+    group_column = group_column if group_column in frame.columns else None
+    scan = CorrelationScan(present, group_column)
+    values = frame[present].apply(pd.to_numeric, errors='coerce').astype('float64')
+    values = values.where(np.isfinite(values))
+    keys = None
+    if group_column is not None:
+        # Empty keys group together as '' like the pure engine's rows
+        keys = frame[group_column].astype(object).where(frame[group_column].notna(), '')
+        for group_key in keys.unique():
+            scan.groups[group_key] = CoMoments(present)
+
+    for i, a in enumerate(present):
+        for b in present[i:]:
+            both = (values[a].notna() & values[b].notna()).to_numpy()
+            x, y = values[a].to_numpy()[both], values[b].to_numpy()[both]
+            scan.overall.pairs[(a, b)] = _pair_moments(x, y)
+            if a != b:
+                bx, by = rank_buckets(x), rank_buckets(y)
+                scan.overall.ranks[(a, b)] = _rank_table(bx, by)
+            if keys is None or not both.any():
+                continue
+            pair = pd.DataFrame({'key': keys.to_numpy()[both], 'x': x, 'y': y})
+            grouped = pair.groupby('key', sort=False)
+            means = grouped[['x', 'y']].transform('mean')
+            pair['dxx'] = (pair['x'] - means['x']) ** 2
+            pair['dyy'] = (pair['y'] - means['y']) ** 2
+            pair['dxy'] = (pair['x'] - means['x']) * (pair['y'] - means['y'])
+            sums = grouped.agg(n=('x', 'size'), mean_x=('x', 'mean'), mean_y=('y', 'mean'),
+                               m2_x=('dxx', 'sum'), m2_y=('dyy', 'sum'), c=('dxy', 'sum'))
+            for group_key, row in zip(sums.index, sums.itertuples(index=False)):
+                scan.groups[group_key].pairs[(a, b)] = PairMoments(int(row.n), row.mean_x, row.mean_y,
+                                                                   row.m2_x, row.m2_y, row.c)
+            if a != b:
+                pair['bx'], pair['by'] = bx, by
+                for (group_key, cell_x, cell_y), count in pair.groupby(['key', 'bx', 'by'], sort=False).size().items():
+                    scan.groups[group_key].ranks[(a, b)][(int(cell_x), int(cell_y))] = int(count)
+    return scan
+
+def chunked_correlations(chunked, columns, group_column=None):
+    """frame_correlations over the chunks of a ChunkedCsv, merged in file order"""
+    needed = [col for col in list(columns) + [group_column] if col is not None and col in chunked.dtypes.index]
+    scan = None
+    for chunk in chunked.chunks(list(dict.fromkeys(needed))):
+        part = frame_correlations(chunk, columns, group_column)
+        if part is None:
+            return None
+        if scan is None:
+            scan = part
+        else:
+            scan.merge(part)
+    return scan
+
+def correlations_frame(scan):
+    """One row per column pair, overall and per group (pairs with at least two complete rows)"""
+    columns = ['group', 'column_a', 'column_b', 'pair_count', 'covariance', 'pearson', 'spearman_approx']
+    if scan is None:
+        return pd.DataFrame(columns=columns)
+    rows = [('',) + result for result in scan.overall.results()]
+    for group_key, moments in scan.groups.items():
+        rows += [(f"{scan.group_column}={group_key}",) + result for result in moments.results() if result[2] >= 2]
+    return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+# Aggregations that can be rebuilt from count/sum/mean/M2/min/max partials
+MERGEABLE_AGGS = ('count', 'sum', 'mean', 'std', 'min', 'max')
+
+
+def _partial_aggregates(df, keys, value_cols):
+    """Per-group count/sum/mean/M2 (sum of squared deviations from the mean)/min/max: the mergeable partials"""
+    grouped = df.groupby(keys)[value_cols]
+    partials = {}
+    for stat, values in (('count', grouped.count()), ('sum', grouped.sum()), ('mean', grouped.mean()),
+                         ('var', grouped.var(ddof=0)), ('min', grouped.min()), ('max', grouped.max())):
+        for col in value_cols:
+            partials[f'{col}__{stat}'] = values[col]
+    for col in value_cols:
+        # M2 = n * population variance; groupby var is computed with Welford's update, not from sums of squares
+        partials[f'{col}__m2'] = (partials.pop(f'{col}__var') * partials[f'{col}__count']).fillna(0.0)
+    return pd.DataFrame(partials)[_partial_columns(value_cols)]
+
+def _partial_columns(value_cols):
+    return [f'{col}__{stat}' for col in value_cols for stat in ('count', 'sum', 'mean', 'm2', 'min', 'max')]
+
+def _row_partials(df, keys, value_cols):
+    """Partials for a key that is unique per row: every row is its own group"""
+    rows = df.dropna(subset=keys).sort_values(keys, kind='mergesort')
+    partials = {}
+    for col in value_cols:
+        values = rows[col]
+        partials[f'{col}__count'] = values.notna().astype('int64')
+        partials[f'{col}__sum'] = values.fillna(0)
+        partials[f'{col}__mean'] = values.astype('float64')
+        partials[f'{col}__m2'] = pd.Series(0.0, index=rows.index)
+        partials[f'{col}__min'] = values
+        partials[f'{col}__max'] = values
+    frame = pd.DataFrame(partials, index=rows.index)
+    frame.index = rows.set_index(keys).index
+    return frame
+
+def _rollup_partials(partials, keys, value_cols):
+    """Merge finer partials into coarser groups without touching the raw rows
+
+    M2 is merged with Chan's parallel update generalised to any number of
+    parts: the parts' M2 plus each part's count times the squared distance of
+    its mean from the merged mean. Only deviations are squared, so a large
+    mean with a small spread keeps its precision.
+    """
+    grouped = partials.groupby(level=keys)
+    spec = {}
+    for col in value_cols:
+        spec[f'{col}__count'] = (f'{col}__count', 'sum')
+        spec[f'{col}__sum'] = (f'{col}__sum', 'sum')
+        spec[f'{col}__m2'] = (f'{col}__m2', 'sum')
+        spec[f'{col}__min'] = (f'{col}__min', 'min')
+        spec[f'{col}__max'] = (f'{col}__max', 'max')
+    rolled = grouped.agg(**spec)
+
+    for col in value_cols:
+        count = partials[f'{col}__count']
+        part_mean = partials[f'{col}__mean'].where(count > 0, 0.0)
+        weighted = (part_mean * count).groupby(level=keys)
+        merged_count = rolled[f'{col}__count']
+        rolled[f'{col}__mean'] = weighted.sum() / merged_count.where(merged_count > 0)
+        # Each part's coarser group mean, broadcast back to the part
+        parent_mean = weighted.transform('sum') / count.groupby(level=keys).transform('sum')
+        spread = (count * (part_mean - parent_mean) ** 2).where(count > 0, 0.0)
+        rolled[f'{col}__m2'] += spread.groupby(level=keys).sum()
+    return rolled[_partial_columns(value_cols)]
+
+def _finalize(partials, value_cols, aggs):
+    """Turn partials into (column, agg) results matching groupby().agg()"""
+    results = {}
+    for col in value_cols:
+        count = partials[f'{col}__count']
+        total = partials[f'{col}__sum']
+        variance = partials[f'{col}__m2'] / (count - 1).where(count > 1)
+        stats = {
+            'count': count,
+            'sum': total,
+            'mean': total / count.where(count > 0),
+            'std': np.sqrt(variance.clip(lower=0)),
+            'min': partials[f'{col}__min'],
+            'max': partials[f'{col}__max']
+        }
+        for agg in aggs:
+            results[(col, agg)] = stats[agg]
+    return pd.DataFrame(results, index=partials.index)
+
+def detect_unique_key(df, keys, unique_counts=None, primary_key=None):
+    """Return the columns of keys known to identify each row, or None
+
+    A declared primary_key contained in keys wins. Otherwise any key column
+    whose already-computed unique count equals the row count is unique (and
+    has no missing values), so no extra pass over the data is needed.
+    """
+    if primary_key and set(primary_key) <= set(keys):
+        return list(primary_key)
+    for col in keys:
+        if unique_counts and unique_counts.get(col) == len(df):
+            return [col]
+    return None
+
+def first_by_unique_key(df, keys, value_cols):
+    """Projection/sort equivalent of df.groupby(keys).agg('first') for a unique key
+
+    Every group has one row, so the group-by only reproduces the input. Rows
+    with a missing key are dropped and the result is sorted by the keys, as
+    groupby does by default.
+    """
+    projected = df.dropna(subset=keys)[keys + value_cols]
+    return projected.sort_values(keys, kind='mergesort').set_index(keys)
+
+def grouping_sets_agg(df, key_sets, value_cols, aggs=('count', 'mean', 'std', 'min', 'max'), unique_key=None):
+    """Compute mergeable aggregates for several grouping sets in one scan
+
+    The key set with the most columns is grouped from df once; every other key
+    set must be a subset of it and is rolled up from those partials. Returns
+    {tuple(key_set): DataFrame} with (column, agg) MultiIndex columns, like
+    groupby().agg() with a list of functions.
+
+    When the finest key set contains unique_key its partials are projected
+    straight from the rows and the coarser sets are grouped from df instead.
+    """
+    unknown = [agg for agg in aggs if agg not in MERGEABLE_AGGS]
+    if unknown:
+        raise ValueError(f"Aggregations {unknown} are not mergeable; use one of {MERGEABLE_AGGS}")
+
+    finest = list(max(key_sets, key=len))
+    for key_set in key_sets:
+        missing = [col for col in key_set if col not in finest]
+        if missing:
+            raise ValueError(f"Grouping set {list(key_set)} is not a subset of {finest}: {missing}")
+
+    base = finest
+    if unique_key and set(unique_key) <= set(finest):
+        coarser = set(col for key_set in key_sets if list(key_set) != finest for col in key_set)
+        base = [col for col in finest if col in coarser]
+
+    base_partials = _partial_aggregates(df, base, value_cols) if base else None
+    results = {}
+    for key_set in key_sets:
+        keys = list(key_set)
+        if keys == base:
+            partials = base_partials
+        elif keys == finest:
+            partials = _row_partials(df, keys, value_cols)
+        else:
+            partials = _rollup_partials(base_partials, keys, value_cols)
+        results[tuple(keys)] = _finalize(partials, value_cols, aggs)
+    return results
+
+def grouping_sets_describe(df, key_sets, numerical_cols, categorical_cols, unique_key=None):
+    """Per-group count/mean/median/std/min/max and count/nunique for every key set
+
+    Columns come out in the same order as the PolarStats groupby().agg() specs.
+    Only count/mean/std/min/max are rolled up from one scan. Exact medians and
+    distinct counts cannot be merged from partials, so every key set still
+    runs its own group-by over the rows for median, categorical count and
+    nunique: with two key sets the rows are grouped three times, not once.
+    Key sets containing unique_key are singleton groups and are projected from
+    the rows without any group-by.
+    """
+    mergeable = grouping_sets_agg(df, key_sets, numerical_cols, unique_key=unique_key) if numerical_cols else {}
+    results = {}
+    for key_set in key_sets:
+        keys = list(key_set)
+        group_categorical = [col for col in categorical_cols if col not in keys]
+        singleton = bool(unique_key) and set(unique_key) <= set(keys)
+        parts = {}
+
+        if singleton:
+            rows = first_by_unique_key(df, keys, numerical_cols + group_categorical)
+            medians = rows[numerical_cols].astype('float64')
+            counted = {}
+            for col in group_categorical:
+                present = rows[col].notna().astype('int64')
+                counted[(col, 'count')] = present
+                counted[(col, 'nunique')] = present
+        else:
+            grouped = df.groupby(keys)
+            medians = grouped[numerical_cols].median() if numerical_cols else None
+            counted = grouped[group_categorical].agg(['count', 'nunique']) if group_categorical else {}
+
+        if numerical_cols:
+            rolled = mergeable[tuple(keys)]
+            for col in numerical_cols:
+                for agg in ('count', 'mean', 'median', 'std', 'min', 'max'):
+                    parts[(col, agg)] = medians[col] if agg == 'median' else rolled[(col, agg)]
+
+        for col in group_categorical:
+            parts[(col, 'count')] = counted[(col, 'count')]
+            parts[(col, 'nunique')] = counted[(col, 'nunique')]
+
+        results[tuple(keys)] = pd.DataFrame(parts)
+    return results
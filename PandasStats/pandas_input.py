@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pandas as pd
+
+# Decompression is shared with the pure engine
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PurePythonStats'))
+from compressed_input import compression_of, open_input, resolve_input
+
+
+def read_csv_input(filename, **kwargs):
+    """pd.read_csv(filename, **kwargs) that reads a .csv.gz/.csv.zst copy in place of a missing CSV
+
+    BGZF and multi-frame zstd files are decompressed in parallel while pandas
+    parses them; a plain CSV goes to pd.read_csv unchanged. With chunksize
+    the chunks come from an iterator that closes the stream once exhausted.
+    """
+    path = resolve_input(filename)
+    if compression_of(path) is None:
+        return pd.read_csv(path, **kwargs)
+    stream = open_input(path)
+    if kwargs.get('chunksize'):
+        return _chunks_then_close(pd.read_csv(stream, **kwargs), stream)
+    with stream:
+        return pd.read_csv(stream, **kwargs)
+
+def _chunks_then_close(reader, stream):
+    with stream, reader:
+        yield from reader
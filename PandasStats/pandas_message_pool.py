@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+def pool_messages(frame, column):
+    """Replace a text column of frame, in place, by a Categorical holding each distinct body once
+
+    Rows are factorized on a 64-bit content hash of their text rather than
+    on the text itself, and the categories keep first-appearance order so
+    value_counts() breaks ties as it did on the object column. Every row is
+    then compared with the first body of its hash, so a collision falls back
+    to factorizing the text. Returns False when the column is missing or
+    not text.
+    """
+    if column not in frame.columns or frame[column].dtype != object:
+        return False
+    values = frame[column].to_numpy()
+    present = pd.notna(values)
+    texts = values[present]
+    hash_codes, _ = pd.factorize(pd.util.hash_array(texts, categorize=False))
+    _, first = np.unique(hash_codes, return_index=True)
+    representatives = texts[first]
+    if (texts == representatives[hash_codes]).all():
+        bodies = pd.Index(representatives, dtype=object)
+    else:
+        # Two different bodies share a hash; factorize the text itself instead
+        hash_codes, bodies = pd.factorize(texts)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    codes[present] = hash_codes
+    frame[column] = pd.Categorical.from_codes(codes, categories=bodies)
+    return True
+
+def _content_hashes(series):
+    """(uint64 content hash, has a message) per row of an object or pooled Categorical text column"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        category_hashes = pd.util.hash_array(series.cat.categories.to_numpy(dtype=object), categorize=False)
+        present = codes >= 0
+        hashes = np.zeros(len(codes), dtype=np.uint64)
+        hashes[present] = category_hashes[codes[present]]
+        return hashes, present
+    values = series.to_numpy(dtype=object)
+    present = pd.notna(values)
+    hashes = np.zeros(len(values), dtype=np.uint64)
+    hashes[present] = pd.util.hash_array(values[present], categorize=False)
+    return hashes, present
+
+class CreativeCounts:
+    """Distinct message bodies overall and per group, by content hash, merged chunk by chunk
+
+    Only the hash and UTF-8 size of each distinct body and the distinct
+    (group, hash) pairs are kept, never the text.
+    """
+
+    def __init__(self, group_column):
+        self.group_column = group_column
+        self.message_rows = 0
+        self.message_bytes = 0
+        self.body_bytes = {}
+        self._groups = pd.Index([], dtype=object)
+        self._pairs = pd.DataFrame({'group': pd.Series(dtype=object), 'message': pd.Series(dtype=np.uint64)})
+
+    def add(self, chunk, column):
+        hashes, present = _content_hashes(chunk[column])
+        texts = chunk[column].to_numpy(dtype=object)[present]
+        hashes = hashes[present]
+        self.message_rows += len(hashes)
+        unique_hashes, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+        sizes = np.array([len(texts[i].encode('utf-8')) for i in first], dtype=np.int64)
+        self.message_bytes += int((sizes * counts).sum())
+        for message, size in zip(unique_hashes.tolist(), sizes.tolist()):
+            self.body_bytes.setdefault(message, size)
+
+        groups = chunk[self.group_column].to_numpy(dtype=object)
+        self._groups = self._groups.append(pd.Index(pd.unique(groups))).unique()
+        pairs = pd.DataFrame({'group': groups[present], 'message': hashes}).drop_duplicates()
+        self._pairs = pd.concat([self._pairs, pairs], ignore_index=True).drop_duplicates()
+
+    def distinct_messages(self):
+        return len(self.body_bytes)
+
+    def pooled_bytes(self):
+        return sum(self.body_bytes.values())
+
+    def dedup_ratio(self):
+        """Rows holding a message per distinct message body"""
+        return self.message_rows / len(self.body_bytes) if self.body_bytes else None
+
+    def per_group(self):
+        """Distinct messages per group, groups in first-appearance order"""
+        counts = self._pairs.groupby('group', sort=False)['message'].nunique()
+        return counts.reindex(self._groups, fill_value=0).rename_axis(self.group_column).rename('distinct_creatives')
@@ -0,0 +1,63 @@
+import pandas as pd
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+
+# infer_dtype() kinds of object columns that Arrow cannot store as one type
+_MIXED_KINDS = ('mixed', 'mixed-integer')
+
+
+def output_filename(stem, output_format='csv'):
+    """Return the file name an analysis table is written to"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; choose one of {OUTPUT_FORMATS}")
+    return f"{stem}.{output_format}"
+
+def _is_mixed(values):
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in _MIXED_KINDS
+
+def _as_text(values):
+    """values (a Series or Index) with every non-null element written as its CSV text"""
+    return values.where(values.isna(), values.astype(str))
+
+def arrow_safe(df):
+    """df with object columns and index levels of mixed types (say bools and strings) cast to strings
+
+    A column like most_frequent mixes the values of many input columns;
+    Arrow needs one type per column, and the strings match the CSV output.
+    """
+    mixed = [col for col in df.columns if _is_mixed(df[col])]
+    levels = [df.index.get_level_values(i) for i in range(df.index.nlevels)]
+    if not mixed and not any(_is_mixed(level) for level in levels):
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = _as_text(df[col])
+    levels = [_as_text(level) if _is_mixed(level) else level for level in levels]
+    df.index = levels[0] if len(levels) == 1 else pd.MultiIndex.from_arrays(levels, names=df.index.names)
+    return df
+
+def save_frame(df, stem, output_format='csv', index=True):
+    """Write an analysis DataFrame as CSV, zstd Parquet or Arrow IPC and return the file name
+
+    Parquet and Arrow keep the column dtypes (and the index when index=True),
+    so reading the results back needs no re-parsing. Object columns mixing
+    types are written as their CSV text.
+    """
+    path = output_filename(stem, output_format)
+    if output_format == 'csv':
+        df.to_csv(path, index=index)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.feather
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need pyarrow (pip install pyarrow)")
+
+    table = pa.Table.from_pandas(arrow_safe(df), preserve_index=index)
+    if output_format == 'parquet':
+        import pyarrow.parquet
+        pa.parquet.write_table(table, path, compression='zstd')
+    else:
+        pa.feather.write_feather(table, path, compression='zstd')
+    return path
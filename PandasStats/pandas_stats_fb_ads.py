@@ -1,62 +1,102 @@
+import argparse
+
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
+
+parser = argparse.ArgumentParser(description="Analyze the Facebook Ads dataset with pandas")
+parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                    help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+parser.add_argument('--chunksize', type=int, default=None,
+                    help="Read the CSV this many rows at a time and merge partial aggregates, bounding memory")
+parser.add_argument('--correlations', action='store_true',
+                    help="Also save covariance, Pearson and approximate Spearman correlations, overall and per group")
+parser.add_argument('--creatives', action='store_true',
+                    help="Also report the message dedup ratio and save the distinct creatives per page_id")
+args = parser.parse_args()
+
+# Heavy imports come after argument parsing so --help returns immediately
 import pandas as pd
 import numpy as np
 
-# Load the dataset
-df = pd.read_csv('2024_fb_ads_president_scored_anon.csv')
+from pandas_chunked import ChunkedCsv, mode_or_nan
+from pandas_correlations import chunked_correlations, correlations_frame, frame_correlations
+from pandas_grouping_sets import detect_unique_key, first_by_unique_key
+from pandas_input import read_csv_input
+from pandas_message_pool import CreativeCounts, pool_messages
+
+# Load the dataset (or its .csv.gz/.csv.zst copy), or summarise it chunk by chunk
+if args.chunksize:
+    chunked = ChunkedCsv('2024_fb_ads_president_scored_anon.csv', args.chunksize)
+    schema, shape = chunked.schema, chunked.shape
+else:
+    df = read_csv_input('2024_fb_ads_president_scored_anon.csv')
+    # Ads repeating a creative share one copy of its text
+    pool_messages(df, 'illuminating_scored_message')
+    schema, shape = df, df.shape
 
 print("="*60)
 print("FACEBOOK ADS DATASET ANALYSIS")
 print("="*60)
 
 # Basic dataset information
-print(f"Dataset shape: {df.shape}")
-print(f"Number of rows: {len(df)}")
-print(f"Number of columns: {len(df.columns)}")
+print(f"Dataset shape: {shape}")
+print(f"Number of rows: {shape[0]}")
+print(f"Number of columns: {shape[1]}")
 
 # 1. Numerical Analysis
 print("\n1. NUMERICAL DATA ANALYSIS")
-numerical_cols = df.select_dtypes(include=[np.number]).columns
-numerical_stats = df[numerical_cols].describe()
+numerical_cols = schema.select_dtypes(include=[np.number]).columns
+numerical_stats = chunked.describe(numerical_cols) if args.chunksize else df[numerical_cols].describe()
 print(numerical_stats)
+if args.chunksize and chunked.approximate_quantiles():
+    print(f"Percentiles estimated from quantile sketches: {chunked.approximate_quantiles()}")
 
 # Save numerical analysis
-numerical_stats.to_csv('fb_ads_numeric_analysis.csv')
+save_frame(numerical_stats, 'fb_ads_numeric_analysis', args.output_format)
 
 # 2. Categorical Analysis
 print("\n2. CATEGORICAL DATA ANALYSIS")
-categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+categorical_cols = schema.select_dtypes(include=['object', 'category']).columns
 categorical_summary = []
 
 for col in categorical_cols:
-    if col in df.columns:
-        value_counts = df[col].value_counts()
+    if col in schema.columns:
+        if args.chunksize:
+            value_counts = chunked.value_counts(col)
+            unique_count, total_records = len(value_counts), int(value_counts.sum())
+        else:
+            value_counts = df[col].value_counts()
+            unique_count, total_records = df[col].nunique(), len(df[col].dropna())
         categorical_summary.append({
             'column': col,
-            'unique_count': df[col].nunique(),
+            'unique_count': unique_count,
             'most_frequent': value_counts.index[0] if len(value_counts) > 0 else None,
             'most_frequent_count': value_counts.iloc[0] if len(value_counts) > 0 else 0,
-            'total_records': len(df[col].dropna())
+            'total_records': total_records
         })
 
 categorical_analysis = pd.DataFrame(categorical_summary)
 print(categorical_analysis)
 
 # Save categorical analysis
-categorical_analysis.to_csv('fb_ads_categorical_analysis.csv', index=False)
+save_frame(categorical_analysis, 'fb_ads_categorical_analysis', args.output_format, index=False)
 
 # 3. Aggregation by page_id
 print("\n3. AGGREGATION BY PAGE_ID")
-page_agg = df.groupby('page_id').agg({
+page_agg_dict = {
     'ad_id': 'count',
     'estimated_audience_size': ['mean', 'median', 'sum'],
     'estimated_impressions': ['mean', 'median', 'sum'],
     'estimated_spend': ['mean', 'median', 'sum'],
-    'advocacy_msg_type_illuminating': lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan,
-    'issue_msg_type_illuminating': lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan,
+    'advocacy_msg_type_illuminating': mode_or_nan,
+    'issue_msg_type_illuminating': mode_or_nan,
     'covid_topic_illuminating': 'mean',
     'economy_topic_illuminating': 'mean',
     'education_topic_illuminating': 'mean'
-}).round(2)
+}
+if args.chunksize:
+    page_agg = chunked.groupby_agg('page_id', page_agg_dict).round(2)
+else:
+    page_agg = df.groupby('page_id').agg(page_agg_dict).round(2)
 
 # Flatten column names
 page_agg.columns = ['_'.join(col).strip() for col in page_agg.columns.values]
@@ -66,11 +106,11 @@ print(f"Page-level aggregation shape: {page_agg.shape}")
 print(page_agg.head())
 
 # Save page aggregation
-page_agg.to_csv('fb_ads_page_id.csv')
+save_frame(page_agg, 'fb_ads_page_id', args.output_format)
 
 # 4. Aggregation by page_id and ad_id
 print("\n4. AGGREGATION BY PAGE_ID AND AD_ID")
-ad_agg = df.groupby(['page_id', 'ad_id']).agg({
+ad_agg_dict = {
     'estimated_audience_size': 'first',
     'estimated_impressions': 'first',
     'estimated_spend': 'first',
@@ -83,18 +123,65 @@ ad_agg = df.groupby(['page_id', 'ad_id']).agg({
     'environment_topic_illuminating': 'first',
     'incivility_illuminating': 'first',
     'fraud_illuminating': 'first'
-}).round(2)
+}
+
+# With a unique key every group is a single row, so 'first' is just a
+# projection sorted by the keys
+unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_summary}
+if args.chunksize:
+    ad_agg = chunked.groupby_agg(['page_id', 'ad_id'], ad_agg_dict).round(2)
+elif detect_unique_key(df, ['page_id', 'ad_id'], unique_counts):
+    ad_agg = first_by_unique_key(df, ['page_id', 'ad_id'], list(ad_agg_dict)).round(2)
+else:
+    ad_agg = df.groupby(['page_id', 'ad_id']).agg(ad_agg_dict).round(2)
 
 print(f"Ad-level aggregation shape: {ad_agg.shape}")
 print(ad_agg.head())
 
 # Save ad aggregation
-ad_agg.to_csv('fb_ads_page_id_ad_id.csv')
+save_frame(ad_agg, 'fb_ads_page_id_ad_id', args.output_format)
+
+# 5. Correlations between the engagement/spend metrics
+if args.correlations:
+    print("\n5. CORRELATIONS")
+    correlation_columns = ['estimated_spend', 'estimated_impressions', 'estimated_audience_size']
+    # One pass of mergeable co-moments, over the chunks when reading chunk by chunk
+    if args.chunksize:
+        correlations = chunked_correlations(chunked, correlation_columns, 'page_id')
+    else:
+        correlations = frame_correlations(df, correlation_columns, 'page_id')
+    correlation_table = correlations_frame(correlations)
+    print(correlation_table[correlation_table['group'] == ''].drop(columns='group').to_string(index=False))
+    
+    # Save correlations
+    save_frame(correlation_table, 'fb_ads_correlations', args.output_format, index=False)
+
+# 6. Distinct creatives per page, counted by message content hash
+if args.creatives:
+    print("\n6. CREATIVES")
+    creatives = CreativeCounts('page_id')
+    if args.chunksize:
+        for chunk in chunked.chunks(['page_id', 'illuminating_scored_message']):
+            creatives.add(chunk, 'illuminating_scored_message')
+    else:
+        creatives.add(df, 'illuminating_scored_message')
+    print(f"{creatives.message_rows} rows with a message, {creatives.distinct_messages()} distinct messages "
+          f"(dedup ratio {creatives.dedup_ratio() or 0:.2f}x, {creatives.message_bytes / (1024 * 1024):.2f} MB of text "
+          f"in {creatives.pooled_bytes() / (1024 * 1024):.2f} MB of distinct bodies)")
+    creatives_table = creatives.per_group().reset_index()
+    print(creatives_table['distinct_creatives'].describe())
+    
+    # Save distinct creatives per page
+    save_frame(creatives_table, 'fb_ads_creatives', args.output_format, index=False)
 
 print("\n" + "="*60)
 print("ANALYSIS COMPLETE - FILES SAVED:")
-print("- fb_ads_numeric_analysis.csv")
-print("- fb_ads_categorical_analysis.csv")
-print("- fb_ads_page_id.csv")
-print("- fb_ads_page_id_ad_id.csv")
+print(f"- {output_filename('fb_ads_numeric_analysis', args.output_format)}")
+print(f"- {output_filename('fb_ads_categorical_analysis', args.output_format)}")
+print(f"- {output_filename('fb_ads_page_id', args.output_format)}")
+print(f"- {output_filename('fb_ads_page_id_ad_id', args.output_format)}")
+if args.correlations:
+    print(f"- {output_filename('fb_ads_correlations', args.output_format)}")
+if args.creatives:
+    print(f"- {output_filename('fb_ads_creatives', args.output_format)}")
 print("="*60)
\ No newline at end of file
@@ -1,17 +1,24 @@
-import pandas as pd
-import numpy as np
+import argparse
 
-# Load the dataset
-df = pd.read_csv('2024_fb_posts_president_scored_anon.csv')
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
 
-print("="*60)
-print("FACEBOOK POSTS DATASET ANALYSIS")
-print("="*60)
+parser = argparse.ArgumentParser(description="Analyze the Facebook Posts dataset with pandas")
+parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                    help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+parser.add_argument('--chunksize', type=int, default=None,
+                    help="Read the CSV this many rows at a time and merge partial aggregates, bounding memory")
+parser.add_argument('--correlations', action='store_true',
+                    help="Also save covariance, Pearson and approximate Spearman correlations, overall and per group")
+args = parser.parse_args()
 
-# Basic dataset information
-print(f"Dataset shape: {df.shape}")
-print(f"Number of rows: {len(df)}")
-print(f"Number of columns: {len(df.columns)}")
+# Heavy imports come after argument parsing so --help returns immediately
+import pandas as pd
+import numpy as np
+
+from pandas_chunked import ChunkedCsv, mode_or_nan
+from pandas_correlations import chunked_correlations, correlations_frame, frame_correlations
+from pandas_grouping_sets import detect_unique_key, first_by_unique_key
+from pandas_input import read_csv_input
 
 # Convert numeric columns that might be stored as strings
 numeric_columns = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views', 
@@ -19,43 +26,66 @@ numeric_columns = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Vi
                   'education_topic_illuminating', 'environment_topic_illuminating',
                   'incivility_illuminating', 'fraud_illuminating']
 
-for col in numeric_columns:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+# Load the dataset (or its .csv.gz/.csv.zst copy), or summarise it chunk by chunk
+if args.chunksize:
+    chunked = ChunkedCsv('2024_fb_posts_president_scored_anon.csv', args.chunksize, numeric_columns)
+    schema, shape = chunked.schema, chunked.shape
+else:
+    df = read_csv_input('2024_fb_posts_president_scored_anon.csv')
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    schema, shape = df, df.shape
+
+print("="*60)
+print("FACEBOOK POSTS DATASET ANALYSIS")
+print("="*60)
+
+# Basic dataset information
+print(f"Dataset shape: {shape}")
+print(f"Number of rows: {shape[0]}")
+print(f"Number of columns: {shape[1]}")
 
 print("\nData types after conversion:")
-print(df.dtypes)
+print(schema.dtypes)
 
 # 1. Numerical Analysis
 print("\n1. NUMERICAL DATA ANALYSIS")
-numerical_cols = df.select_dtypes(include=[np.number]).columns
-numerical_stats = df[numerical_cols].describe()
+numerical_cols = schema.select_dtypes(include=[np.number]).columns
+numerical_stats = chunked.describe(numerical_cols) if args.chunksize else df[numerical_cols].describe()
 print(numerical_stats)
+if args.chunksize and chunked.approximate_quantiles():
+    print(f"Percentiles estimated from quantile sketches: {chunked.approximate_quantiles()}")
 
 # Save numerical analysis
-numerical_stats.to_csv('fb_posts_numeric_analysis.csv')
+save_frame(numerical_stats, 'fb_posts_numeric_analysis', args.output_format)
 
 # 2. Categorical Analysis
 print("\n2. CATEGORICAL DATA ANALYSIS")
-categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+categorical_cols = schema.select_dtypes(include=['object', 'category']).columns
 categorical_summary = []
 
 for col in categorical_cols:
-    if col in df.columns:
-        value_counts = df[col].value_counts()
+    if col in schema.columns:
+        if args.chunksize:
+            value_counts = chunked.value_counts(col)
+            unique_count, total_records = len(value_counts), int(value_counts.sum())
+        else:
+            value_counts = df[col].value_counts()
+            unique_count, total_records = df[col].nunique(), len(df[col].dropna())
         categorical_summary.append({
             'column': col,
-            'unique_count': df[col].nunique(),
+            'unique_count': unique_count,
             'most_frequent': value_counts.index[0] if len(value_counts) > 0 else None,
             'most_frequent_count': value_counts.iloc[0] if len(value_counts) > 0 else 0,
-            'total_records': len(df[col].dropna())
+            'total_records': total_records
         })
 
 categorical_analysis = pd.DataFrame(categorical_summary)
 print(categorical_analysis)
 
 # Save categorical analysis
-categorical_analysis.to_csv('fb_posts_categorical_analysis.csv', index=False)
+save_frame(categorical_analysis, 'fb_posts_categorical_analysis', args.output_format, index=False)
 
 # 3. Aggregation by Facebook_Id
 print("\n3. AGGREGATION BY FACEBOOK_ID")
@@ -68,24 +98,27 @@ agg_dict = {
 # Add numeric columns with proper aggregation
 numeric_interaction_cols = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views']
 for col in numeric_interaction_cols:
-    if col in df.columns:
+    if col in schema.columns:
         agg_dict[col] = ['mean', 'median', 'sum']
 
 # Add categorical columns with mode calculation
 categorical_mode_cols = ['advocacy_msg_type_illuminating', 'issue_msg_type_illuminating']
 for col in categorical_mode_cols:
-    if col in df.columns:
-        agg_dict[col] = lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan
+    if col in schema.columns:
+        agg_dict[col] = mode_or_nan
 
 # Add binary/numeric topic columns with mean
 topic_cols = ['covid_topic_illuminating', 'economy_topic_illuminating', 'education_topic_illuminating',
               'environment_topic_illuminating', 'incivility_illuminating', 'fraud_illuminating']
 for col in topic_cols:
-    if col in df.columns and df[col].dtype in ['int64', 'float64']:
+    if col in schema.columns and schema[col].dtype in ['int64', 'float64']:
         agg_dict[col] = 'mean'
 
 try:
-    Facebook_Id_agg = df.groupby('Facebook_Id').agg(agg_dict).round(2)
+    if args.chunksize:
+        Facebook_Id_agg = chunked.groupby_agg('Facebook_Id', agg_dict).round(2)
+    else:
+        Facebook_Id_agg = df.groupby('Facebook_Id').agg(agg_dict).round(2)
     
     # Flatten column names
     Facebook_Id_agg.columns = ['_'.join(col).strip() if isinstance(col, tuple) else col 
@@ -96,14 +129,14 @@ try:
     print(Facebook_Id_agg.head())
     
     # Save page aggregation
-    Facebook_Id_agg.to_csv('fb_posts_Facebook_Id_agg.csv')
+    save_frame(Facebook_Id_agg, 'fb_posts_Facebook_Id_agg', args.output_format)
     
 except Exception as e:
     print(f"Error in Facebook_Id aggregation: {e}")
     print("Column data types:")
     for col in agg_dict.keys():
-        if col in df.columns:
-            print(f"{col}: {df[col].dtype}")
+        if col in schema.columns:
+            print(f"{col}: {schema[col].dtype}")
 
 # 4. Aggregation by Facebook_Id and post_id
 print("\n4. AGGREGATION BY FACEBOOK_ID AND POST_ID")
@@ -116,25 +149,51 @@ post_agg_cols = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post View
                  'environment_topic_illuminating', 'incivility_illuminating', 'fraud_illuminating']
 
 # Filter to only include columns that exist in the dataframe
-existing_cols = [col for col in post_agg_cols if col in df.columns]
+existing_cols = [col for col in post_agg_cols if col in schema.columns]
 post_agg_dict = {col: 'first' for col in existing_cols}
 
+# With a unique key every group is a single row, so 'first' is just a
+# projection sorted by the keys
+unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_summary}
+
 try:
-    Facebook_Id_post_id_agg = df.groupby(['Facebook_Id', 'post_id']).agg(post_agg_dict).round(2)
+    if args.chunksize:
+        Facebook_Id_post_id_agg = chunked.groupby_agg(['Facebook_Id', 'post_id'], post_agg_dict).round(2)
+    elif detect_unique_key(df, ['Facebook_Id', 'post_id'], unique_counts):
+        Facebook_Id_post_id_agg = first_by_unique_key(df, ['Facebook_Id', 'post_id'], existing_cols).round(2)
+    else:
+        Facebook_Id_post_id_agg = df.groupby(['Facebook_Id', 'post_id']).agg(post_agg_dict).round(2)
     
     print(f"Facebook_Id_post_id-level aggregation shape: {Facebook_Id_post_id_agg.shape}")
     print(Facebook_Id_post_id_agg.head())
     
     # Save post aggregation
-    Facebook_Id_post_id_agg.to_csv('fb_posts_Facebook_Id_post_id_agg.csv')
+    save_frame(Facebook_Id_post_id_agg, 'fb_posts_Facebook_Id_post_id_agg', args.output_format)
     
 except Exception as e:
     print(f"Error in Facebook_Id_post_id aggregation: {e}")
 
+# 5. Correlations between the engagement/spend metrics
+if args.correlations:
+    print("\n5. CORRELATIONS")
+    correlation_columns = ['Likes', 'Comments', 'Shares', 'Post Views']
+    # One pass of mergeable co-moments, over the chunks when reading chunk by chunk
+    if args.chunksize:
+        correlations = chunked_correlations(chunked, correlation_columns, 'Facebook_Id')
+    else:
+        correlations = frame_correlations(df, correlation_columns, 'Facebook_Id')
+    correlation_table = correlations_frame(correlations)
+    print(correlation_table[correlation_table['group'] == ''].drop(columns='group').to_string(index=False))
+    
+    # Save correlations
+    save_frame(correlation_table, 'fb_posts_correlations', args.output_format, index=False)
+
 print("\n" + "="*60)
 print("ANALYSIS COMPLETE - FILES SAVED:")
-print("- fb_posts_numeric_analysis.csv")
-print("- fb_posts_categorical_analysis.csv")
-print("- fb_posts_Facebook_Id_agg.csv")
-print("- fb_posts_Facebook_Id_post_id_agg.csv")
+print(f"- {output_filename('fb_posts_numeric_analysis', args.output_format)}")
+print(f"- {output_filename('fb_posts_categorical_analysis', args.output_format)}")
+print(f"- {output_filename('fb_posts_Facebook_Id_agg', args.output_format)}")
+print(f"- {output_filename('fb_posts_Facebook_Id_post_id_agg', args.output_format)}")
+if args.correlations:
+    print(f"- {output_filename('fb_posts_correlations', args.output_format)}")
 print("="*60)
\ No newline at end of file
@@ -1,64 +1,99 @@
+import argparse
+
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
+
+parser = argparse.ArgumentParser(description="Analyze the Twitter Posts dataset with pandas")
+parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                    help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+parser.add_argument('--chunksize', type=int, default=None,
+                    help="Read the CSV this many rows at a time and merge partial aggregates, bounding memory")
+parser.add_argument('--correlations', action='store_true',
+                    help="Also save covariance, Pearson and approximate Spearman correlations, overall and per group")
+args = parser.parse_args()
+
+# Heavy imports come after argument parsing so --help returns immediately
 import pandas as pd
 import numpy as np
 
-# Load the dataset
-df = pd.read_csv('2024_tw_posts_president_scored_anon.csv')
+from pandas_chunked import ChunkedCsv, mode_or_nan
+from pandas_correlations import chunked_correlations, correlations_frame, frame_correlations
+from pandas_grouping_sets import detect_unique_key, first_by_unique_key
+from pandas_input import read_csv_input
+
+# Load the dataset (or its .csv.gz/.csv.zst copy), or summarise it chunk by chunk
+if args.chunksize:
+    chunked = ChunkedCsv('2024_tw_posts_president_scored_anon.csv', args.chunksize)
+    schema, shape = chunked.schema, chunked.shape
+else:
+    df = read_csv_input('2024_tw_posts_president_scored_anon.csv')
+    schema, shape = df, df.shape
 
 print("="*60)
 print("TWITTER POSTS DATASET ANALYSIS")
 print("="*60)
 
 # Basic dataset information
-print(f"Dataset shape: {df.shape}")
-print(f"Number of rows: {len(df)}")
-print(f"Number of columns: {len(df.columns)}")
+print(f"Dataset shape: {shape}")
+print(f"Number of rows: {shape[0]}")
+print(f"Number of columns: {shape[1]}")
 
 # 1. Numerical Analysis
 print("\n1. NUMERICAL DATA ANALYSIS")
-numerical_cols = df.select_dtypes(include=[np.number]).columns
-numerical_stats = df[numerical_cols].describe()
+numerical_cols = schema.select_dtypes(include=[np.number]).columns
+numerical_stats = chunked.describe(numerical_cols) if args.chunksize else df[numerical_cols].describe()
 print(numerical_stats)
+if args.chunksize and chunked.approximate_quantiles():
+    print(f"Percentiles estimated from quantile sketches: {chunked.approximate_quantiles()}")
 
 # Save numerical analysis
-numerical_stats.to_csv('twitter_posts_numeric_analysis.csv')
+save_frame(numerical_stats, 'twitter_posts_numeric_analysis', args.output_format)
 
 # 2. Categorical Analysis
 print("\n2. CATEGORICAL DATA ANALYSIS")
-categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+categorical_cols = schema.select_dtypes(include=['object', 'category']).columns
 categorical_summary = []
 
 for col in categorical_cols:
-    if col in df.columns:
-        value_counts = df[col].value_counts()
+    if col in schema.columns:
+        if args.chunksize:
+            value_counts = chunked.value_counts(col)
+            unique_count, total_records = len(value_counts), int(value_counts.sum())
+        else:
+            value_counts = df[col].value_counts()
+            unique_count, total_records = df[col].nunique(), len(df[col].dropna())
         categorical_summary.append({
             'column': col,
-            'unique_count': df[col].nunique(),
+            'unique_count': unique_count,
             'most_frequent': value_counts.index[0] if len(value_counts) > 0 else None,
             'most_frequent_count': value_counts.iloc[0] if len(value_counts) > 0 else 0,
-            'total_records': len(df[col].dropna())
+            'total_records': total_records
         })
 
 categorical_analysis = pd.DataFrame(categorical_summary)
 print(categorical_analysis)
 
 # Save categorical analysis
-categorical_analysis.to_csv('twitter_posts_categorical_analysis.csv', index=False)
+save_frame(categorical_analysis, 'twitter_posts_categorical_analysis', args.output_format, index=False)
 
 # 3. Aggregation by source
 print("\n3. AGGREGATION BY SOURCE")
-source_agg = df.groupby('source').agg({
+source_agg_dict = {
     'id': 'count',
     'retweetCount': ['mean', 'median', 'sum'],
     'replyCount': ['mean', 'median', 'sum'],
     'likeCount': ['mean', 'median', 'sum'],
     'quoteCount': ['mean', 'median', 'sum'],
     'viewCount': ['mean', 'median', 'sum'],
-    'advocacy_msg_type_illuminating': lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan,
-    'issue_msg_type_illuminating': lambda x: x.mode().iloc[0] if not x.mode().empty else np.nan,
+    'advocacy_msg_type_illuminating': mode_or_nan,
+    'issue_msg_type_illuminating': mode_or_nan,
     'covid_topic_illuminating': 'mean',
     'economy_topic_illuminating': 'mean',
     'education_topic_illuminating': 'mean'
-}).round(2)
+}
+if args.chunksize:
+    source_agg = chunked.groupby_agg('source', source_agg_dict).round(2)
+else:
+    source_agg = df.groupby('source').agg(source_agg_dict).round(2)
 
 # Flatten column names
 source_agg.columns = ['_'.join(col).strip() for col in source_agg.columns.values]
@@ -68,11 +103,11 @@ print(f"Source-level aggregation shape: {source_agg.shape}")
 print(source_agg.head())
 
 # Save source aggregation
-source_agg.to_csv('twitter_posts_source.csv')
+save_frame(source_agg, 'twitter_posts_source', args.output_format)
 
 # 4. Aggregation by source and id
 print("\n4. AGGREGATION BY SOURCE AND ID")
-source_id_agg = df.groupby(['source', 'id']).agg({
+source_id_agg_dict = {
     'retweetCount': 'first',
     'replyCount': 'first',
     'likeCount': 'first',
@@ -87,18 +122,45 @@ source_id_agg = df.groupby(['source', 'id']).agg({
     'environment_topic_illuminating': 'first',
     'incivility_illuminating': 'first',
     'fraud_illuminating': 'first'
-}).round(2)
+}
+
+# With a unique key every group is a single row, so 'first' is just a
+# projection sorted by the keys
+unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_summary}
+if args.chunksize:
+    source_id_agg = chunked.groupby_agg(['source', 'id'], source_id_agg_dict).round(2)
+elif detect_unique_key(df, ['source', 'id'], unique_counts):
+    source_id_agg = first_by_unique_key(df, ['source', 'id'], list(source_id_agg_dict)).round(2)
+else:
+    source_id_agg = df.groupby(['source', 'id']).agg(source_id_agg_dict).round(2)
 
 print(f"Post-level aggregation shape: {source_id_agg.shape}")
 print(source_id_agg.head())
 
 # Save post aggregation
-source_id_agg.to_csv('twitter_posts_page_id_ad_id.csv')
+save_frame(source_id_agg, 'twitter_posts_page_id_ad_id', args.output_format)
+
+# 5. Correlations between the engagement/spend metrics
+if args.correlations:
+    print("\n5. CORRELATIONS")
+    correlation_columns = ['retweetCount', 'replyCount', 'likeCount', 'quoteCount', 'viewCount', 'bookmarkCount']
+    # One pass of mergeable co-moments, over the chunks when reading chunk by chunk
+    if args.chunksize:
+        correlations = chunked_correlations(chunked, correlation_columns, 'source')
+    else:
+        correlations = frame_correlations(df, correlation_columns, 'source')
+    correlation_table = correlations_frame(correlations)
+    print(correlation_table[correlation_table['group'] == ''].drop(columns='group').to_string(index=False))
+    
+    # Save correlations
+    save_frame(correlation_table, 'twitter_posts_correlations', args.output_format, index=False)
 
 print("\n" + "="*60)
 print("ANALYSIS COMPLETE - FILES SAVED:")
-print("- twitter_posts_numeric_analysis.csv")
-print("- twitter_posts_categorical_analysis.csv")
-print("- twitter_posts_source.csv")
-print("- twitter_posts_source_id.csv")
+print(f"- {output_filename('twitter_posts_numeric_analysis', args.output_format)}")
+print(f"- {output_filename('twitter_posts_categorical_analysis', args.output_format)}")
+print(f"- {output_filename('twitter_posts_source', args.output_format)}")
+print(f"- {output_filename('twitter_posts_source_id', args.output_format)}")
+if args.correlations:
+    print(f"- {output_filename('twitter_posts_correlations', args.output_format)}")
 print("="*60)
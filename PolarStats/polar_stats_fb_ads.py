@@ -1,15 +1,24 @@
-import pandas as pd
-import numpy as np
+import argparse
 import os
+import sys
 
-def analyze_fb_ads_dataset():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PandasStats'))
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
+
+def analyze_fb_ads_dataset(output_format='csv', plan_budget_ms=None):
     """
     Analyze Facebook Ads Presidential dataset
     Research Analyst: Comprehensive descriptive statistics and aggregations
     """
+    # Imported on first use so --help and importing this module stay cheap
+    import pandas as pd
+    import numpy as np
+    from pandas_agg_planner import planned_grouping_sets_describe
+    from pandas_grouping_sets import detect_unique_key
+    from pandas_input import read_csv_input
     
-    # Load dataset
-    df = pd.read_csv('2024_fb_ads_president_scored_anon.csv')
+    # Load dataset (or its .csv.gz/.csv.zst copy)
+    df = read_csv_input('2024_fb_ads_president_scored_anon.csv')
     
     print("=== FACEBOOK ADS DATASET ANALYSIS ===")
     print(f"Dataset shape: {df.shape}")
@@ -46,7 +55,7 @@ def analyze_fb_ads_dataset():
             print(f"{col}: {unique_count} unique values, Top: {top_value} ({top_freq}), Missing: {missing_count}")
     
     categorical_df = pd.DataFrame(categorical_stats)
-    categorical_df.to_csv('polar_fb_ads_categorical_analysis.csv', index=False)
+    save_frame(categorical_df, 'polar_fb_ads_categorical_analysis', output_format, index=False)
     
     # 2. NUMERICAL ANALYSIS
     print("\n=== NUMERICAL ANALYSIS ===")
@@ -62,41 +71,48 @@ def analyze_fb_ads_dataset():
     
     numerical_analysis = pd.concat([numerical_stats, additional_stats.T])
     print(numerical_analysis)
-    numerical_analysis.to_csv('polar_fb_ads_numerical_analysis.csv')
+    save_frame(numerical_analysis, 'polar_fb_ads_numerical_analysis', output_format)
+    
+    # 3./4. Both group-bys share one scan for their mergeable statistics;
+    # the page_id level is rolled up from the page_id + ad_id partials
+    grouping_sets = {}
+    plan = None
+    unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_stats}
+    if 'page_id' in df.columns and 'ad_id' in df.columns:
+        # Singleton groups (a key column as distinct as the row count) skip the group-by
+        unique_key = detect_unique_key(df, ['page_id', 'ad_id'], unique_counts)
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('page_id', 'ad_id'), ('page_id',)], numerical_cols, categorical_cols,
+                                                             unique_counts, unique_key, plan_budget_ms)
+    elif 'page_id' in df.columns:
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('page_id',)], numerical_cols, categorical_cols,
+                                                             unique_counts, budget_ms=plan_budget_ms)
+    
+    if plan is not None:
+        print('\n' + '\n'.join(plan.report()))
     
     # 3. GROUP BY PAGE_ID ANALYSIS
     print("\n=== GROUP BY PAGE_ID ANALYSIS ===")
     if 'page_id' in df.columns:
-        page_grouped = df.groupby('page_id').agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col != 'page_id'}
-        }).round(4)
+        page_grouped = grouping_sets[('page_id',)].round(4)
         
         page_grouped.columns = ['_'.join(col).strip() for col in page_grouped.columns]
         page_grouped = page_grouped.reset_index()
         
         print(f"Page-level aggregation: {page_grouped.shape}")
         print(page_grouped.head())
-        page_grouped.to_csv('polar_fb_ads_page_groupby_analysis.csv', index=False)
+        save_frame(page_grouped, 'polar_fb_ads_page_groupby_analysis', output_format, index=False)
     
     # 4. GROUP BY PAGE_ID AND AD_ID ANALYSIS
     print("\n=== GROUP BY PAGE_ID AND AD_ID ANALYSIS ===")
     if 'page_id' in df.columns and 'ad_id' in df.columns:
-        page_ad_grouped = df.groupby(['page_id', 'ad_id']).agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col not in ['page_id', 'ad_id']}
-        }).round(4)
+        page_ad_grouped = grouping_sets[('page_id', 'ad_id')].round(4)
         
         page_ad_grouped.columns = ['_'.join(col).strip() for col in page_ad_grouped.columns]
         page_ad_grouped = page_ad_grouped.reset_index()
         
         print(f"Page-Ad level aggregation: {page_ad_grouped.shape}")
         print(page_ad_grouped.head())
-        page_ad_grouped.to_csv('polar_fb_ads_page_ad_groupby_analysis.csv', index=False)
+        save_frame(page_ad_grouped, 'polar_fb_ads_page_ad_groupby_analysis', output_format, index=False)
     
     # Summary Report
     print("\n=== SUMMARY REPORT ===")
@@ -110,10 +126,16 @@ def analyze_fb_ads_dataset():
     print(f"Illuminating variables found: {len(illuminating_cols)}")
     
     print("\n=== FILES GENERATED ===")
-    print("1. polar_fb_ads_categorical_analysis.csv")
-    print("2. polar_fb_ads_numerical_analysis.csv") 
-    print("3. polar_fb_ads_page_groupby_analysis.csv")
-    print("4. polar_fb_ads_page_ad_groupby_analysis.csv")
+    print(f"1. {output_filename('polar_fb_ads_categorical_analysis', output_format)}")
+    print(f"2. {output_filename('polar_fb_ads_numerical_analysis', output_format)}") 
+    print(f"3. {output_filename('polar_fb_ads_page_groupby_analysis', output_format)}")
+    print(f"4. {output_filename('polar_fb_ads_page_ad_groupby_analysis', output_format)}")
 
 if __name__ == "__main__":
-    analyze_fb_ads_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze fb ads dataset")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+    parser.add_argument('--plan-budget-ms', type=float, default=None,
+                        help="Skip the costliest per-column nunique aggregations until the estimated plan fits")
+    args = parser.parse_args()
+    analyze_fb_ads_dataset(args.output_format, args.plan_budget_ms)
\ No newline at end of file
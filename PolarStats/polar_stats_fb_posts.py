@@ -1,15 +1,24 @@
-import pandas as pd
-import numpy as np
+import argparse
 import os
+import sys
 
-def analyze_fb_posts_dataset():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PandasStats'))
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
+
+def analyze_fb_posts_dataset(output_format='csv', plan_budget_ms=None):
     """
     Analyze Facebook Posts Presidential dataset
     Research Analyst: Comprehensive descriptive statistics and aggregations
     """
+    # Imported on first use so --help and importing this module stay cheap
+    import pandas as pd
+    import numpy as np
+    from pandas_agg_planner import planned_grouping_sets_describe
+    from pandas_grouping_sets import detect_unique_key
+    from pandas_input import read_csv_input
     
-    # Load dataset
-    df = pd.read_csv('2024_fb_posts_president_scored_anon.csv')
+    # Load dataset (or its .csv.gz/.csv.zst copy)
+    df = read_csv_input('2024_fb_posts_president_scored_anon.csv')
     
     print("=== FACEBOOK POSTS DATASET ANALYSIS ===")
     print(f"Dataset shape: {df.shape}")
@@ -46,7 +55,7 @@ def analyze_fb_posts_dataset():
             print(f"{col}: {unique_count} unique values, Top: {top_value} ({top_freq}), Missing: {missing_count}")
     
     categorical_df = pd.DataFrame(categorical_stats)
-    categorical_df.to_csv('polar_fb_posts_categorical_analysis.csv', index=False)
+    save_frame(categorical_df, 'polar_fb_posts_categorical_analysis', output_format, index=False)
     
     # 2. NUMERICAL ANALYSIS
     print("\n=== NUMERICAL ANALYSIS ===")
@@ -62,41 +71,48 @@ def analyze_fb_posts_dataset():
     
     numerical_analysis = pd.concat([numerical_stats, additional_stats.T])
     print(numerical_analysis)
-    numerical_analysis.to_csv('polar_fb_posts_numerical_analysis.csv')
+    save_frame(numerical_analysis, 'polar_fb_posts_numerical_analysis', output_format)
+    
+    # 3./4. Both group-bys share one scan for their mergeable statistics;
+    # the Facebook_Id level is rolled up from the Facebook_Id + post_id partials
+    grouping_sets = {}
+    plan = None
+    unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_stats}
+    if 'Facebook_Id' in df.columns and 'post_id' in df.columns:
+        # Singleton groups (a key column as distinct as the row count) skip the group-by
+        unique_key = detect_unique_key(df, ['Facebook_Id', 'post_id'], unique_counts)
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('Facebook_Id', 'post_id'), ('Facebook_Id',)], numerical_cols, categorical_cols,
+                                                             unique_counts, unique_key, plan_budget_ms)
+    elif 'Facebook_Id' in df.columns:
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('Facebook_Id',)], numerical_cols, categorical_cols,
+                                                             unique_counts, budget_ms=plan_budget_ms)
+    
+    if plan is not None:
+        print('\n' + '\n'.join(plan.report()))
     
     # 3. GROUP BY FACEBOOK_ID ANALYSIS
     print("\n=== GROUP BY FACEBOOK_ID ANALYSIS ===")
     if 'Facebook_Id' in df.columns:
-        facebook_grouped = df.groupby('Facebook_Id').agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col != 'Facebook_Id'}
-        }).round(4)
+        facebook_grouped = grouping_sets[('Facebook_Id',)].round(4)
         
         facebook_grouped.columns = ['_'.join(col).strip() for col in facebook_grouped.columns]
         facebook_grouped = facebook_grouped.reset_index()
         
         print(f"Facebook ID level aggregation: {facebook_grouped.shape}")
         print(facebook_grouped.head())
-        facebook_grouped.to_csv('polar_fb_posts_facebook_id_groupby_analysis.csv', index=False)
+        save_frame(facebook_grouped, 'polar_fb_posts_facebook_id_groupby_analysis', output_format, index=False)
     
     # 4. GROUP BY FACEBOOK_ID AND POST_ID ANALYSIS
     print("\n=== GROUP BY FACEBOOK_ID AND POST_ID ANALYSIS ===")
     if 'Facebook_Id' in df.columns and 'post_id' in df.columns:
-        facebook_post_grouped = df.groupby(['Facebook_Id', 'post_id']).agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col not in ['Facebook_Id', 'post_id']}
-        }).round(4)
+        facebook_post_grouped = grouping_sets[('Facebook_Id', 'post_id')].round(4)
         
         facebook_post_grouped.columns = ['_'.join(col).strip() for col in facebook_post_grouped.columns]
         facebook_post_grouped = facebook_post_grouped.reset_index()
         
         print(f"Facebook ID-Post level aggregation: {facebook_post_grouped.shape}")
         print(facebook_post_grouped.head())
-        facebook_post_grouped.to_csv('polar_fb_posts_facebook_post_groupby_analysis.csv', index=False)
+        save_frame(facebook_post_grouped, 'polar_fb_posts_facebook_post_groupby_analysis', output_format, index=False)
     
     # Summary Report
     print("\n=== SUMMARY REPORT ===")
@@ -117,10 +133,16 @@ def analyze_fb_posts_dataset():
     print(f"Illuminating variables found: {len(illuminating_cols)}")
     
     print("\n=== FILES GENERATED ===")
-    print("1. polar_fb_posts_categorical_analysis.csv")
-    print("2. polar_fb_posts_numerical_analysis.csv") 
-    print("3. polar_fb_posts_facebook_id_groupby_analysis.csv")
-    print("4. polar_fb_posts_facebook_post_groupby_analysis.csv")
+    print(f"1. {output_filename('polar_fb_posts_categorical_analysis', output_format)}")
+    print(f"2. {output_filename('polar_fb_posts_numerical_analysis', output_format)}") 
+    print(f"3. {output_filename('polar_fb_posts_facebook_id_groupby_analysis', output_format)}")
+    print(f"4. {output_filename('polar_fb_posts_facebook_post_groupby_analysis', output_format)}")
 
 if __name__ == "__main__":
-    analyze_fb_posts_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze fb posts dataset")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+    parser.add_argument('--plan-budget-ms', type=float, default=None,
+                        help="Skip the costliest per-column nunique aggregations until the estimated plan fits")
+    args = parser.parse_args()
+    analyze_fb_posts_dataset(args.output_format, args.plan_budget_ms)
\ No newline at end of file
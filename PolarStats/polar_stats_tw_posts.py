@@ -1,15 +1,24 @@
-import pandas as pd
-import numpy as np
+import argparse
 import os
+import sys
 
-def analyze_twitter_dataset():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PandasStats'))
+from pandas_output_formats import OUTPUT_FORMATS, output_filename, save_frame
+
+def analyze_twitter_dataset(output_format='csv', plan_budget_ms=None):
     """
     Analyze Twitter Posts Presidential dataset
     Research Analyst: Comprehensive descriptive statistics and aggregations
     """
+    # Imported on first use so --help and importing this module stay cheap
+    import pandas as pd
+    import numpy as np
+    from pandas_agg_planner import planned_grouping_sets_describe
+    from pandas_grouping_sets import detect_unique_key
+    from pandas_input import read_csv_input
     
-    # Load dataset
-    df = pd.read_csv('2024_tw_posts_president_scored_anon.csv')
+    # Load dataset (or its .csv.gz/.csv.zst copy)
+    df = read_csv_input('2024_tw_posts_president_scored_anon.csv')
     
     print("=== TWITTER POSTS DATASET ANALYSIS ===")
     print(f"Dataset shape: {df.shape}")
@@ -46,7 +55,7 @@ def analyze_twitter_dataset():
             print(f"{col}: {unique_count} unique values, Top: {top_value} ({top_freq}), Missing: {missing_count}")
     
     categorical_df = pd.DataFrame(categorical_stats)
-    categorical_df.to_csv('polar_twitter_categorical_analysis.csv', index=False)
+    save_frame(categorical_df, 'polar_twitter_categorical_analysis', output_format, index=False)
     
     # 2. NUMERICAL ANALYSIS
     print("\n=== NUMERICAL ANALYSIS ===")
@@ -62,41 +71,48 @@ def analyze_twitter_dataset():
     
     numerical_analysis = pd.concat([numerical_stats, additional_stats.T])
     print(numerical_analysis)
-    numerical_analysis.to_csv('polar_twitter_numerical_analysis.csv')
+    save_frame(numerical_analysis, 'polar_twitter_numerical_analysis', output_format)
+    
+    # 3./4. Both group-bys share one scan for their mergeable statistics;
+    # the source level is rolled up from the source + id partials
+    grouping_sets = {}
+    plan = None
+    unique_counts = {stat['column']: stat['unique_count'] for stat in categorical_stats}
+    if 'source' in df.columns and 'id' in df.columns:
+        # Singleton groups (a key column as distinct as the row count) skip the group-by
+        unique_key = detect_unique_key(df, ['source', 'id'], unique_counts)
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('source', 'id'), ('source',)], numerical_cols, categorical_cols,
+                                                             unique_counts, unique_key, plan_budget_ms)
+    elif 'source' in df.columns:
+        grouping_sets, plan = planned_grouping_sets_describe(df, [('source',)], numerical_cols, categorical_cols,
+                                                             unique_counts, budget_ms=plan_budget_ms)
+    
+    if plan is not None:
+        print('\n' + '\n'.join(plan.report()))
     
     # 3. GROUP BY SOURCE ANALYSIS
     print("\n=== GROUP BY SOURCE ANALYSIS ===")
     if 'source' in df.columns:
-        source_grouped = df.groupby('source').agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col != 'source'}
-        }).round(4)
+        source_grouped = grouping_sets[('source',)].round(4)
         
         source_grouped.columns = ['_'.join(col).strip() for col in source_grouped.columns]
         source_grouped = source_grouped.reset_index()
         
         print(f"Source-level aggregation: {source_grouped.shape}")
         print(source_grouped.head())
-        source_grouped.to_csv('polar_twitter_source_groupby_analysis.csv', index=False)
+        save_frame(source_grouped, 'polar_twitter_source_groupby_analysis', output_format, index=False)
     
     # 4. GROUP BY SOURCE AND ID ANALYSIS
     print("\n=== GROUP BY SOURCE AND ID ANALYSIS ===")
     if 'source' in df.columns and 'id' in df.columns:
-        source_id_grouped = df.groupby(['source', 'id']).agg({
-            # Numerical aggregations
-            **{col: ['count', 'mean', 'median', 'std', 'min', 'max'] for col in numerical_cols if col in df.columns},
-            # Categorical aggregations
-            **{col: ['count', 'nunique'] for col in categorical_cols if col in df.columns and col not in ['source', 'id']}
-        }).round(4)
+        source_id_grouped = grouping_sets[('source', 'id')].round(4)
         
         source_id_grouped.columns = ['_'.join(col).strip() for col in source_id_grouped.columns]
         source_id_grouped = source_id_grouped.reset_index()
         
         print(f"Source-ID level aggregation: {source_id_grouped.shape}")
         print(source_id_grouped.head())
-        source_id_grouped.to_csv('polar_twitter_source_id_groupby_analysis.csv', index=False)
+        save_frame(source_id_grouped, 'polar_twitter_source_id_groupby_analysis', output_format, index=False)
     
     # Summary Report
     print("\n=== SUMMARY REPORT ===")
@@ -133,10 +149,16 @@ def analyze_twitter_dataset():
     print(f"\nIlluminating variables found: {len(illuminating_cols)}")
     
     print("\n=== FILES GENERATED ===")
-    print("1. polar_twitter_categorical_analysis.csv")
-    print("2. polar_twitter_numerical_analysis.csv") 
-    print("3. polar_twitter_source_groupby_analysis.csv")
-    print("4. polar_twitter_source_id_groupby_analysis.csv")
+    print(f"1. {output_filename('polar_twitter_categorical_analysis', output_format)}")
+    print(f"2. {output_filename('polar_twitter_numerical_analysis', output_format)}") 
+    print(f"3. {output_filename('polar_twitter_source_groupby_analysis', output_format)}")
+    print(f"4. {output_filename('polar_twitter_source_id_groupby_analysis', output_format)}")
 
 if __name__ == "__main__":
-    analyze_twitter_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze twitter dataset")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+    parser.add_argument('--plan-budget-ms', type=float, default=None,
+                        help="Skip the costliest per-column nunique aggregations until the estimated plan fits")
+    args = parser.parse_args()
+    analyze_twitter_dataset(args.output_format, args.plan_budget_ms)
\ No newline at end of file
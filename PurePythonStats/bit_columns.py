@@ -0,0 +1,209 @@
+import math
+from array import array
+from collections import Counter
+
+from type_inference import NUMERIC
+
+# Label pairs (false, true) a column may use to be stored as bits
+BOOLEAN_LABELS = (('0', '1'), ('False', 'True'))
+
+# Set bits of every byte value
+POPCOUNT = bytes(bin(byte).count('1') for byte in range(256))
+
+
+def popcount(bitmap):
+    return int.from_bytes(bitmap, 'little').bit_count()
+
+def _bitmap(flags):
+    """bytearray with bit i (little-endian within each byte) set where flags[i] is '1'"""
+    if not flags:
+        return bytearray()
+    return bytearray(int(flags[::-1], 2).to_bytes((len(flags) + 7) // 8, 'little'))
+
+def boolean_labels(column_data):
+    """The (false, true) label pair a column uses, or None if it holds anything else
+
+    Empty cells are allowed; a column with no values at all is not boolean.
+    """
+    seen = set()
+    for value in column_data:
+        if value and value not in seen:
+            seen.add(value)
+            if len(seen) > 2:
+                return None
+    for labels in BOOLEAN_LABELS:
+        if seen and seen <= set(labels):
+            return labels
+    return None
+
+class BitColumn:
+    """A 0/1 or True/False column as two bitmaps: rows holding a value, and true rows
+
+    Each row costs two bits. Counts are popcounts of the bitmaps, per group
+    over a RowGroups mapping.
+    """
+
+    def __init__(self, labels, values, valid, length, first_label):
+        self.labels = labels
+        self.values = values
+        self.valid = valid
+        self.length = length
+        self.first_label = first_label
+
+    @classmethod
+    def from_values(cls, column_data, labels):
+        false_label, true_label = labels
+        valid = ''.join('1' if value else '0' for value in column_data)
+        values = ''.join('1' if value == true_label else '0' for value in column_data)
+        first = valid.find('1')
+        first_label = None if first < 0 else column_data[first]
+        return cls(labels, _bitmap(values), _bitmap(valid), len(column_data), first_label)
+
+    def true_count(self):
+        return popcount(self.values)
+
+    def valid_count(self):
+        return popcount(self.valid)
+
+    def valid_flags(self):
+        """'1'/'0' per row holding a value, in row order"""
+        values = format(int.from_bytes(self.values, 'little'), f'0{self.length}b')[::-1] if self.length else ''
+        valid = format(int.from_bytes(self.valid, 'little'), f'0{self.length}b')[::-1] if self.length else ''
+        return ''.join(flag for flag, present in zip(values, valid) if present == '1')
+
+    def nbytes(self):
+        return len(self.values) + len(self.valid)
+
+    def group_counts(self, row_groups):
+        """(true counts, valid counts) per group of row_groups"""
+        return row_groups.count(self.values), row_groups.count(self.valid)
+
+class RowGroups:
+    """Group number of every row, in first-appearance order like Grouping
+
+    Bytes of a bitmap whose eight rows share one group are counted with a
+    single popcount lookup, which covers most of the rows of clustered input;
+    the other bytes are counted bit by bit.
+    """
+
+    def __init__(self, keys, group_ids):
+        self.keys = keys
+        self.group_ids = group_ids
+        self.uniform = array('l', [-1]) * ((len(group_ids) + 7) // 8)
+        for byte_index in range(len(self.uniform)):
+            byte_groups = group_ids[byte_index * 8:byte_index * 8 + 8]
+            if len(byte_groups) == 8 and byte_groups[0] == byte_groups[7] and min(byte_groups) == max(byte_groups):
+                self.uniform[byte_index] = byte_groups[0]
+
+    @classmethod
+    def from_rows(cls, rows, key_indices):
+        numbers = {}
+        group_ids = array('l')
+        for row in rows:
+            key = tuple(row[i] if i < len(row) else '' for i in key_indices)
+            number = numbers.get(key)
+            if number is None:
+                number = numbers[key] = len(numbers)
+            group_ids.append(number)
+        return cls(list(numbers), group_ids)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def count(self, bitmap):
+        """Set bits of bitmap per group"""
+        counts = [0] * len(self.keys)
+        group_ids = self.group_ids
+        for byte_index, byte in enumerate(bitmap):
+            if not byte:
+                continue
+            group = self.uniform[byte_index]
+            if group >= 0:
+                counts[group] += POPCOUNT[byte]
+                continue
+            start = byte_index * 8
+            for bit in range(8):
+                if byte >> bit & 1:
+                    counts[group_ids[start + bit]] += 1
+        return counts
+
+class BitProfile:
+    """ColumnProfile counterpart computed from a BitColumn by popcount
+
+    A numeric (0/1) column takes count, mean, min and max from popcounts; std
+    sums the two possible squared deviations in row order, so it rounds
+    exactly like calculate_stats without parsing a value. A categorical column
+    reports both labels' counts, ties ordered by first appearance like Counter.
+    """
+
+    def __init__(self, bit_column, column_type):
+        self.bits = bit_column
+        self.column_type = column_type
+        self.total_count = bit_column.length
+        self.non_null_count = bit_column.valid_count()
+        self.approximate = []
+
+    def stats(self, calculate_stats):
+        count = self.non_null_count
+        if self.column_type != NUMERIC or count == 0:
+            return calculate_stats([])
+        ones = self.bits.true_count()
+        mean = float(ones) / count
+        std = 0
+        if count > 1:
+            squared = {'0': (0.0 - mean) ** 2, '1': (1.0 - mean) ** 2}
+            std = math.sqrt(sum(squared[flag] for flag in self.bits.valid_flags()) / (count - 1))
+        return {
+            'count': count,
+            'mean': mean,
+            'min': 0.0 if ones < count else 1.0,
+            'max': 1.0 if ones else 0.0,
+            'std': std
+        }
+
+    def _counts(self):
+        ones = self.bits.true_count()
+        false_label, true_label = self.bits.labels
+        counts = Counter()
+        # Counter.most_common breaks ties by insertion order, i.e. first appearance
+        for label in sorted(self.bits.labels, key=lambda label: label != self.bits.first_label):
+            count = ones if label == true_label else self.non_null_count - ones
+            if count:
+                counts[label] = count
+        return counts
+
+    def unique_count(self):
+        return len(self._counts())
+
+    def most_common(self, n):
+        return self._counts().most_common(n)
+
+def pack_boolean_columns(headers, data):
+    """{header: BitColumn} for every column of data holding only 0/1 or True/False values
+
+    The bitmaps are built alongside the rows, which are left as they are:
+    this costs a scan per column and two bits per row of every packed
+    column, so it is only worth it for the per-group popcounts.
+    """
+    packed = {}
+    for i, header in enumerate(headers):
+        column_data = [row[i] if i < len(row) else '' for row in data]
+        labels = boolean_labels(column_data)
+        if labels is not None:
+            packed[header] = BitColumn.from_values(column_data, labels)
+    return packed
+
+def group_true_shares(packed, rows, headers, key_columns):
+    """{header: [share of true values per group]} for the packed columns, groups in first-appearance order
+
+    Groups without a value in a column are left out of its list. Returns
+    None when a key column is missing.
+    """
+    if any(col not in headers for col in key_columns):
+        return None
+    row_groups = RowGroups.from_rows(rows, [headers.index(col) for col in key_columns])
+    shares = {}
+    for header, bit_column in packed.items():
+        true_counts, valid_counts = bit_column.group_counts(row_groups)
+        shares[header] = [true / valid for true, valid in zip(true_counts, valid_counts) if valid]
+    return shares
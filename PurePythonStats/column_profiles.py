@@ -0,0 +1,219 @@
+import hashlib
+import heapq
+import math
+from array import array
+from collections import Counter
+
+from grouping_sets import safe_float
+from type_inference import NUMERIC, classify_share, count_numeric, numeric_values
+
+# Counters kept by a degraded categorical profile (Space-Saving heavy hitters)
+DEFAULT_TOP_CAPACITY = 1000
+
+# Smallest hashes kept by the distinct-count sketch (K minimum values, ~3% error)
+DEFAULT_KMV_SIZE = 1024
+
+
+class DistinctSketch:
+    """K-minimum-values estimate of a distinct count in O(k) memory
+
+    Values are hashed to [0, 1); with the k smallest distinct hashes kept, the
+    count is estimated as (k - 1) / (k-th smallest). Exact while fewer than k
+    distinct values have been seen.
+    """
+
+    def __init__(self, k=DEFAULT_KMV_SIZE):
+        self.k = k
+        self.hashes = set()
+        self.threshold = 1.0
+
+    @staticmethod
+    def _hash(value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') / 2 ** 64
+
+    def add(self, value):
+        hashed = self._hash(value)
+        if hashed >= self.threshold or hashed in self.hashes:
+            return
+        self.hashes.add(hashed)
+        if len(self.hashes) > self.k:
+            self.hashes.remove(max(self.hashes))
+            self.threshold = max(self.hashes)
+
+    def estimate(self):
+        if len(self.hashes) < self.k:
+            return len(self.hashes)
+        return int(round((self.k - 1) / max(self.hashes)))
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: the most frequent values in a fixed number of counters
+
+    A counter taken over from an evicted value starts at that value's count,
+    which is recorded as its error: the true count lies between count - error
+    and count. most_common() reports the guaranteed count - error, so no
+    reported count is ever higher than the truth.
+    """
+
+    def __init__(self, capacity=DEFAULT_TOP_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # (count, value) entries, some stale; the live minimum is found lazily
+        self.heap = []
+
+    def add(self, value, count=1):
+        if value in self.counts or len(self.counts) < self.capacity:
+            self.counts[value] = self.counts.get(value, 0) + count
+        else:
+            while True:
+                smallest_count, smallest = heapq.heappop(self.heap)
+                if self.counts.get(smallest) == smallest_count:
+                    break
+            del self.counts[smallest]
+            self.errors.pop(smallest, None)
+            self.counts[value] = smallest_count + count
+            self.errors[value] = smallest_count
+        heapq.heappush(self.heap, (self.counts[value], value))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(counted, key) for key, counted in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def guaranteed(self, value):
+        """Occurrences of value certainly seen: its counter less the count it inherited"""
+        return self.counts[value] - self.errors.get(value, 0)
+
+    def most_common(self, n):
+        """The n values with the highest guaranteed counts, as (value, guaranteed count)"""
+        ranked = sorted(self.counts, key=lambda value: (self.guaranteed(value), self.counts[value]), reverse=True)
+        return [(value, self.guaranteed(value)) for value in ranked[:n]]
+
+class ColumnProfile:
+    """Per-column accumulator behind analyze_column
+
+    Numeric columns keep their parsed values in a compact array('d') so the
+    statistics match the list-based calculation exactly; degrade() drops the
+    array for running moments (mean, min and max stay exact, std becomes a
+    one-pass estimate). Categorical columns keep exact value counts;
+    degrade() replaces them with a Space-Saving top list and a distinct-count
+    sketch. approximate lists the metrics a degraded profile only estimates.
+    """
+
+    def __init__(self, column_type):
+        self.column_type = column_type
+        self.total_count = 0
+        self.non_null_count = 0
+        self.approximate = []
+        if column_type == NUMERIC:
+            self.values = array('d')
+            self.moments = None
+        else:
+            self.counts = Counter()
+            self.top = None
+            self.distinct = None
+
+    @classmethod
+    def from_values(cls, column_data, column_type=None):
+        """Exact profile of a materialised column; without a type the 50% numeric rule decides"""
+        if column_type is None:
+            column_type = classify_share(count_numeric(column_data), len(column_data), exact=True)
+        profile = cls(column_type)
+        profile.total_count = len(column_data)
+        non_null_values = [value for value in column_data if value is not None and value != '']
+        profile.non_null_count = len(non_null_values)
+        if column_type == NUMERIC:
+            profile.values = numeric_values(column_data)
+        else:
+            profile.counts = Counter(non_null_values)
+        return profile
+
+    def add(self, value):
+        self.total_count += 1
+        if value is None or value == '':
+            return
+        self.non_null_count += 1
+        if self.column_type == NUMERIC:
+            number = safe_float(value)
+            if number is None:
+                return
+            if self.moments is None:
+                self.values.append(number)
+            else:
+                self._add_moment(number)
+        elif self.top is None:
+            self.counts[value] += 1
+        else:
+            self.top.add(value)
+            self.distinct.add(value)
+
+    def merge(self, other):
+        """Fold in the exact profile of the rows that follow this one's"""
+        if self.approximate or other.approximate:
+            raise ValueError("Degraded column profiles cannot be merged")
+        self.total_count += other.total_count
+        self.non_null_count += other.non_null_count
+        if self.column_type == NUMERIC:
+            self.values.extend(other.values)
+        else:
+            # Counter.update keeps first-seen order, so most_common ties break as in one pass
+            self.counts.update(other.counts)
+
+    def _add_moment(self, number):
+        # [count, sum, mean, M2, min, max]; sum is kept in input order like sum(values)
+        moments = self.moments
+        moments[0] += 1
+        moments[1] += number
+        delta = number - moments[2]
+        moments[2] += delta / moments[0]
+        moments[3] += delta * (number - moments[2])
+        moments[4] = number if moments[4] is None else min(moments[4], number)
+        moments[5] = number if moments[5] is None else max(moments[5], number)
+
+    def held_items(self):
+        """Values or distinct keys held in memory; degrading the largest profiles frees the most"""
+        if self.column_type == NUMERIC:
+            return len(self.values) if self.moments is None else 0
+        return len(self.counts) if self.top is None else 0
+
+    def degrade(self):
+        """Switch to bounded-memory accumulators; returns a description, or None if already degraded"""
+        if self.column_type == NUMERIC:
+            if self.moments is not None:
+                return None
+            self.moments = [0, 0.0, 0.0, 0.0, None, None]
+            for number in self.values:
+                self._add_moment(number)
+            self.values = array('d')
+            self.approximate = ['std']
+            return "exact values -> running moments (std is one-pass)"
+        if self.top is not None:
+            return None
+        self.top = SpaceSaving()
+        self.distinct = DistinctSketch()
+        for value, count in self.counts.most_common():
+            self.top.add(value, count)
+            self.distinct.add(value)
+        self.counts = Counter()
+        self.approximate = ['unique_count', 'most_frequent']
+        return "exact value counts -> Space-Saving top values + KMV distinct sketch"
+
+    def stats(self, calculate_stats):
+        """Numeric statistics in calculate_stats' shape"""
+        if self.moments is None:
+            return calculate_stats(self.values if isinstance(self.values, list) else list(self.values))
+        count, total, _, m2, minimum, maximum = self.moments
+        if count == 0:
+            return calculate_stats([])
+        return {
+            'count': count,
+            'mean': total / count,
+            'min': minimum,
+            'max': maximum,
+            'std': math.sqrt(m2 / (count - 1)) if count > 1 else 0
+        }
+
+    def unique_count(self):
+        return len(self.counts) if self.top is None else self.distinct.estimate()
+
+    def most_common(self, n):
+        return self.counts.most_common(n) if self.top is None else self.top.most_common(n)
@@ -0,0 +1,195 @@
+import math
+from collections import Counter
+
+from grouping_sets import safe_float
+
+# Rank sketch resolution: buckets per doubling of 1 + |value| (about 4% wide),
+# which keeps small counts in buckets of their own
+RANK_BUCKETS_PER_OCTAVE = 16
+
+
+def rank_bucket(value):
+    """Monotone integer bucket of value on a log scale; equal buckets are tied ranks"""
+    bucket = int(math.log2(1.0 + abs(value)) * RANK_BUCKETS_PER_OCTAVE)
+    return bucket if value >= 0 else -bucket - 1
+
+def finite_float(value):
+    """safe_float(value), with nan and infinities treated as missing"""
+    number = safe_float(value)
+    return number if number is not None and math.isfinite(number) else None
+
+class PairMoments:
+    """Co-moments of two columns over the rows where both have a value
+
+    Updated one pair at a time with Welford's recurrence and combined with
+    Chan's parallel formulas, so chunks and batches merge exactly like a
+    single pass up to float rounding.
+    """
+
+    __slots__ = ('n', 'mean_x', 'mean_y', 'm2_x', 'm2_y', 'c')
+
+    def __init__(self, n=0, mean_x=0.0, mean_y=0.0, m2_x=0.0, m2_y=0.0, c=0.0):
+        self.n = n
+        self.mean_x = mean_x
+        self.mean_y = mean_y
+        self.m2_x = m2_x
+        self.m2_y = m2_y
+        self.c = c
+
+    def add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c += dx * (y - self.mean_y)
+
+    def merge(self, other):
+        if not other.n:
+            return
+        if not self.n:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.m2_x += other.m2_x + dx * dx * weight
+        self.m2_y += other.m2_y + dy * dy * weight
+        self.c += other.c + dx * dy * weight
+        self.n = n
+
+    def covariance(self):
+        return self.c / (self.n - 1) if self.n > 1 else None
+
+    def pearson(self):
+        if self.n < 2 or self.m2_x <= 0 or self.m2_y <= 0:
+            return None
+        return max(-1.0, min(1.0, self.c / math.sqrt(self.m2_x * self.m2_y)))
+
+def _midranks(counts):
+    """{bucket: average rank of the rows in it} for {bucket: row count}"""
+    ranks = {}
+    below = 0
+    for bucket in sorted(counts):
+        ranks[bucket] = below + (counts[bucket] + 1) / 2
+        below += counts[bucket]
+    return ranks
+
+def spearman_from_buckets(table):
+    """Spearman's rho of a {(x bucket, y bucket): count} table, rows in one bucket tied
+
+    Exact when no two distinct values of a column share a bucket.
+    """
+    n = sum(table.values())
+    if n < 2:
+        return None
+    x_counts, y_counts = Counter(), Counter()
+    for (bx, by), count in table.items():
+        x_counts[bx] += count
+        y_counts[by] += count
+    x_ranks, y_ranks = _midranks(x_counts), _midranks(y_counts)
+    mean = (n + 1) / 2
+    sxx = sum(count * (x_ranks[bx] - mean) ** 2 for bx, count in x_counts.items())
+    syy = sum(count * (y_ranks[by] - mean) ** 2 for by, count in y_counts.items())
+    if sxx <= 0 or syy <= 0:
+        return None
+    sxy = sum(count * (x_ranks[bx] - mean) * (y_ranks[by] - mean) for (bx, by), count in table.items())
+    return max(-1.0, min(1.0, sxy / math.sqrt(sxx * syy)))
+
+class CoMoments:
+    """Covariance matrix of columns from one streaming pass, with pairwise-complete nulls
+
+    Every pair of columns (and each column with itself, for the variances)
+    keeps PairMoments over the rows where both are present, and every pair
+    of distinct columns a rank sketch: counts of (rank_bucket(x),
+    rank_bucket(y)), bounded by the bucket grid rather than the row count,
+    from which Spearman's rho is approximated. Both merge by addition.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.pairs = {(a, b): PairMoments() for i, a in enumerate(self.columns) for b in self.columns[i:]}
+        self.ranks = {(a, b): Counter() for a, b in self.pairs if a != b}
+
+    def add(self, values):
+        """Add one row's values of the columns (floats, None where missing)"""
+        present = [(column, value, rank_bucket(value))
+                   for column, value in zip(self.columns, values) if value is not None]
+        for i, (a, x, bx) in enumerate(present):
+            self.pairs[(a, a)].add(x, x)
+            for b, y, by in present[i + 1:]:
+                self.pairs[(a, b)].add(x, y)
+                self.ranks[(a, b)][(bx, by)] += 1
+
+    def merge(self, other):
+        """Fold in the co-moments of other rows of the same columns"""
+        for pair, moments in other.pairs.items():
+            self.pairs[pair].merge(moments)
+        for pair, table in other.ranks.items():
+            self.ranks[pair].update(table)
+
+    def results(self):
+        """(column a, column b, pair count, covariance, pearson, approximate spearman) per pair
+
+        Pairs of a column with itself carry its variance as the covariance.
+        """
+        for (a, b), moments in self.pairs.items():
+            if a == b:
+                yield a, b, moments.n, moments.covariance(), None, None
+            else:
+                yield a, b, moments.n, moments.covariance(), moments.pearson(), spearman_from_buckets(self.ranks[(a, b)])
+
+class CorrelationScan:
+    """Overall and per-group CoMoments of one pass; groups keep first-appearance order"""
+
+    def __init__(self, columns, group_column=None):
+        self.columns = list(columns)
+        self.group_column = group_column
+        self.overall = CoMoments(self.columns)
+        self.groups = {}
+
+    def add(self, values, group_key=None):
+        self.overall.add(values)
+        if self.group_column is not None:
+            moments = self.groups.get(group_key)
+            if moments is None:
+                moments = self.groups[group_key] = CoMoments(self.columns)
+            moments.add(values)
+
+    def merge(self, other):
+        """Fold in the scan of the rows that follow this one's"""
+        self.overall.merge(other.overall)
+        for group_key, moments in other.groups.items():
+            target = self.groups.get(group_key)
+            if target is None:
+                self.groups[group_key] = moments
+            else:
+                target.merge(moments)
+
+def correlation_pass(rows, headers, columns, group_column=None):
+    """CorrelationScan of the columns present in headers over an iterable of rows
+
+    Values that do not parse as finite numbers are missing. Returns None
+    when fewer than two of the columns are present.
+    """
+    present = [col for col in columns if col in headers]
+    if len(present) < 2:
+        return None
+    if group_column not in headers:
+        group_column = None
+    scan = CorrelationScan(present, group_column)
+    indices = [headers.index(col) for col in present]
+    group_index = headers.index(group_column) if group_column is not None else None
+    for row in rows:
+        values = [finite_float(row[i]) if i < len(row) else None for i in indices]
+        group_key = None
+        if group_index is not None:
+            group_key = row[group_index] if group_index < len(row) else ''
+        scan.add(values, group_key)
+    return scan
@@ -0,0 +1,269 @@
+import argparse
+import gzip
+import io
+import mmap
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Compressed siblings looked for when a dataset's plain CSV is missing
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+# Threads decompressing frames ahead of the reader; zlib and zstd release the GIL
+DEFAULT_DECOMPRESS_WORKERS = os.cpu_count() or 1
+
+# Uncompressed bytes per frame written by compress_file (BGZF caps gzip blocks at 64 KB)
+BGZF_BLOCK_BYTES = 0xff00
+DEFAULT_ZSTD_FRAME_MB = 4
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_ZSTD_SKIPPABLE = range(0x184D2A50, 0x184D2A60)
+
+# Empty BGZF block that bgzip writes as an end-of-file marker
+_BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def _require_zstandard():
+    """Import zstandard on demand; only .zst input needs it"""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading or writing .zst input needs zstandard (pip install zstandard)")
+    return zstandard
+
+def resolve_input(filename):
+    """filename, or its .gz/.zst sibling when only that exists (filename again if neither does)"""
+    if os.path.exists(filename):
+        return filename
+    for suffix in COMPRESSED_SUFFIXES:
+        if os.path.exists(filename + suffix):
+            return filename + suffix
+    return filename
+
+def compression_of(filename):
+    """'gzip', 'zstd' or None, from the file's magic bytes rather than its name"""
+    with open(filename, 'rb') as file:
+        magic = file.read(4)
+    if magic[:2] == _GZIP_MAGIC:
+        return 'gzip'
+    if magic == _ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+def _bgzf_spans(data):
+    """[(offset, size, uncompressed size)] of the BGZF blocks in data, or None for plain gzip
+
+    Every BGZF member carries its own compressed size in a 'BC' extra
+    subfield, so the blocks are found without decompressing anything.
+    """
+    spans = []
+    offset = 0
+    while offset < len(data):
+        if data[offset:offset + 2] != _GZIP_MAGIC or not data[offset + 3] & 4:
+            return None
+        xlen = struct.unpack_from('<H', data, offset + 10)[0]
+        position = offset + 12
+        size = None
+        while position + 4 <= offset + 12 + xlen:
+            subfield, length = data[position:position + 2], struct.unpack_from('<H', data, position + 2)[0]
+            if subfield == b'BC' and length == 2:
+                size = struct.unpack_from('<H', data, position + 4)[0] + 1
+            position += 4 + length
+        if size is None:
+            return None
+        spans.append((offset, size, struct.unpack_from('<I', data, offset + size - 4)[0]))
+        offset += size
+    return spans
+
+def _zstd_spans(data):
+    """[(offset, size, uncompressed size or None)] of the zstd frames in data
+
+    Frame and block headers give every compressed size, so frames are split
+    without decompressing; skippable frames are left out.
+    """
+    spans = []
+    offset = 0
+    while offset < len(data):
+        magic = struct.unpack_from('<I', data, offset)[0]
+        if magic in _ZSTD_SKIPPABLE:
+            offset += 8 + struct.unpack_from('<I', data, offset + 4)[0]
+            continue
+        if data[offset:offset + 4] != _ZSTD_MAGIC:
+            return None
+        descriptor = data[offset + 4]
+        single_segment = (descriptor >> 5) & 1
+        content_size_bytes = (single_segment, 2, 4, 8)[descriptor >> 6]
+        dictionary_bytes = (0, 1, 2, 4)[descriptor & 3]
+        content_at = offset + 5 + (0 if single_segment else 1) + dictionary_bytes
+        content_size = None
+        if content_size_bytes:
+            content_size = int.from_bytes(data[content_at:content_at + content_size_bytes], 'little')
+            if content_size_bytes == 2:
+                content_size += 256
+        position = content_at + content_size_bytes
+        while True:
+            header = int.from_bytes(data[position:position + 3], 'little')
+            block_type, block_size = (header >> 1) & 3, header >> 3
+            # RLE blocks store a single byte repeated block_size times
+            position += 3 + (1 if block_type == 1 else block_size)
+            if header & 1:
+                break
+        if (descriptor >> 2) & 1:
+            position += 4
+        spans.append((offset, position - offset, content_size))
+        offset = position
+    return spans
+
+def _decompress_gzip_member(member):
+    return zlib.decompress(member, 31)
+
+def _decompress_zstd_frame(frame):
+    # A decompressor per frame: zstandard contexts are not shared between threads
+    return _require_zstandard().ZstdDecompressor().decompressobj().decompress(frame)
+
+class ParallelFrameReader(io.RawIOBase):
+    """Binary stream over independently compressed frames, decompressed ahead by a thread pool
+
+    At most two frames per worker are in flight, so memory stays bounded
+    while the consumer parses; frames come out in file order.
+    """
+
+    def __init__(self, filename, spans, decompress, workers=DEFAULT_DECOMPRESS_WORKERS):
+        super().__init__()
+        self._file = open(filename, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._spans = iter(spans)
+        self._decompress = decompress
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix='decompress')
+        self._ahead = 2 * max(1, workers)
+        self._pending = deque()
+        self._buffer = memoryview(b'')
+        self._submit()
+
+    def _submit(self):
+        while len(self._pending) < self._ahead:
+            span = next(self._spans, None)
+            if span is None:
+                return
+            offset, size = span[:2]
+            self._pending.append(self._pool.submit(self._decompress, self._data[offset:offset + size]))
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._submit()
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(cancel_futures=True)
+            self._buffer.release()
+            self._data.close()
+            self._file.close()
+        super().close()
+
+def frame_spans(filename):
+    """Independently decompressible frames of a compressed file, or None when it is one stream"""
+    kind = compression_of(filename)
+    if kind is None or os.stat(filename).st_size == 0:
+        return None
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return _bgzf_spans(data) if kind == 'gzip' else _zstd_spans(data)
+
+def open_input(filename, workers=DEFAULT_DECOMPRESS_WORKERS):
+    """Readable binary stream of the uncompressed contents of a plain, gzip or zstd file
+
+    BGZF (bgzip) files and zstd files of several frames are decompressed in
+    parallel; other compressed files fall back to one streaming decompressor.
+    """
+    kind = compression_of(filename)
+    if kind is None:
+        return open(filename, 'rb')
+    spans = frame_spans(filename)
+    if spans is not None and len(spans) > 1:
+        decompress = _decompress_gzip_member if kind == 'gzip' else _decompress_zstd_frame
+        return io.BufferedReader(ParallelFrameReader(filename, spans, decompress, workers), 1024 * 1024)
+    if kind == 'gzip':
+        return gzip.open(filename, 'rb')
+    return _require_zstandard().ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True,
+                                                                closefd=True)
+
+def open_input_text(filename, newline=None, workers=DEFAULT_DECOMPRESS_WORKERS):
+    """open(filename, 'r', encoding='utf-8', newline=newline) that also reads gzip and zstd files"""
+    if compression_of(filename) is None:
+        return open(filename, 'r', newline=newline, encoding='utf-8')
+    return io.TextIOWrapper(open_input(filename, workers), encoding='utf-8', newline=newline)
+
+def input_size(filename):
+    """Uncompressed size of filename in bytes
+
+    Taken from the frame headers when they all record it, otherwise counted
+    by decompressing the file once.
+    """
+    if compression_of(filename) is None:
+        return os.stat(filename).st_size
+    spans = frame_spans(filename)
+    if spans and all(size is not None for _, _, size in spans):
+        return sum(size for _, _, size in spans)
+    total = 0
+    with open_input(filename) as stream:
+        while True:
+            block = stream.read(1024 * 1024)
+            if not block:
+                return total
+            total += len(block)
+
+def _bgzf_block(chunk):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = compressor.compress(chunk) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2,
+                         len(deflated) + 25)
+    return header + deflated + struct.pack('<2I', zlib.crc32(chunk), len(chunk))
+
+def compress_file(filename, kind='gzip', frame_mb=DEFAULT_ZSTD_FRAME_MB):
+    """Write filename.gz (BGZF blocks) or filename.zst (frames of frame_mb MB) and return its path
+
+    Both are readable by gzip/zcat and zstd, and split into frames that
+    open_input decompresses in parallel.
+    """
+    suffix = '.gz' if kind == 'gzip' else '.zst'
+    chunk_bytes = BGZF_BLOCK_BYTES if kind == 'gzip' else int(frame_mb * 1024 * 1024)
+    compress = _bgzf_block if kind == 'gzip' else _require_zstandard().ZstdCompressor().compress
+    with open(filename, 'rb') as source, open(filename + suffix, 'wb') as target:
+        while True:
+            chunk = source.read(chunk_bytes)
+            if not chunk:
+                break
+            target.write(compress(chunk))
+        if kind == 'gzip':
+            target.write(_BGZF_EOF)
+    return filename + suffix
+
+def main():
+    """Compress CSVs into frames that the analysis scripts decompress in parallel"""
+    parser = argparse.ArgumentParser(description="Write block-compressed copies of CSV files")
+    parser.add_argument('filenames', nargs='+', help="CSV files to compress")
+    parser.add_argument('--format', choices=['gzip', 'zstd'], default='gzip',
+                        help="gzip writes bgzip-compatible BGZF blocks (.gz); zstd writes independent frames (.zst)")
+    parser.add_argument('--frame-mb', type=float, default=DEFAULT_ZSTD_FRAME_MB,
+                        help="Uncompressed MB per zstd frame")
+    args = parser.parse_args()
+
+    for filename in args.filenames:
+        path = compress_file(filename, args.format, args.frame_mb)
+        print(f"Wrote {path} ({len(frame_spans(path) or [])} frames, "
+              f"{os.stat(path).st_size / (1024 * 1024):.1f} MB)")
+
+if __name__ == "__main__":
+    main()
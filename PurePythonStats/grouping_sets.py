@@ -0,0 +1,318 @@
+import heapq
+import math
+from fractions import Fraction
+
+from histograms import Histogram
+
+
+def safe_float(value):
+    """Convert value to float, return None if not possible"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _add_partial(partials, x):
+    """Add x to a list of non-overlapping float partials whose sum is exact (Shewchuk)"""
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+class RunningStats:
+    """Mergeable count/sum/min/max/variance accumulator for one numeric column
+
+    Sums are kept as exact float partials, so merging partial results in any
+    order gives bit-for-bit the same totals as a single pass over the rows.
+    Squares go in as their rounded value plus its rounding error, so the sum
+    of squares is exact too and the variance is correctly rounded however
+    large the mean. An optional histograms.Histogram is filled from the same
+    values.
+    """
+    __slots__ = ('count', 'minimum', 'maximum', '_sum', '_sum_sq', '_non_finite', 'histogram')
+
+    def __init__(self, histogram=None):
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self._sum = []
+        self._sum_sq = []
+        self._non_finite = 0.0
+        self.histogram = histogram
+
+    def add(self, value):
+        """Add one parsed value; None is ignored like a missing cell"""
+        if value is None:
+            return
+        if self.histogram is not None:
+            self.histogram.add(value)
+        self.count += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if math.isfinite(value):
+            _add_partial(self._sum, value)
+            # The square plus its exact rounding error (Dekker's product of the
+            # two 26-bit halves of value), so the sum of squares stays exact
+            square = value * value
+            split = 134217729.0 * value
+            high = split - (split - value)
+            low = value - high
+            _add_partial(self._sum_sq, square)
+            error = ((high * high - square) + 2 * high * low) + low * low
+            if error:
+                _add_partial(self._sum_sq, error)
+        else:
+            self._non_finite += value
+
+    def merge(self, other):
+        """Fold another RunningStats into this one"""
+        if other.count == 0:
+            return
+        if other.histogram is not None:
+            # Copied, so rolling a finer group into a coarser one leaves it intact
+            if self.histogram is None:
+                self.histogram = other.histogram.copy()
+            else:
+                self.histogram.merge(other.histogram)
+        self.count += other.count
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+        for partial in other._sum:
+            _add_partial(self._sum, partial)
+        for partial in other._sum_sq:
+            _add_partial(self._sum_sq, partial)
+        self._non_finite += other._non_finite
+
+    @property
+    def total(self):
+        if self._non_finite:
+            return self._non_finite
+        return math.fsum(self._sum)
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    @property
+    def std(self):
+        """Sample standard deviation, 0 for a single value (as calculate_stats)"""
+        if self.count == 0:
+            return None
+        if self.count == 1:
+            return 0
+        if self._non_finite:
+            return math.nan
+        total = sum(map(Fraction, self._sum), Fraction(0))
+        total_sq = sum(map(Fraction, self._sum_sq), Fraction(0))
+        variance = (total_sq - total * total / self.count) / (self.count - 1)
+        return math.sqrt(max(float(variance), 0.0))
+
+    def as_dict(self):
+        """Return the same dict shape as calculate_stats"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.minimum,
+            'max': self.maximum,
+            'std': self.std
+        }
+
+class GroupStats:
+    """Row count plus one RunningStats per value column for a single group
+
+    histograms maps value columns to the bin scheme of a Histogram their
+    RunningStats fill alongside the moments.
+    """
+    __slots__ = ('size', 'columns')
+
+    def __init__(self, value_columns, histograms=None):
+        self.size = 0
+        histograms = histograms or {}
+        self.columns = {name: RunningStats(Histogram(histograms[name]) if name in histograms else None)
+                        for name in value_columns}
+
+    def merge(self, other):
+        """Fold another group's accumulators into this one"""
+        self.size += other.size
+        for name, stats in other.columns.items():
+            self.columns[name].merge(stats)
+
+class Grouping(dict):
+    """Ordered {group_key: GroupStats} mapping for one grouping set"""
+
+    def sizes(self):
+        return [stats.size for stats in self.values()]
+
+    def largest(self, n):
+        """Return the n largest (group_key, size) pairs, ties in first-seen order"""
+        # A bounded heap instead of sorting every group; nlargest is stable like sorted
+        ranked = heapq.nlargest(n, self.items(), key=lambda x: x[1].size)
+        return [(key, stats.size) for key, stats in ranked]
+
+    def means(self, column):
+        """Return the per-group means of a value column, skipping empty groups"""
+        means = []
+        for stats in self.values():
+            column_stats = stats.columns.get(column)
+            if column_stats is not None and column_stats.mean is not None:
+                means.append(column_stats.mean)
+        return means
+
+    def histograms(self, column):
+        """Return (group_key, Histogram) of a value column for the groups that filled one"""
+        histograms = []
+        for key, stats in self.items():
+            column_stats = stats.columns.get(column)
+            if column_stats is not None and column_stats.histogram is not None:
+                histograms.append((key, column_stats.histogram))
+        return histograms
+
+    def leaderboards(self, template):
+        """Fill an empty copy of a leaderboards.Leaderboards from every group, in one pass"""
+        boards = template.empty()
+        for sequence, (key, stats) in enumerate(self.items()):
+            boards.add_group(key, stats, sequence)
+        return boards
+
+class UniqueKeyGrouping:
+    """Projection standing in for a grouping whose key is unique per row
+
+    Every group holds exactly one row, so instead of one GroupStats per row this
+    keeps the keys and parsed values as plain columns in row order. It answers
+    the same sizes/largest/means/leaderboards questions as Grouping.
+    """
+
+    def __init__(self, value_columns):
+        self.keys = []
+        self.values = {name: [] for name in value_columns}
+
+    def append(self, key, row_values):
+        self.keys.append(key)
+        for name, value in row_values:
+            self.values[name].append(value)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def sizes(self):
+        return [1] * len(self.keys)
+
+    def largest(self, n):
+        return [(key, 1) for key in self.keys[:n]]
+
+    def means(self, column):
+        return [value for value in self.values.get(column, []) if value is not None]
+
+    def histograms(self, column):
+        # A single value per group has no distribution to report
+        return []
+
+    def leaderboards(self, template):
+        boards = template.empty()
+        names = list(self.values)
+        for sequence, key in enumerate(self.keys):
+            boards.add_row(key, [(name, self.values[name][sequence]) for name in names], sequence)
+        return boards
+
+def rollup_groups(groups, key_positions, value_columns):
+    """Merge finer groups into coarser ones without touching the raw rows
+
+    key_positions picks the coarse key out of each fine key. Coarse groups keep
+    the order in which their first fine group appeared, which is also the order
+    of first appearance in the data.
+    """
+    rolled = Grouping()
+    for key, stats in groups.items():
+        coarse_key = tuple(key[i] for i in key_positions)
+        target = rolled.get(coarse_key)
+        if target is None:
+            target = rolled[coarse_key] = GroupStats(value_columns)
+        target.merge(stats)
+    return rolled
+
+def compute_grouping_sets(rows, headers, key_sets, value_columns, parse_value=safe_float, unique_key=None,
+                          histograms=None):
+    """Compute every grouping set in one scan (GROUPING SETS / ROLLUP style)
+
+    rows are lists of raw cell strings aligned with headers. The key set with
+    the most columns is aggregated directly from the rows; every other key set
+    must be a subset of it and is rolled up from those partial aggregates.
+    Key columns missing from headers are dropped, as analyze_grouped_data
+    always did; a key set left empty maps to None.
+
+    unique_key names columns known to identify each row (a declared primary key
+    or one detected from column statistics). When the finest key set contains
+    it, that level is kept as a UniqueKeyGrouping projection and the coarser
+    sets are aggregated from the rows in the same scan.
+
+    histograms maps value columns to bin schemes; their per-group histograms
+    are filled in the same scan and rolled up with the other statistics.
+
+    Returns {tuple(key_set): Grouping or UniqueKeyGrouping}.
+    """
+    present = {tuple(key_set): tuple(col for col in key_set if col in headers) for key_set in key_sets}
+    finest = max(present.values(), key=len)
+    for requested, columns in present.items():
+        missing = [col for col in columns if col not in finest]
+        if missing:
+            raise ValueError(f"Grouping set {list(requested)} is not a subset of {list(finest)}: {missing}")
+
+    value_columns = [col for col in value_columns if col in headers]
+    value_indices = [(col, headers.index(col)) for col in value_columns]
+
+    # With a unique finest key, aggregate the union of the coarser sets instead
+    projection = None
+    base = finest
+    if finest and unique_key and set(unique_key) <= set(finest):
+        coarser_columns = set(col for columns in present.values() if columns != finest for col in columns)
+        projection = UniqueKeyGrouping(value_columns)
+        base = tuple(col for col in finest if col in coarser_columns)
+        if base == finest:
+            projection = None
+    finest_indices = [headers.index(col) for col in finest]
+    base_indices = [headers.index(col) for col in base]
+
+    base_groups = Grouping()
+    if finest:
+        for row in rows:
+            row_values = [(col_name, parse_value(row[col_idx]) if col_idx < len(row) else None)
+                          for col_name, col_idx in value_indices]
+            if projection is not None:
+                projection.append(tuple(row[i] if i < len(row) else '' for i in finest_indices), row_values)
+                if not base:
+                    continue
+            group_key = tuple(row[i] if i < len(row) else '' for i in base_indices)
+            stats = base_groups.get(group_key)
+            if stats is None:
+                stats = base_groups[group_key] = GroupStats(value_columns, histograms)
+            stats.size += 1
+            for col_name, value in row_values:
+                stats.columns[col_name].add(value)
+
+    results = {}
+    for requested, columns in present.items():
+        if not columns:
+            results[requested] = None
+        elif projection is not None and columns == finest:
+            results[requested] = projection
+        elif columns == base:
+            results[requested] = base_groups
+        else:
+            positions = [base.index(col) for col in columns]
+            results[requested] = rollup_groups(base_groups, positions, value_columns)
+    return results
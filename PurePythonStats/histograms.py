@@ -0,0 +1,221 @@
+import math
+
+# Bin parameter used when a scheme is named without one
+DEFAULT_BINS_PER_DECADE = 10
+DEFAULT_SIGNIFICANT_DIGITS = 2
+
+# Quantiles reported from every histogram
+REPORTED_QUANTILES = (0.5, 0.9, 0.99)
+
+# Non-empty bins one histogram may hold before its scheme is rejected as too fine
+MAX_BINS = 1 << 18
+
+
+class FixedBins:
+    """Bins of equal width over the magnitude: [k * width, (k + 1) * width)"""
+
+    def __init__(self, width):
+        if not 0 < width < math.inf:
+            raise ValueError(f"Fixed bin width must be positive and finite, not {width}")
+        self.width = float(width)
+
+    def index(self, magnitude):
+        return int(magnitude // self.width)
+
+    def edges(self, index):
+        return index * self.width, (index + 1) * self.width
+
+    def describe(self):
+        return f"fixed:{self.width:g}"
+
+class LogBins:
+    """bins_per_decade bins per power of ten: [10 ** (k / n), 10 ** ((k + 1) / n))"""
+
+    def __init__(self, bins_per_decade=DEFAULT_BINS_PER_DECADE):
+        if int(bins_per_decade) < 1:
+            raise ValueError(f"Log bins need at least one bin per decade, not {bins_per_decade}")
+        self.bins_per_decade = int(bins_per_decade)
+
+    def index(self, magnitude):
+        return math.floor(math.log10(magnitude) * self.bins_per_decade)
+
+    def edges(self, index):
+        return 10 ** (index / self.bins_per_decade), 10 ** ((index + 1) / self.bins_per_decade)
+
+    def describe(self):
+        return f"log:{self.bins_per_decade}"
+
+class HdrBins:
+    """HDR-histogram bins: every power of two split into equal linear sub-buckets
+
+    With the next power of two above 10 ** significant_digits sub-buckets,
+    every bin is narrower than 10 ** -significant_digits of the values in it,
+    whatever their magnitude.
+    """
+
+    def __init__(self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        if not 1 <= int(significant_digits) <= 5:
+            raise ValueError(f"HDR bins keep 1 to 5 significant digits, not {significant_digits}")
+        self.significant_digits = int(significant_digits)
+        self.sub_buckets = 1 << math.ceil(math.log2(10 ** self.significant_digits))
+
+    def index(self, magnitude):
+        # magnitude = mantissa * 2 ** exponent with mantissa in [0.5, 1)
+        mantissa, exponent = math.frexp(magnitude)
+        return exponent * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+
+    def edges(self, index):
+        exponent, sub_bucket = divmod(index, self.sub_buckets)
+        step = 0.5 / self.sub_buckets
+        return (math.ldexp(0.5 + sub_bucket * step, exponent),
+                math.ldexp(0.5 + (sub_bucket + 1) * step, exponent))
+
+    def describe(self):
+        return f"hdr:{self.significant_digits}"
+
+SCHEMES = {'fixed': FixedBins, 'log': LogBins, 'hdr': HdrBins}
+
+def parse_scheme(text):
+    """Bins from 'fixed:WIDTH', 'log[:BINS_PER_DECADE]' or 'hdr[:SIGNIFICANT_DIGITS]'"""
+    name, _, parameter = text.partition(':')
+    if name not in SCHEMES:
+        raise ValueError(f"Unknown histogram scheme {name!r}; use one of {', '.join(SCHEMES)}")
+    if not parameter:
+        if name == 'fixed':
+            raise ValueError("Fixed histogram bins need a width, as in fixed:1000")
+        return SCHEMES[name]()
+    return SCHEMES[name](float(parameter) if name == 'fixed' else int(parameter))
+
+class _Bins:
+    """int64 counts of the bin indices hit so far, keyed by index
+
+    Only bins holding a value take memory, so a fine scheme over widely
+    spread values costs one entry per distinct bin, not one per bin between
+    the smallest and largest.
+    """
+
+    __slots__ = ('counts',)
+
+    def __init__(self):
+        self.counts = {}
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, index, count=1):
+        self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.add(index, count)
+
+    def items(self):
+        return sorted(self.counts.items())
+
+    def copy(self):
+        bins = _Bins()
+        bins.counts = dict(self.counts)
+        return bins
+
+class Histogram:
+    """Counts of one column's values in the bins of a scheme, filled in one pass
+
+    Positive and negative values are binned by magnitude into two sparse
+    sets of counts holding only the bins hit so far; zeros are counted apart
+    and missing or non-finite values are skipped. A histogram that would
+    hold more than MAX_BINS bins raises ValueError: its scheme is too fine
+    for the values. Merging adds counts bin by bin, so histograms of chunks,
+    worker processes or groups combine exactly in any order.
+    """
+
+    __slots__ = ('scheme', 'count', 'zeros', 'positive', 'negative', 'minimum', 'maximum')
+
+    def __init__(self, scheme):
+        self.scheme = scheme
+        self.count = 0
+        self.zeros = 0
+        self.positive = _Bins()
+        self.negative = _Bins()
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        if value is None or not math.isfinite(value):
+            return
+        self.count += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if value > 0:
+            self.positive.add(self.scheme.index(value))
+        elif value < 0:
+            self.negative.add(self.scheme.index(-value))
+        else:
+            self.zeros += 1
+            return
+        self._check_bins()
+
+    def merge(self, other):
+        if self.scheme.describe() != other.scheme.describe():
+            raise ValueError(f"Cannot merge {other.scheme.describe()} bins into {self.scheme.describe()} bins")
+        if not other.count:
+            return
+        self.count += other.count
+        self.zeros += other.zeros
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self._check_bins()
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+
+    def bin_count(self):
+        """Non-empty bins held, zeros apart"""
+        return len(self.positive) + len(self.negative)
+
+    def _check_bins(self):
+        if self.bin_count() > MAX_BINS:
+            raise ValueError(f"{self.scheme.describe()} histogram bins are too fine for these values "
+                             f"(over {MAX_BINS} non-empty bins); use wider fixed bins or log/hdr bins")
+
+    def copy(self):
+        histogram = Histogram(self.scheme)
+        histogram.count = self.count
+        histogram.zeros = self.zeros
+        histogram.positive = self.positive.copy()
+        histogram.negative = self.negative.copy()
+        histogram.minimum = self.minimum
+        histogram.maximum = self.maximum
+        return histogram
+
+    def bins(self):
+        """[(low, high, count)] in ascending order of value, empty bins left out"""
+        bins = []
+        for index, count in reversed(self.negative.items()):
+            low, high = self.scheme.edges(index)
+            bins.append((-high, -low, count))
+        if self.zeros:
+            bins.append((0.0, 0.0, self.zeros))
+        for index, count in self.positive.items():
+            low, high = self.scheme.edges(index)
+            bins.append((low, high, count))
+        return bins
+
+    def quantile(self, q):
+        """Approximate q-quantile, interpolated inside its bin and kept within the observed range"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for low, high, count in self.bins():
+            if seen + count >= rank:
+                value = low + (high - low) * max(0.0, rank - seen) / count
+                return min(max(value, self.minimum), self.maximum)
+            seen += count
+        return self.maximum
+
+    def compact(self):
+        """The non-empty bins as 'low..high:count' separated by ';', for one results cell"""
+        return ';'.join(f"{low:.6g}..{high:.6g}:{count}" for low, high, count in self.bins())
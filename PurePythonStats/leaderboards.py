@@ -0,0 +1,120 @@
+import heapq
+import math
+
+# Groups kept at each end of a leaderboard unless --leaderboard-size says otherwise
+DEFAULT_LEADERBOARD_SIZE = 5
+
+# Per-group aggregates a leaderboard can rank by; all but size name a value column
+AGGREGATES = ('size', 'count', 'sum', 'mean', 'min', 'max', 'std')
+
+
+def parse_metric(text):
+    """(aggregate, column) from 'size' or 'AGGREGATE:COLUMN', as in 'sum:estimated_spend'"""
+    aggregate, _, column = text.partition(':')
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {aggregate!r}; use one of {', '.join(AGGREGATES)}")
+    if aggregate == 'size':
+        if column:
+            raise ValueError("The size aggregate counts rows and takes no column")
+        return ('size', None)
+    if not column:
+        raise ValueError(f"The {aggregate} aggregate needs a column, as in {aggregate}:COLUMN")
+    return (aggregate, column)
+
+def metric_name(metric):
+    aggregate, column = metric
+    return aggregate if column is None else f"{aggregate}:{column}"
+
+def group_metric(stats, metric):
+    """Value of metric for one GroupStats, or None when it has nothing to rank"""
+    aggregate, column = metric
+    if aggregate == 'size':
+        return stats.size
+    column_stats = stats.columns.get(column)
+    if column_stats is None:
+        return None
+    if aggregate == 'count':
+        return column_stats.count
+    if not column_stats.count:
+        return None
+    value = {'sum': column_stats.total, 'mean': column_stats.mean, 'min': column_stats.minimum,
+             'max': column_stats.maximum, 'std': column_stats.std}[aggregate]
+    # nan has no place in an ordering
+    return value if math.isfinite(value) else None
+
+class Leaderboard:
+    """The size top and bottom groups by one metric, kept in two bounded heaps
+
+    Groups are offered once each with a sequence number (their order of first
+    appearance); equal values rank the earlier group first, like a stable
+    sort. Offering n groups costs O(n log size) and memory stays at 2 * size
+    entries however many groups there are. Leaderboards of disjoint sets of
+    groups numbered on one scale, such as spill partitions, merge into the
+    leaderboard of their union.
+    """
+
+    def __init__(self, metric, size=DEFAULT_LEADERBOARD_SIZE):
+        self.metric = metric
+        self.size = size
+        self._top = []  # min-heap of (value, -sequence, key)
+        self._bottom = []  # min-heap of (-value, -sequence, key)
+
+    def _offer(self, heap, entry):
+        if len(heap) < self.size:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def add(self, key, value, sequence):
+        if value is None:
+            return
+        self._offer(self._top, (value, -sequence, key))
+        self._offer(self._bottom, (-value, -sequence, key))
+
+    def merge(self, other):
+        for entry in other._top:
+            self._offer(self._top, entry)
+        for entry in other._bottom:
+            self._offer(self._bottom, entry)
+
+    def top(self):
+        """[(key, value)] from the highest value down"""
+        return [(key, value) for value, _, key in sorted(self._top, reverse=True)]
+
+    def bottom(self):
+        """[(key, value)] from the lowest value up"""
+        return [(key, -value) for value, _, key in sorted(self._bottom, reverse=True)]
+
+class Leaderboards:
+    """One Leaderboard per metric, all filled from the same finished groups"""
+
+    def __init__(self, metrics, size=DEFAULT_LEADERBOARD_SIZE):
+        self.metrics = list(metrics)
+        self.size = size
+        self.boards = {metric: Leaderboard(metric, size) for metric in self.metrics}
+
+    def empty(self):
+        """A new, empty Leaderboards for the same metrics and size"""
+        return Leaderboards(self.metrics, self.size)
+
+    def add_group(self, key, stats, sequence):
+        """Offer one finished GroupStats to every leaderboard"""
+        for metric, board in self.boards.items():
+            board.add(key, group_metric(stats, metric), sequence)
+
+    def add_row(self, key, row_values, sequence):
+        """Offer a group holding a single row, given as its [(column, parsed value)]"""
+        values = dict(row_values)
+        for metric, board in self.boards.items():
+            aggregate, column = metric
+            value = values.get(column)
+            if aggregate == 'size':
+                board.add(key, 1, sequence)
+            elif aggregate == 'count':
+                board.add(key, int(value is not None), sequence)
+            elif value is not None and math.isfinite(value):
+                board.add(key, 0 if aggregate == 'std' else value, sequence)
+
+    def merge(self, other):
+        for metric, board in other.boards.items():
+            self.boards[metric].merge(board)
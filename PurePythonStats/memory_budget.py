@@ -0,0 +1,253 @@
+import csv
+import gc
+import os
+import sys
+import tracemalloc
+
+from column_profiles import DEFAULT_TOP_CAPACITY, ColumnProfile
+from compressed_input import input_size, open_input_text
+from spill_aggregation import estimate_groups_mb
+from type_inference import DEFAULT_BLOCK_ROWS, DEFAULT_HEAD_ROWS, DEFAULT_SAMPLE_BLOCKS, NUMERIC, infer_column_types
+
+# Share of the limit at which the next cheaper strategy is chosen
+DEGRADE_AT = 0.8
+
+# Rows between memory checks while reading or streaming
+CHECK_EVERY = 2000
+
+# Rows read to estimate how large the materialised dataset would be
+ESTIMATE_ROWS = 2000
+
+# Smallest group-by budget handed to the spilling aggregation, headroom permitting
+MIN_SPILL_MB = 8
+
+# Group-by budget once no headroom is left at all: groups spill almost at once
+SPILL_FLOOR_MB = 0.5
+
+
+def rss_mb():
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class MemoryBudget:
+    """Live memory tracking against a limit, with a log of every strategy downgrade
+
+    Usage is the smaller of RSS and tracemalloc's traced Python memory plus
+    the non-Python baseline measured at start: RSS alone stays high after
+    large structures are freed (the allocator keeps its arenas), while traced
+    memory drops immediately.
+    """
+
+    def __init__(self, limit_mb):
+        self.limit_mb = limit_mb
+        tracemalloc.start()
+        self.baseline_mb = max(0.0, rss_mb() - tracemalloc.get_traced_memory()[0] / (1024 * 1024))
+        self.peak_rss_mb = 0.0
+        self.peak_traced_mb = 0.0
+        self.downgrades = []
+        self.approximate = {}
+
+    def usage_mb(self):
+        rss = rss_mb()
+        traced, traced_peak = (value / (1024 * 1024) for value in tracemalloc.get_traced_memory())
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        self.peak_traced_mb = max(self.peak_traced_mb, traced_peak)
+        return min(rss, traced + self.baseline_mb)
+
+    def pressure(self):
+        """Usage as a share of the limit"""
+        return self.usage_mb() / self.limit_mb
+
+    def headroom_mb(self):
+        return max(0.0, self.limit_mb * DEGRADE_AT - self.usage_mb())
+
+    def downgrade(self, stage, change, reason):
+        """Record (and print) a switch to a cheaper strategy"""
+        self.downgrades.append((stage, change, reason))
+        print(f"Memory budget: {stage}: {change} ({reason})")
+
+    def mark_approximate(self, column, metrics):
+        self.approximate[column] = list(metrics)
+
+    def metadata_rows(self):
+        """(column_name, metric, value) rows describing the run for the results file"""
+        self.usage_mb()
+        rows = [('MEMORY', 'memory_limit_mb', self.limit_mb),
+                ('MEMORY', 'peak_rss_mb', round(self.peak_rss_mb, 1)),
+                ('MEMORY', 'peak_traced_mb', round(self.peak_traced_mb, 1))]
+        for i, (stage, change, reason) in enumerate(self.downgrades):
+            rows.append(('MEMORY', f'downgrade_{i + 1}', f"{stage}: {change} ({reason})"))
+        for column, metrics in self.approximate.items():
+            rows.append((column, 'approximate_metrics', ','.join(metrics)))
+        return rows
+
+    def stop(self):
+        tracemalloc.stop()
+
+class CsvRows:
+    """Re-iterable rows of a CSV file, read from disk on every pass instead of held in memory
+
+    Rows are padded to the header length like the materialised data.
+    len() counts the rows with one extra pass the first time it is needed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open_input_text(filename, newline='') as file:
+            self.headers = next(csv.reader(file))
+        self._count = None
+
+    def __iter__(self):
+        width = len(self.headers)
+        count = 0
+        with open_input_text(self.filename, newline='') as file:
+            reader = csv.reader(file)
+            next(reader)
+            for row in reader:
+                while len(row) < width:
+                    row.append('')
+                count += 1
+                yield row
+        self._count = count
+
+    def __len__(self):
+        if self._count is None:
+            for _ in self:
+                pass
+        return self._count
+
+    def head(self, n):
+        rows = []
+        for row in self:
+            if len(rows) == n:
+                break
+            rows.append(row)
+        return rows
+
+def estimate_materialized_mb(filename, sample_rows=ESTIMATE_ROWS):
+    """Approximate MB the whole CSV takes as a list of lists of str
+
+    The first sample_rows rows give the in-memory bytes per row and (re-encoded
+    as CSV text) the file bytes per row; the uncompressed file size scales that up.
+    """
+    file_size = input_size(filename)
+    memory = 0
+    encoded = 0
+    rows = 0
+    with open_input_text(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            memory += sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row) + 8
+            encoded += len(','.join(row).encode('utf-8')) + 1
+            rows += 1
+            if rows == sample_rows:
+                break
+    if rows == 0:
+        return 0.0
+    return memory / encoded * file_size / (1024 * 1024)
+
+def load_rows_within_budget(filename, budget):
+    """(headers, rows) held in memory, or (headers, CsvRows) once the budget rules that out
+
+    Materialisation is skipped when the estimate does not fit and abandoned
+    as soon as live usage crosses the degrade threshold.
+    """
+    estimate = estimate_materialized_mb(filename)
+    headroom = budget.headroom_mb()
+    if estimate > headroom:
+        budget.downgrade('load', "materialise -> stream from disk",
+                         f"estimated {estimate:.0f} MB of rows, {headroom:.0f} MB of headroom")
+        rows = CsvRows(filename)
+        return rows.headers, rows
+
+    with open_input_text(filename) as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        data = []
+        for row in reader:
+            while len(row) < len(headers):
+                row.append('')
+            data.append(row)
+            if len(data) % CHECK_EVERY == 0 and budget.pressure() > DEGRADE_AT:
+                budget.downgrade('load', "materialise -> stream from disk",
+                                 f"{budget.usage_mb():.0f} MB used after {len(data)} rows")
+                data = None
+                gc.collect()
+                rows = CsvRows(filename)
+                return rows.headers, rows
+    return headers, data
+
+def stream_column_profiles(rows, headers, column_types, budget):
+    """Profile every column in one pass over rows, degrading accumulators under memory pressure
+
+    When usage crosses the threshold, categorical profiles with many distinct
+    values switch to sketches first; numeric value arrays follow at the next
+    check if that was not enough. Each switch is logged and its metrics marked
+    approximate on the budget.
+    """
+    profiles = {header: ColumnProfile(column_types[header]) for header in headers}
+    ordered = [profiles[header] for header in headers]
+    for row_number, row in enumerate(rows, 1):
+        for profile, value in zip(ordered, row):
+            profile.add(value)
+        if row_number % CHECK_EVERY == 0 and budget.pressure() > DEGRADE_AT:
+            _degrade_largest(profiles, budget, row_number)
+    return profiles
+
+def _degrade_largest(profiles, budget, row_number):
+    """Degrade the large categorical profiles or, once none is left, the numeric ones
+
+    Categorical profiles with only a few distinct values cost little and stay exact.
+    """
+    for column_type, smallest in (('categorical', DEFAULT_TOP_CAPACITY), ('numeric', 0)):
+        candidates = [header for header, profile in profiles.items()
+                      if profile.column_type == column_type and profile.held_items() > smallest]
+        for header in candidates:
+            change = profiles[header].degrade()
+            budget.downgrade(f'column {header}', change, f"memory pressure at row {row_number}")
+            budget.mark_approximate(header, profiles[header].approximate)
+        if candidates:
+            gc.collect()
+            return
+
+def head_column_types(rows):
+    """Column types of streamed rows from the head of the file, with a one-line note
+
+    Sampling blocks further in would cost another pass over the file, so
+    the rows the sampler would have read are taken from the start instead.
+    """
+    sample = rows.head(DEFAULT_HEAD_ROWS + DEFAULT_SAMPLE_BLOCKS * DEFAULT_BLOCK_ROWS)
+    types, _ = infer_column_types(rows.headers, sample)
+    numeric = sum(1 for column_type in types.values() if column_type == NUMERIC)
+    return types, (f"{numeric} numeric, {len(types) - numeric} categorical, "
+                   f"typed from the first {len(sample)} rows while streaming")
+
+def groupby_spill_mb(budget, rows, headers, key_columns, value_count):
+    """Memory budget for spill_grouping_sets, or None when a hash group-by over rows fits
+
+    Every row is assumed to start its own group of key_columns, which is the
+    worst case and close to the truth for the per-row keys of these datasets.
+    The budget is half the headroom, raised to MIN_SPILL_MB but never past
+    the headroom itself, and never below SPILL_FLOOR_MB so that a spent
+    budget still spills rather than reading as no budget.
+    """
+    positions = [headers.index(column) for column in key_columns]
+    first = rows[:1] if isinstance(rows, list) else rows.head(1)
+    sample_key = [first[0][i] for i in positions] if first else [''] * len(positions)
+    estimate = estimate_groups_mb(len(rows), sample_key, value_count)
+    headroom = budget.headroom_mb()
+    if estimate <= headroom:
+        return None
+    spill_mb = max(SPILL_FLOOR_MB, min(headroom, max(MIN_SPILL_MB, headroom / 2)))
+    budget.downgrade('group-by', "in-memory hash -> spilling partitions",
+                     f"up to {estimate:.0f} MB of groups, {headroom:.0f} MB of headroom, "
+                     f"{spill_mb:.1f} MB for groups before they spill")
+    return spill_mb
@@ -0,0 +1,84 @@
+import hashlib
+from array import array
+
+
+def message_digest(encoded):
+    """128-bit BLAKE2b digest of a UTF-8 message body: its content address"""
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+class MessagePool:
+    """Every distinct body of a text column stored once, addressed by its digest
+
+    refs holds one integer per row: the position of the row's body in
+    bodies, or -1 for an empty cell. Rows repeating a creative share one
+    str, and the number of distinct refs of a set of rows is its number of
+    distinct messages.
+    """
+
+    def __init__(self):
+        self.bodies = []
+        self.refs = array('l')
+        self.raw_bytes = 0
+        self.pooled_bytes = 0
+        self._by_digest = {}
+
+    def add(self, text):
+        """Pool one cell and return the shared body to keep in its place"""
+        if not text:
+            self.refs.append(-1)
+            return text
+        encoded = text.encode('utf-8')
+        self.raw_bytes += len(encoded)
+        digest = message_digest(encoded)
+        ref = self._by_digest.get(digest)
+        if ref is None:
+            ref = self._by_digest[digest] = len(self.bodies)
+            self.bodies.append(text)
+            self.pooled_bytes += len(encoded)
+        self.refs.append(ref)
+        return self.bodies[ref]
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def message_rows(self):
+        return len(self.refs) - self.refs.count(-1)
+
+    def dedup_ratio(self):
+        """Rows holding a message per distinct message body"""
+        return self.message_rows() / len(self.bodies) if self.bodies else None
+
+def pool_column(headers, rows, column):
+    """MessagePool of one column over rows, or None when the column is missing
+
+    Each row's cell is replaced by the pooled body, so rows held in memory
+    keep a single copy of every distinct message.
+    """
+    if column not in headers:
+        return None
+    i = headers.index(column)
+    pool = MessagePool()
+    for row in rows:
+        if i < len(row):
+            row[i] = pool.add(row[i])
+        else:
+            pool.add('')
+    return pool
+
+def distinct_per_group(pool, rows, headers, key_columns):
+    """[(group key, distinct messages)] in first-appearance order, or None when a key column is missing
+
+    rows must be the rows the pool was built from, in the same order.
+    """
+    if any(col not in headers for col in key_columns):
+        return None
+    key_indices = [headers.index(col) for col in key_columns]
+    groups = {}
+    for row, ref in zip(rows, pool.refs):
+        key = tuple(row[i] if i < len(row) else '' for i in key_indices)
+        refs = groups.get(key)
+        if refs is None:
+            refs = groups[key] = set()
+        if ref >= 0:
+            refs.add(ref)
+    return [(key, len(refs)) for key, refs in groups.items()]
@@ -0,0 +1,90 @@
+import csv
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+
+RESULT_FIELDS = ['analysis_type', 'group_info', 'column_name', 'metric', 'value']
+
+# Metrics whose values are "label:count" strings
+_LABEL_COUNT_PREFIXES = ('most_frequent_', 'top_group_')
+
+
+def _require_pyarrow():
+    """Import pyarrow on demand; only the columnar formats need it"""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need pyarrow (pip install pyarrow)")
+    return pyarrow
+
+def typed_value(metric, value):
+    """Split one long-format value into (value_type, value_int, value_float, value_string)
+
+    "label:count" metrics such as most_frequent_1 and top_group_1 keep the
+    label as a string and the count as an integer.
+    """
+    if value is None:
+        return ('null', None, None, None)
+    if isinstance(value, bool):
+        return ('int', int(value), None, None)
+    if isinstance(value, int):
+        return ('int', value, None, None)
+    if isinstance(value, float):
+        return ('float', None, value, None)
+    text = str(value)
+    if metric.startswith(_LABEL_COUNT_PREFIXES):
+        label, separator, count = text.rpartition(':')
+        if separator and count.isdigit():
+            return ('label_count', int(count), None, label)
+    return ('string', None, None, text)
+
+def results_table(output_data):
+    """Build a typed Arrow table from the add_to_output rows"""
+    pa = _require_pyarrow()
+    schema = pa.schema([
+        ('analysis_type', pa.string()),
+        ('group_info', pa.string()),
+        ('column_name', pa.string()),
+        ('metric', pa.string()),
+        ('value_type', pa.string()),
+        ('value_int', pa.int64()),
+        ('value_float', pa.float64()),
+        ('value_string', pa.string())
+    ])
+    columns = {name: [] for name in schema.names}
+    for row in output_data:
+        for field in ('analysis_type', 'group_info', 'column_name', 'metric'):
+            columns[field].append(row[field])
+        value_type, value_int, value_float, value_string = typed_value(row['metric'], row['value'])
+        columns['value_type'].append(value_type)
+        columns['value_int'].append(value_int)
+        columns['value_float'].append(value_float)
+        columns['value_string'].append(value_string)
+    return pa.table(columns, schema=schema)
+
+def write_results(output_data, filename_prefix, output_format='csv'):
+    """Write the long-format analysis results and return the file name
+
+    csv keeps the original analysis_type/group_info/column_name/metric/value
+    layout. parquet (zstd) and arrow (IPC file) replace the stringly-typed
+    value with value_type plus typed value_int/value_float/value_string columns.
+    """
+    if output_format == 'csv':
+        output_filename = f"{filename_prefix}_analysis_results.csv"
+        with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            for row in output_data:
+                writer.writerow(row)
+    elif output_format == 'parquet':
+        pa = _require_pyarrow()
+        output_filename = f"{filename_prefix}_analysis_results.parquet"
+        pa.parquet.write_table(results_table(output_data), output_filename, compression='zstd')
+    elif output_format == 'arrow':
+        pa = _require_pyarrow()
+        output_filename = f"{filename_prefix}_analysis_results.arrow"
+        pa.feather.write_feather(results_table(output_data), output_filename, compression='zstd')
+    else:
+        raise ValueError(f"Unknown output format {output_format!r}; choose one of {OUTPUT_FORMATS}")
+    return output_filename
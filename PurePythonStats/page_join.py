@@ -0,0 +1,253 @@
+import argparse
+import csv
+import os
+import sys
+
+from comoments import PairMoments
+from compressed_input import input_size, open_input_text, resolve_input
+from grouping_sets import GroupStats, safe_float
+from output_formats import OUTPUT_FORMATS, write_results
+from spill_aggregation import DEFAULT_MEMORY_LIMIT_MB, DEFAULT_PARTITIONS, SpillingAggregator
+
+# The two sides of the page join: dataset file, page key column and the metrics summed per page
+JOIN_SIDES = {
+    'ads': ('2024_fb_ads_president_scored_anon.csv', 'page_id',
+            ['estimated_spend', 'estimated_impressions', 'estimated_audience_size']),
+    'posts': ('2024_fb_posts_president_scored_anon.csv', 'Facebook_Id',
+              ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views', 'Total Views'])
+}
+
+# Page totals correlated across the joined pages
+JOINED_PAIRS = [(('ads', 'estimated_spend'), ('posts', 'Total Interactions')),
+                (('ads', 'estimated_impressions'), ('posts', 'Post Views'))]
+
+# Global list to store all output for CSV
+output_data = []
+
+
+def add_to_output(analysis_type, column_name, metric, value, group_info=""):
+    """Add a result to the output data list"""
+    output_data.append({
+        'analysis_type': analysis_type,
+        'group_info': group_info,
+        'column_name': column_name,
+        'metric': metric,
+        'value': value
+    })
+
+def side_rows(filename):
+    """Yield the header row and then every record of a CSV or its .gz/.zst copy"""
+    with open_input_text(filename, newline='') as file:
+        yield from csv.reader(file)
+
+def _value_indices(headers, value_columns):
+    return [(col, headers.index(col)) for col in value_columns if col in headers]
+
+class PageJoin:
+    """Hash join of per-page aggregates of two datasets on their page key
+
+    The build side is aggregated per key into GroupStats by a
+    SpillingAggregator, with every key string interned so the table, the
+    matches and the output share one copy of each. The probe side is then
+    streamed and aggregated only for keys found in the table, so memory is
+    bounded by the build side's distinct keys, never by either file's rows.
+
+    If the build aggregates outgrow memory_limit_mb the aggregator spills
+    them by partition, and the join turns into a grace hash join: probe
+    records are written to matching partition files and each partition is
+    joined on its own.
+    """
+
+    def __init__(self, build, probe, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, num_partitions=DEFAULT_PARTITIONS,
+                 temp_dir=None):
+        self.build = build
+        self.probe = probe
+        self.memory_limit_mb = memory_limit_mb
+        self.num_partitions = num_partitions
+        self.temp_dir = temp_dir
+        self.build_rows = 0
+        self.build_keys = 0
+        self.probe_rows = 0
+        self.probe_matched = 0
+        self.spill_count = 0
+        self.probe_partitions = 0
+
+    def run(self):
+        """Return [(page key, build GroupStats, probe GroupStats)] in the build side's key order"""
+        build_file, build_key, build_columns = JOIN_SIDES[self.build]
+        rows = side_rows(resolve_input(build_file))
+        headers = next(rows)
+        if build_key not in headers:
+            raise ValueError(f"Join key {build_key!r} not found in {build_file}")
+        key_index = headers.index(build_key)
+        aggregator = SpillingAggregator([key_index], [key_index], _value_indices(headers, build_columns), safe_float,
+                                        self.memory_limit_mb, self.num_partitions, self.temp_dir)
+        try:
+            for row in rows:
+                # Rows without a page never join
+                if key_index < len(row) and row[key_index]:
+                    row[key_index] = sys.intern(row[key_index])
+                    aggregator.add_row(row)
+            self.build_rows = aggregator.rows_seen
+            self.spill_count = aggregator.spill_count
+
+            probe_file, probe_key, probe_columns = JOIN_SIDES[self.probe]
+            rows = side_rows(resolve_input(probe_file))
+            headers = next(rows)
+            if probe_key not in headers:
+                raise ValueError(f"Join key {probe_key!r} not found in {probe_file}")
+            key_index = headers.index(probe_key)
+            value_indices = _value_indices(headers, probe_columns)
+
+            joined = []
+            if not aggregator.spill_count:
+                # Everything fit: one table, and the probe side streams straight past it
+                table = {}
+                for groups in aggregator.merged_partitions():
+                    table.update(groups)
+                joined.extend(self._probe(table, rows, key_index, value_indices))
+            else:
+                paths = self._partition_probe(rows, key_index, value_indices, aggregator)
+                compact_indices = [(col, position + 1) for position, (col, _) in enumerate(value_indices)]
+                for partition, groups in enumerate(aggregator.merged_partitions()):
+                    path = paths.get(partition)
+                    joined.extend(self._probe(groups, side_rows(path) if path else (), 0, compact_indices))
+            joined.sort(key=lambda match: match[0])
+            return [(key, build_stats, probe_stats) for _, key, build_stats, probe_stats in joined]
+        finally:
+            aggregator.cleanup()
+
+    def _probe(self, table, rows, key_index, value_indices):
+        """Aggregate the probe rows whose key is in table; yield (first seen, key, build, probe) per match"""
+        self.build_keys += len(table)
+        matches = {}
+        value_columns = [col for col, _ in value_indices]
+        for row in rows:
+            self.probe_rows += 1
+            if key_index >= len(row):
+                continue
+            entry = table.get((row[key_index],))
+            if entry is None:
+                continue
+            self.probe_matched += 1
+            stats = matches.get(row[key_index])
+            if stats is None:
+                stats = matches[row[key_index]] = GroupStats(value_columns)
+            stats.size += 1
+            for col_name, col_idx in value_indices:
+                stats.columns[col_name].add(safe_float(row[col_idx]) if col_idx < len(row) else None)
+        for key, (first_seen, build_stats) in table.items():
+            probe_stats = matches.get(key[0])
+            if probe_stats is not None:
+                yield first_seen, key[0], build_stats, probe_stats
+
+    def _partition_probe(self, rows, key_index, value_indices, aggregator):
+        """Write each probe record's key and value cells to the file of its build partition"""
+        paths = {}
+        files = {}
+        writers = {}
+        try:
+            for row in rows:
+                if key_index >= len(row) or not row[key_index]:
+                    self.probe_rows += 1
+                    continue
+                key = row[key_index]
+                # The same partition function SpillingAggregator applies to the build keys
+                partition = hash((key,)) % aggregator.num_partitions
+                probe_file = files.get(partition)
+                if probe_file is None:
+                    paths[partition] = os.path.join(aggregator.temp_dir, f'probe_{partition}.csv')
+                    probe_file = files[partition] = open(paths[partition], 'w', newline='', encoding='utf-8')
+                    writers[partition] = csv.writer(probe_file)
+                writers[partition].writerow([key] + [row[col_idx] if col_idx < len(row) else ''
+                                                     for _, col_idx in value_indices])
+        finally:
+            for probe_file in files.values():
+                probe_file.close()
+        self.probe_partitions = len(paths)
+        return paths
+
+def report_join(join, joined):
+    """Print the join summary and add it, and every joined page's totals, to the output"""
+    build_key = JOIN_SIDES[join.build][1]
+    print(f"\n{'='*60}")
+    print(f"FACEBOOK ADS x FACEBOOK POSTS BY PAGE")
+    print(f"{'='*60}")
+    print(f"Build side: {join.build} ({join.build_rows} rows, {join.build_keys} {build_key} values)")
+    print(f"Probe side: {join.probe} ({join.probe_rows} rows, {join.probe_matched} on a joined page)")
+    print(f"Joined pages: {len(joined)}")
+    if join.spill_count:
+        print(f"Build side spilled {join.spill_count} times; probe rows split into {join.probe_partitions} partitions")
+
+    add_to_output("Join_Summary", join.build, "build_rows", join.build_rows)
+    add_to_output("Join_Summary", join.build, "build_keys", join.build_keys)
+    add_to_output("Join_Summary", join.probe, "probe_rows", join.probe_rows)
+    add_to_output("Join_Summary", join.probe, "probe_rows_matched", join.probe_matched)
+    add_to_output("Join_Summary", "PAGES", "joined_pages", len(joined))
+    add_to_output("Join_Summary", "PAGES", "build_spills", join.spill_count)
+
+    # Side name -> that side's GroupStats of one joined page
+    pages = [(key, {join.build: build_stats, join.probe: probe_stats}) for key, build_stats, probe_stats in joined]
+
+    for (side_x, column_x), (side_y, column_y) in JOINED_PAIRS:
+        moments = PairMoments()
+        for _, sides in pages:
+            x, y = sides[side_x].columns.get(column_x), sides[side_y].columns.get(column_y)
+            if x is not None and y is not None and x.count and y.count:
+                moments.add(x.total, y.total)
+        pair = f"{side_x}.{column_x} ~ {side_y}.{column_y}"
+        pearson = moments.pearson()
+        print(f"  {pair} (page totals): n={moments.n}, pearson={pearson if pearson is None else f'{pearson:.4f}'}")
+        add_to_output("Join_Summary", pair, "page_count", moments.n)
+        if pearson is not None:
+            add_to_output("Join_Summary", pair, "pearson", pearson)
+
+    for key, sides in pages:
+        # Pages are named by their fb_ads key whichever side was built
+        group_info = f"{JOIN_SIDES['ads'][1]}={key}"
+        for side in ('ads', 'posts'):
+            stats = sides[side]
+            add_to_output("Joined_page", side, "rows", stats.size, group_info)
+            for col_name, column_stats in stats.columns.items():
+                if column_stats.count:
+                    add_to_output("Joined_page", f"{side}.{col_name}", "sum", column_stats.total, group_info)
+                    add_to_output("Joined_page", f"{side}.{col_name}", "mean", column_stats.mean, group_info)
+
+def main():
+    """Join Facebook ads and posts on their page and report per-page totals of both"""
+    parser = argparse.ArgumentParser(description="Streaming hash join of fb_ads page_id with fb_posts Facebook_Id")
+    parser.add_argument('--build', choices=['auto', 'ads', 'posts'], default='auto',
+                        help="Side aggregated into the hash table (default: the smaller file)")
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="Memory for the build side's aggregates before they spill to disk")
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help="Partitions the build and probe sides are split into once the build side spills")
+    parser.add_argument('--temp-dir', default=None, help="Directory for spilled partitions")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+    args = parser.parse_args()
+    if args.partitions < 1:
+        parser.error("--partitions must be at least 1")
+    if args.memory_mb <= 0:
+        parser.error("--memory-mb must be positive")
+
+    build = args.build
+    if build == 'auto':
+        # The hash table holds the side whose file is smaller
+        sizes = {side: input_size(resolve_input(JOIN_SIDES[side][0])) for side in JOIN_SIDES}
+        build = min(sizes, key=sizes.get)
+    probe = 'posts' if build == 'ads' else 'ads'
+
+    try:
+        join = PageJoin(build, probe, args.memory_mb, args.partitions, args.temp_dir)
+        joined = join.run()
+        report_join(join, joined)
+        output_filename = write_results(output_data, "fb_ads_fb_posts_join", args.output_format)
+        print(f"\nJoin results saved to: {output_filename}")
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+    except ValueError as e:
+        print(f"Error joining the page datasets: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import csv
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from column_profiles import ColumnProfile
+from comoments import CorrelationScan, finite_float
+from compressed_input import open_input_text
+from grouping_sets import GroupStats, Grouping, rollup_groups, safe_float
+
+# Records per batch handed from the reader to the compute side
+DEFAULT_BATCH_ROWS = 5000
+
+# Batches the reader may run ahead of the compute side before it blocks
+DEFAULT_QUEUE_DEPTH = 4
+
+# Worker processes default to every core but the one running the reader and the merges
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_WORKERS = max(0, min(DEFAULT_MAX_WORKERS, (os.cpu_count() or 1) - 1))
+
+_END = None
+
+
+def record_batches(file, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield the CSV text of file in batches of batch_rows whole records
+
+    A line ends a record once the quotes seen since the record started are
+    balanced (escaped quotes are doubled, so they never change the parity),
+    which keeps quoted multi-line fields inside one batch without parsing.
+    """
+    lines = []
+    records = 0
+    quotes = 0
+    for line in file:
+        lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            records += 1
+            if records == batch_rows:
+                yield ''.join(lines)
+                lines = []
+                records = 0
+    if lines:
+        yield ''.join(lines)
+
+def profile_batch(text, width, column_types, key_indices, value_indices, correlation_indices=(),
+                  correlation_group=None, histograms=None):
+    """Column profiles, finest-key groups and correlation co-moments of one batch of CSV text
+
+    Runs in a worker process. Returns (rows, profiles, groups, correlations,
+    seconds busy); profiles are in column order and groups in
+    first-appearance order, so merging batches in file order reproduces a
+    single pass exactly. correlations is a CorrelationScan over the
+    (name, index) pairs of correlation_indices, per the (name, index) of
+    correlation_group if given, or None without correlation columns.
+    Groups fill the histograms of compute_grouping_sets.
+    """
+    start = time.perf_counter()
+    profiles = [ColumnProfile(column_type) for column_type in column_types]
+    value_columns = [name for name, _ in value_indices]
+    groups = Grouping()
+    correlations = None
+    if correlation_indices:
+        correlations = CorrelationScan([name for name, _ in correlation_indices],
+                                       correlation_group[0] if correlation_group else None)
+    rows = 0
+    for row in csv.reader(io.StringIO(text)):
+        while len(row) < width:
+            row.append('')
+        rows += 1
+        for profile, value in zip(profiles, row):
+            profile.add(value)
+        if key_indices:
+            group_key = tuple(row[i] for i in key_indices)
+            stats = groups.get(group_key)
+            if stats is None:
+                stats = groups[group_key] = GroupStats(value_columns, histograms)
+            stats.size += 1
+            for col_name, col_idx in value_indices:
+                stats.columns[col_name].add(safe_float(row[col_idx]))
+        if correlations is not None:
+            group_key = row[correlation_group[1]] if correlation_group else None
+            correlations.add([finite_float(row[i]) for _, i in correlation_indices], group_key)
+    return rows, profiles, groups, correlations, time.perf_counter() - start
+
+class PipelineStats:
+    """Where the time of a pipelined pass went, to show which side is the bottleneck
+
+    The reader stalls on a full queue when compute is slower (backpressure);
+    compute stalls on an empty queue when reading is slower.
+    """
+
+    def __init__(self, batch_rows, queue_depth, workers):
+        self.batch_rows = batch_rows
+        self.queue_depth = queue_depth
+        self.workers = workers
+        self.rows = 0
+        self.batches = 0
+        self.read_s = 0.0
+        self.reader_stall_s = 0.0
+        self.compute_stall_s = 0.0
+        self.worker_wait_s = 0.0
+        self.worker_busy_s = 0.0
+        self.merge_s = 0.0
+        self.peak_queue = 0
+        self.wall_s = 0.0
+
+    def report(self):
+        """Printable summary lines"""
+        mode = f"{self.workers} worker processes" if self.workers else "computed in the main thread"
+        lines = [f"Pipeline: {self.rows} rows in {self.batches} batches of up to {self.batch_rows}, "
+                 f"queue depth {self.queue_depth}, {mode}",
+                 f"  reader:  {self.read_s:.2f} s reading, {self.reader_stall_s:.2f} s stalled on a full queue",
+                 f"  compute: {self.compute_stall_s:.2f} s stalled on an empty queue, "
+                 f"{self.merge_s:.2f} s merging batch results"]
+        if self.workers:
+            lines.append(f"  workers: {self.worker_busy_s:.2f} s busy in total, "
+                         f"{self.worker_wait_s:.2f} s waited on by the main thread")
+        lines.append(f"  peak queue: {self.peak_queue} of {self.queue_depth} batches, wall {self.wall_s:.2f} s")
+        return lines
+
+class _Reader(threading.Thread):
+    """Reads record batches into a bounded queue, blocking while it is full"""
+
+    def __init__(self, filename, batches, batch_rows, stats):
+        super().__init__(name='csv-reader', daemon=True)
+        self.filename = filename
+        self.batches = batches
+        self.batch_rows = batch_rows
+        self.stats = stats
+        self.error = None
+        self.stop = threading.Event()
+
+    def run(self):
+        try:
+            # Opened like read_rows so line endings inside quoted fields match
+            with open_input_text(self.filename) as file:
+                next(csv.reader(file))
+                started = time.perf_counter()
+                for batch in record_batches(file, self.batch_rows):
+                    self.stats.read_s += time.perf_counter() - started
+                    if self.stop.is_set():
+                        return
+                    waited = time.perf_counter()
+                    self.batches.put(batch)
+                    self.stats.reader_stall_s += time.perf_counter() - waited
+                    self.stats.peak_queue = max(self.stats.peak_queue, self.batches.qsize())
+                    started = time.perf_counter()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.batches.put(_END)
+
+class PipelineResult:
+    """Everything one pipelined pass computed: headers, row count, profiles, grouping sets and correlations"""
+
+    def __init__(self, headers, total_rows, profiles, grouping_sets, stats, correlations=None):
+        self.headers = headers
+        self.total_rows = total_rows
+        self.profiles = profiles
+        self.grouping_sets = grouping_sets
+        self.stats = stats
+        self.correlations = correlations
+
+def pipelined_pass(filename, column_types, key_sets, value_columns, batch_rows=DEFAULT_BATCH_ROWS,
+                   queue_depth=DEFAULT_QUEUE_DEPTH, workers=DEFAULT_WORKERS, correlation_columns=(),
+                   correlation_group=None, histograms=None):
+    """Profile every column and compute the grouping sets while the file is still being read
+
+    A reader thread splits the CSV into batches of whole records and feeds
+    them through a queue of queue_depth batches. Each batch is parsed and
+    aggregated by one of workers processes (or the main thread when workers
+    is 0), with at most two batches per worker in flight, so a slow compute
+    side blocks the reader instead of buffering the file. Batch results are
+    merged in file order, which makes them identical to the one-pass
+    profiles and compute_grouping_sets.
+
+    column_types maps each header to its inferred type. With at least two
+    correlation_columns present, their co-moments (overall and per
+    correlation_group) are accumulated in the same pass, as correlation_pass
+    would. histograms are filled per group as in compute_grouping_sets and
+    merged across batches. Returns a PipelineResult.
+    """
+    with open_input_text(filename) as file:
+        headers = next(csv.reader(file))
+    present = {tuple(key_set): tuple(col for col in key_set if col in headers) for key_set in key_sets}
+    finest = max(present.values(), key=len, default=())
+    for requested, columns in present.items():
+        missing = [col for col in columns if col not in finest]
+        if missing:
+            raise ValueError(f"Grouping set {list(requested)} is not a subset of {list(finest)}: {missing}")
+    value_columns = [col for col in value_columns if col in headers]
+    correlation_columns = [col for col in correlation_columns if col in headers]
+    if len(correlation_columns) < 2:
+        correlation_columns = []
+    correlation_group = correlation_group if correlation_columns and correlation_group in headers else None
+    task = (len(headers), [column_types[header] for header in headers], [headers.index(col) for col in finest],
+            [(col, headers.index(col)) for col in value_columns],
+            [(col, headers.index(col)) for col in correlation_columns],
+            (correlation_group, headers.index(correlation_group)) if correlation_group is not None else None,
+            histograms)
+
+    stats = PipelineStats(batch_rows, queue_depth, workers)
+    profiles = [ColumnProfile(column_types[header]) for header in headers]
+    groups = Grouping()
+    correlations = CorrelationScan(correlation_columns, correlation_group) if correlation_columns else None
+
+    def merge(result):
+        rows, batch_profiles, batch_groups, batch_correlations, busy = result
+        started = time.perf_counter()
+        stats.rows += rows
+        stats.batches += 1
+        stats.worker_busy_s += busy
+        for profile, batch_profile in zip(profiles, batch_profiles):
+            profile.merge(batch_profile)
+        for group_key, batch_stats in batch_groups.items():
+            target = groups.get(group_key)
+            if target is None:
+                groups[group_key] = batch_stats
+            else:
+                target.merge(batch_stats)
+        if correlations is not None:
+            correlations.merge(batch_correlations)
+        stats.merge_s += time.perf_counter() - started
+
+    started = time.perf_counter()
+    batches = queue.Queue(maxsize=queue_depth)
+    reader = _Reader(filename, batches, batch_rows, stats)
+    executor = ProcessPoolExecutor(workers) if workers else None
+    in_flight = deque()
+    try:
+        reader.start()
+        while True:
+            waited = time.perf_counter()
+            batch = batches.get()
+            stats.compute_stall_s += time.perf_counter() - waited
+            if batch is _END:
+                break
+            if executor is None:
+                merge(profile_batch(batch, *task))
+                continue
+            in_flight.append(executor.submit(profile_batch, batch, *task))
+            if len(in_flight) >= 2 * workers:
+                waited = time.perf_counter()
+                result = in_flight.popleft().result()
+                stats.worker_wait_s += time.perf_counter() - waited
+                merge(result)
+        while in_flight:
+            waited = time.perf_counter()
+            result = in_flight.popleft().result()
+            stats.worker_wait_s += time.perf_counter() - waited
+            merge(result)
+        if reader.error is not None:
+            raise reader.error
+    finally:
+        reader.stop.set()
+        # Unblock a reader waiting on a full queue so it can see the stop flag
+        while reader.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    stats.wall_s = time.perf_counter() - started
+
+    grouping_sets = {}
+    for requested, columns in present.items():
+        if not columns:
+            grouping_sets[requested] = None
+        elif columns == finest:
+            grouping_sets[requested] = groups
+        else:
+            grouping_sets[requested] = rollup_groups(groups, [finest.index(col) for col in columns], value_columns)
+    return PipelineResult(headers, stats.rows, dict(zip(headers, profiles)), grouping_sets, stats, correlations)
@@ -1,10 +1,40 @@
+import argparse
 import csv
 import math
-from collections import Counter, defaultdict
+import os
+
+from bit_columns import BitProfile, group_true_shares, pack_boolean_columns
+from column_profiles import ColumnProfile
+from comoments import correlation_pass
+from compressed_input import open_input_text, resolve_input
+from grouping_sets import compute_grouping_sets
+from histograms import REPORTED_QUANTILES, parse_scheme
+from leaderboards import DEFAULT_LEADERBOARD_SIZE, Leaderboards, metric_name, parse_metric
+from memory_budget import (CsvRows, MemoryBudget, groupby_spill_mb, head_column_types, load_rows_within_budget,
+                           stream_column_profiles)
+from output_formats import OUTPUT_FORMATS, write_results
+from pipeline import DEFAULT_BATCH_ROWS, DEFAULT_QUEUE_DEPTH, DEFAULT_WORKERS, pipelined_pass
+from result_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB, ENGINE_SOURCES, ResultCache, code_version
+from spill_aggregation import DEFAULT_PARTITIONS, spill_grouping_sets
+from sorted_groupby import DEFAULT_RUN_SIZE, ordered_grouping_sets
+from type_inference import NUMERIC, dataset_schema
 
 # Global list to store all output for CSV
 output_data = []
 
+# Distinct non-null values per categorical column, filled in by analyze_column
+column_unique_counts = {}
+
+# Numeric columns summarised per group by analyze_grouped_data
+GROUP_NUMERIC_COLUMNS = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views', 'Total Views']
+
+# Metrics whose covariance and correlation matrices --correlations reports, overall and per group
+CORRELATION_COLUMNS = ['Likes', 'Comments', 'Shares', 'Post Views']
+CORRELATION_GROUP = 'Facebook_Id'
+
+# Heavy-tailed metrics whose per-group distributions --histograms reports
+HISTOGRAM_COLUMNS = ['Post Views']
+
 def add_to_output(analysis_type, column_name, metric, value, group_info=""):
     """Add analysis result to output data"""
     output_data.append({
@@ -15,25 +45,6 @@ def add_to_output(analysis_type, column_name, metric, value, group_info=""):
         'value': value
     })
 
-def is_numeric(value):
-    """Check if a value can be converted to a number"""
-    if value is None or value == '':
-        return False
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
-
-def safe_float(value):
-    """Convert value to float, return None if not possible"""
-    if value is None or value == '':
-        return None
-    try:
-        return float(value)
-    except ValueError:
-        return None
-
 def calculate_stats(values):
     """Calculate basic statistics for numeric values"""
     numeric_values = [v for v in values if v is not None]
@@ -66,22 +77,18 @@ def calculate_stats(values):
         'std': std
     }
 
-def analyze_column(column_data, column_name, analysis_type="Overall", group_info=""):
-    """Analyze a single column"""
+def analyze_column(column_data, column_name, analysis_type="Overall", group_info="", column_type=None, profile=None):
+    """Analyze a single column as the numeric or categorical type inferred for it"""
     print(f"\n--- Analysis for column: {column_name} ---")
     
-    # Check if column is numeric
-    numeric_values = []
-    all_values = []
-    
-    for value in column_data:
-        all_values.append(value)
-        if is_numeric(value):
-            numeric_values.append(safe_float(value))
+    # Without a streamed profile, the column's values are counted exactly (and, without
+    # an inferred type, typed by the "more than 50% numeric" rule)
+    if profile is None:
+        profile = ColumnProfile.from_values(column_data, column_type)
     
     # Basic counts
-    total_count = len(all_values)
-    non_null_count = len([v for v in all_values if v is not None and v != ''])
+    total_count = profile.total_count
+    non_null_count = profile.non_null_count
     
     print(f"Total Count: {total_count}")
     print(f"Non-null Count: {non_null_count}")
@@ -90,9 +97,9 @@ def analyze_column(column_data, column_name, analysis_type="Overall", group_info
     add_to_output(analysis_type, column_name, "total_count", total_count, group_info)
     add_to_output(analysis_type, column_name, "non_null_count", non_null_count, group_info)
     
-    # If mostly numeric, treat as numeric
-    if len(numeric_values) > total_count * 0.5:  # More than 50% numeric
-        stats = calculate_stats(numeric_values)
+    # Numeric columns parse each value once; categorical ones are never parsed
+    if profile.column_type == NUMERIC:
+        stats = profile.stats(calculate_stats)
         print(f"Mean: {stats['mean']:.4f}" if stats['mean'] is not None else "Mean: N/A")
         print(f"Min: {stats['min']}")
         print(f"Max: {stats['max']}")
@@ -105,11 +112,12 @@ def analyze_column(column_data, column_name, analysis_type="Overall", group_info
         add_to_output(analysis_type, column_name, "std", stats['std'], group_info)
     else:
         # Treat as categorical
-        non_null_values = [v for v in all_values if v is not None and v != '']
-        if non_null_values:
-            value_counts = Counter(non_null_values)
-            unique_count = len(value_counts)
-            most_common = value_counts.most_common(5)
+        if non_null_count:
+            unique_count = profile.unique_count()
+            # Sketched counts must not be mistaken for a unique key
+            if not profile.approximate:
+                column_unique_counts[column_name] = unique_count
+            most_common = profile.most_common(5)
             
             print(f"Unique Values: {unique_count}")
             print("Most Frequent Values:")
@@ -121,35 +129,22 @@ def analyze_column(column_data, column_name, analysis_type="Overall", group_info
             for i, (value, count) in enumerate(most_common):
                 add_to_output(analysis_type, column_name, f"most_frequent_{i+1}", f"{value}:{count}", group_info)
 
-def analyze_grouped_data(data, headers, group_columns, group_name):
-    """Analyze data after grouping by specified columns"""
+def analyze_grouped_data(grouping_sets, group_columns, group_name, histogram_columns=(), leaderboards=None):
+    """Report one grouping set computed by compute_grouping_sets, with the distributions of histogram_columns
+    and the top and bottom groups by every metric of leaderboards"""
     print(f"\n{'='*60}")
     print(f"ANALYSIS GROUPED BY {group_name}")
     print(f"{'='*60}")
     
-    # Get indices of grouping columns
-    group_indices = []
-    for col in group_columns:
-        if col in headers:
-            group_indices.append(headers.index(col))
-    
-    if not group_indices:
+    groups = grouping_sets.get(tuple(group_columns))
+    if groups is None:
         print("Grouping columns not found in dataset")
         return
     
-    # Group data
-    groups = defaultdict(list)
-    for row in data:
-        # Create group key
-        group_key = tuple(row[i] if i < len(row) else '' for i in group_indices)
-        groups[group_key].append(row)
-    
     print(f"Number of groups: {len(groups)}")
     
     # Analyze each group
-    group_sizes = []
-    for group_key, group_data in groups.items():
-        group_sizes.append(len(group_data))
+    group_sizes = groups.sizes()
     
     if group_sizes:
         print(f"Group size - Min: {min(group_sizes)}, Max: {max(group_sizes)}, Mean: {sum(group_sizes)/len(group_sizes):.2f}")
@@ -161,105 +156,421 @@ def analyze_grouped_data(data, headers, group_columns, group_name):
         add_to_output(f"Grouped_{group_name}", "GROUP_SUMMARY", "group_size_mean", sum(group_sizes)/len(group_sizes))
     
     # Show top 5 largest groups
-    sorted_groups = sorted(groups.items(), key=lambda x: len(x[1]), reverse=True)
     print("\nTop 5 largest groups:")
-    for i, (group_key, group_data) in enumerate(sorted_groups[:5]):
+    for i, (group_key, group_size) in enumerate(groups.largest(5)):
         group_display = " | ".join(f"{group_columns[j]}={group_key[j]}" for j in range(len(group_key)))
-        print(f"{i+1}. {group_display}: {len(group_data)} records")
+        print(f"{i+1}. {group_display}: {group_size} records")
         
         # Add to output
-        add_to_output(f"Grouped_{group_name}", "TOP_GROUPS", f"top_group_{i+1}", f"{group_display}:{len(group_data)}")
+        add_to_output(f"Grouped_{group_name}", "TOP_GROUPS", f"top_group_{i+1}", f"{group_display}:{group_size}")
     
     # Analyze key numeric columns for aggregated stats
-    numeric_columns = ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views', 'Total Views']
-    
     print(f"\nAggregated statistics for numeric columns:")
-    for col_name in numeric_columns:
-        if col_name in headers:
-            col_idx = headers.index(col_name)
+    for col_name in GROUP_NUMERIC_COLUMNS:
+        # Group means come straight from the mergeable per-group accumulators
+        all_group_stats = groups.means(col_name)
+        
+        if all_group_stats:
+            agg_stats = calculate_stats(all_group_stats)
+            print(f"  {col_name} (group means): Count={agg_stats['count']}, Mean={agg_stats['mean']:.4f}, Min={agg_stats['min']:.4f}, Max={agg_stats['max']:.4f}")
             
-            # Calculate aggregated stats across all groups
-            all_group_stats = []
-            for group_key, group_data in groups.items():
-                column_data = [safe_float(row[col_idx]) if col_idx < len(row) else None for row in group_data]
-                stats = calculate_stats(column_data)
-                if stats['mean'] is not None:
-                    all_group_stats.append(stats['mean'])
+            # Add to output
+            add_to_output(f"Grouped_{group_name}", col_name, "group_means_count", agg_stats['count'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_means_mean", agg_stats['mean'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_means_min", agg_stats['min'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_means_max", agg_stats['max'])
+    
+    # Distributions of the heavy-tailed columns, from the histograms filled in the group-by scan
+    for col_name in histogram_columns:
+        group_histograms = groups.histograms(col_name)
+        if not group_histograms:
+            continue
+        overall = group_histograms[0][1].copy()
+        for _, histogram in group_histograms[1:]:
+            overall.merge(histogram)
+        quantiles = ", ".join(f"p{q * 100:g}={overall.quantile(q):.4g}" for q in REPORTED_QUANTILES)
+        print(f"\n{col_name} distribution ({overall.scheme.describe()} bins, {len(overall.bins())} non-empty): {quantiles}")
+        
+        # Add the overall and per-group histograms to output
+        histogram_rows = [("", overall)]
+        for group_key, histogram in group_histograms:
+            histogram_rows.append((" | ".join(f"{group_columns[j]}={group_key[j]}" for j in range(len(group_key))), histogram))
+        for group_display, histogram in histogram_rows:
+            add_to_output(f"Grouped_{group_name}", col_name, "histogram_bins", histogram.compact(), group_display)
+            for q in REPORTED_QUANTILES:
+                add_to_output(f"Grouped_{group_name}", col_name, f"histogram_p{q * 100:g}", histogram.quantile(q), group_display)
+    
+    # Top and bottom groups by each requested metric, ranked with bounded heaps
+    if leaderboards is not None:
+        for metric, board in groups.leaderboards(leaderboards).boards.items():
+            name = metric_name(metric)
+            print(f"\nLeaderboard by {name}:")
+            for end, ranked in (("top", board.top()), ("bottom", board.bottom())):
+                for i, (group_key, value) in enumerate(ranked):
+                    group_display = " | ".join(f"{group_columns[j]}={group_key[j]}" for j in range(len(group_key)))
+                    print(f"  {end} {i+1}. {group_display}: {value}")
+                    
+                    # Add to output
+                    add_to_output(f"Grouped_{group_name}", name, f"leaderboard_{end}_{i+1}", f"{group_display}:{value}")
+
+def analyze_flag_shares(shares, group_name):
+    """Report the share of true values per group of every bit-packed 0/1 and True/False column"""
+    print(f"\nTrue-value shares of boolean columns by {group_name}:")
+    if shares is None:
+        print("  Needs the rows in memory and the grouping columns (not available in this mode)")
+        return
+    for col_name, group_shares in shares.items():
+        if group_shares:
+            agg_stats = calculate_stats(group_shares)
+            print(f"  {col_name} (group true shares): Count={agg_stats['count']}, Mean={agg_stats['mean']:.4f}, Min={agg_stats['min']:.4f}, Max={agg_stats['max']:.4f}")
             
-            if all_group_stats:
-                agg_stats = calculate_stats(all_group_stats)
-                print(f"  {col_name} (group means): Count={agg_stats['count']}, Mean={agg_stats['mean']:.4f}, Min={agg_stats['min']:.4f}, Max={agg_stats['max']:.4f}")
-                
-                # Add to output
-                add_to_output(f"Grouped_{group_name}", col_name, "group_means_count", agg_stats['count'])
-                add_to_output(f"Grouped_{group_name}", col_name, "group_means_mean", agg_stats['mean'])
-                add_to_output(f"Grouped_{group_name}", col_name, "group_means_min", agg_stats['min'])
-                add_to_output(f"Grouped_{group_name}", col_name, "group_means_max", agg_stats['max'])
+            # Add to output
+            add_to_output(f"Grouped_{group_name}", col_name, "group_true_share_count", agg_stats['count'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_true_share_mean", agg_stats['mean'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_true_share_min", agg_stats['min'])
+            add_to_output(f"Grouped_{group_name}", col_name, "group_true_share_max", agg_stats['max'])
 
-def save_output_to_csv(filename_prefix):
-    """Save output data to CSV file"""
-    output_filename = f"{filename_prefix}_analysis_results.csv"
+def analyze_correlations(scan):
+    """Report the pairwise-complete covariance matrix with Pearson and approximate Spearman correlations"""
+    print(f"\n{'='*60}")
+    print(f"CORRELATIONS")
+    print(f"{'='*60}")
     
-    with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['analysis_type', 'group_info', 'column_name', 'metric', 'value']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        for row in output_data:
-            writer.writerow(row)
+    if scan is None:
+        print("Fewer than two correlation columns found in dataset")
+        return
+    
+    def add_pair(column_a, column_b, count, covariance, pearson, spearman, group_info=""):
+        pair = f"{column_a} ~ {column_b}"
+        add_to_output("Correlation", pair, "pair_count", count, group_info)
+        for metric, value in (("covariance", covariance), ("pearson", pearson), ("spearman_approx", spearman)):
+            if value is not None:
+                add_to_output("Correlation", pair, metric, value, group_info)
+    
+    print("Overall (rows where both columns have a value):")
+    for column_a, column_b, count, covariance, pearson, spearman in scan.overall.results():
+        if column_a == column_b:
+            print(f"  {column_a}: n={count}, variance={covariance if covariance is None else f'{covariance:.4g}'}")
+        else:
+            print(f"  {column_a} ~ {column_b}: n={count}, "
+                  f"covariance={covariance if covariance is None else f'{covariance:.4g}'}, "
+                  f"pearson={pearson if pearson is None else f'{pearson:.4f}'}, "
+                  f"spearman~{spearman if spearman is None else f'{spearman:.4f}'}")
+        add_pair(column_a, column_b, count, covariance, pearson, spearman)
+    
+    if scan.group_column is not None:
+        # Pairs with fewer than two complete rows in a group have no covariance to report
+        reported = 0
+        for group_key, moments in scan.groups.items():
+            for column_a, column_b, count, covariance, pearson, spearman in moments.results():
+                if count >= 2:
+                    add_pair(column_a, column_b, count, covariance, pearson, spearman, f"{scan.group_column}={group_key}")
+                    reported += 1
+        print(f"Per {scan.group_column}: {len(scan.groups)} groups, {reported} column pairs with at least 2 complete rows (in the results file)")
+
+def save_output(filename_prefix, output_format='csv'):
+    """Save output data as CSV, Parquet or Arrow"""
+    output_filename = write_results(output_data, filename_prefix, output_format)
     
     print(f"\nAnalysis results saved to: {output_filename}")
     return output_filename
 
+def read_rows(filename):
+    """Read the CSV header and rows, padding short rows to the header length"""
+    with open_input_text(filename) as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        data = []
+        for row in reader:
+            while len(row) < len(headers):
+                row.append('')
+            data.append(row)
+    return headers, data
+
+def parse_args():
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Analyze Facebook Posts dataset")
+    parser.add_argument('--input-order', choices=['auto', 'sorted', 'clustered', 'unsorted'], default=None,
+                        help="Order of the rows by Facebook_Id; streams the group-bys sort-based instead of hashing them")
+    parser.add_argument('--sort-run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help="Rows per sorted run when unsorted input is sorted externally (results match the hash path)")
+    parser.add_argument('--groupby-memory-mb', type=float, default=None,
+                        help="Memory budget for group-by accumulators; partitions spill to disk beyond it")
+    parser.add_argument('--spill-partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help="Number of hash partitions used when group-bys spill to disk")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Results file format: csv (default), typed zstd Parquet or Arrow IPC")
+    parser.add_argument('--full-type-scan', action='store_true',
+                        help="Type every column from all of its values instead of a sample of the rows")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every stage instead of reusing cached results")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Directory of the result cache")
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_MB,
+                        help="Size bound of the result cache; least recently used stages are evicted beyond it")
+    parser.add_argument('--memory-limit', type=float, default=None, metavar='MB',
+                        help="Track memory and switch to streaming, sketches and spilling as it nears this limit "
+                             "(disables the result cache)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Read the CSV in a background thread while earlier batches are profiled and grouped")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help="Records per pipelined batch")
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help="Batches the pipelined reader may run ahead of the compute side before it blocks")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Worker processes for pipelined batches (0 computes them in the main thread)")
+    parser.add_argument('--correlations', action='store_true',
+                        help="Also report covariance, Pearson and approximate Spearman correlations of the "
+                             "engagement/spend metrics, overall and per group")
+    parser.add_argument('--histograms', default=None, metavar='SCHEME',
+                        help="Fill histograms of the heavy-tailed metrics per group in the group-by scan: "
+                             "fixed:WIDTH, log[:BINS_PER_DECADE] or hdr[:SIGNIFICANT_DIGITS]")
+    parser.add_argument('--flag-shares', action='store_true',
+                        help="Also report the per-group share of true values of every 0/1 and True/False column "
+                             "(keeps those columns as bitmaps too)")
+    parser.add_argument('--leaderboard', action='append', default=[], metavar='METRIC',
+                        help="Also list the top and bottom groups by METRIC: size, or AGGREGATE:COLUMN with AGGREGATE "
+                             "one of count, sum, mean, min, max, std and COLUMN a grouped numeric column (repeatable)")
+    parser.add_argument('--leaderboard-size', type=int, default=DEFAULT_LEADERBOARD_SIZE,
+                        help="Groups listed at each end of every leaderboard")
+    args = parser.parse_args()
+    if args.pipeline and args.memory_limit:
+        parser.error("--pipeline keeps exact column profiles in memory and cannot be combined with --memory-limit")
+    if args.histograms:
+        try:
+            parse_scheme(args.histograms)
+        except ValueError as e:
+            parser.error(f"--histograms: {e}")
+    for metric in args.leaderboard:
+        try:
+            aggregate, column = parse_metric(metric)
+        except ValueError as e:
+            parser.error(f"--leaderboard: {e}")
+        if column is not None and column not in GROUP_NUMERIC_COLUMNS:
+            parser.error(f"--leaderboard: {column!r} is not aggregated per group; use one of {', '.join(GROUP_NUMERIC_COLUMNS)}")
+    if args.leaderboard_size < 1:
+        parser.error("--leaderboard-size must be at least 1")
+    if args.spill_partitions < 1:
+        parser.error("--spill-partitions must be at least 1")
+    if args.groupby_memory_mb is not None and args.groupby_memory_mb <= 0:
+        parser.error("--groupby-memory-mb must be positive")
+    return args
+
 def main():
     """Main function to analyze Facebook Posts dataset"""
-    filename = "2024_fb_posts_president_scored_anon.csv"
+    # A .csv.gz or .csv.zst copy is read in place of a missing CSV
+    filename = resolve_input("2024_fb_posts_president_scored_anon.csv")
     
     print(f"{'='*60}")
     print(f"FACEBOOK POSTS DATASET ANALYSIS")
     print(f"{'='*60}")
     
+    args = parse_args()
+    
+    # Stages run under a memory limit may be approximate, so they are never cached
+    budget = MemoryBudget(args.memory_limit) if args.memory_limit else None
+    cache = ResultCache(args.cache_dir, args.cache_mb, enabled=not args.no_cache and not budget)
+    histograms = {col: parse_scheme(args.histograms) for col in HISTOGRAM_COLUMNS} if args.histograms else None
+    leaderboards = Leaderboards(map(parse_metric, args.leaderboard), args.leaderboard_size) if args.leaderboard else None
+    
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            headers = next(reader)
-            
-            # Read all data
-            data = []
-            for row in reader:
-                # Pad row if shorter than headers
-                while len(row) < len(headers):
-                    row.append('')
-                data.append(row)
-            
-            print(f"Dataset Shape: {len(data)} rows × {len(headers)} columns")
+        # Every stage is keyed by the input's content hash and the code that computes it;
+        # hashing reads the whole file, so it is skipped when nothing is cached
+        stage_base = {
+            'source': cache.fingerprint(filename) if cache.enabled else None,
+            'engine': 'pure',
+            'dataset': 'fb_posts',
+            'code': code_version(__file__, *ENGINE_SOURCES)
+        }
+        loaded = {}
+        
+        def dataset():
+            # The CSV is only read once a stage misses the cache
+            if not loaded:
+                if budget:
+                    # Rows that would not fit the limit are streamed from disk on every pass
+                    loaded['headers'], loaded['data'] = load_rows_within_budget(filename, budget)
+                elif args.pipeline:
+                    # Stages the pipelined pass does not cover stream the rows from disk
+                    rows = CsvRows(filename)
+                    loaded['headers'], loaded['data'] = rows.headers, rows
+                else:
+                    loaded['headers'], loaded['data'] = read_rows(filename)
+                    if args.flag_shares:
+                        # 0/1 and True/False columns are also kept as bitmaps, counted per group by popcount
+                        loaded['packed'] = pack_boolean_columns(loaded['headers'], loaded['data'])
+            return loaded['headers'], loaded['data']
+        
+        schema = {}
+        
+        def column_types():
+            # Inferred from a sample of the rows (or the schema cached for this file)
+            # once, the first time a column has to be profiled
+            if not schema:
+                headers, data = dataset()
+                if isinstance(data, CsvRows):
+                    schema['types'], schema['note'] = head_column_types(data)
+                else:
+                    schema_path = os.path.join(args.cache_dir, 'schemas.json') if not args.no_cache else None
+                    schema['types'], schema['note'] = dataset_schema(headers, data, stage_base['source'], schema_path,
+                                                                     args.full_type_scan)
+            return schema['types']
+        
+        pipelined = {}
+        
+        def pipeline_result():
+            # One pass counts the rows, profiles every column and, unless they are
+            # sort-based or spilled, aggregates the group-bys
+            if not pipelined:
+                key_sets = [] if args.input_order or args.groupby_memory_mb is not None else [['Facebook_Id', 'post_id'], ['Facebook_Id']]
+                pipelined['result'] = pipelined_pass(filename, column_types(), key_sets, GROUP_NUMERIC_COLUMNS,
+                                                     args.batch_rows, args.queue_depth, args.workers,
+                                                     CORRELATION_COLUMNS if args.correlations else (), CORRELATION_GROUP,
+                                                     histograms)
+            return pipelined['result']
+        
+        def dataset_info():
+            headers, data = dataset()
+            # The pipelined pass counts the rows instead of an extra pass over the file
+            total_rows = pipeline_result().total_rows if args.pipeline else len(data)
+            print(f"Dataset Shape: {total_rows} rows × {len(headers)} columns")
             
             # Add basic dataset info to output
-            add_to_output("Dataset_Info", "BASIC", "total_rows", len(data))
+            add_to_output("Dataset_Info", "BASIC", "total_rows", total_rows)
             add_to_output("Dataset_Info", "BASIC", "total_columns", len(headers))
             
             # Overall dataset analysis
             print(f"\n--- OVERALL DATASET ANALYSIS ---")
-            print(f"Total Records: {len(data)}")
-            
-            # Column-by-column analysis
-            print(f"\n--- COLUMN-BY-COLUMN ANALYSIS ---")
-            for i, header in enumerate(headers):
-                column_data = [row[i] if i < len(row) else '' for row in data]
-                analyze_column(column_data, header, "Overall")
+            print(f"Total Records: {total_rows}")
+            return headers, total_rows
+        
+        headers, total_rows = cache.run_collecting(cache.stage_key(stage='dataset_info', **stage_base),
+                                                   output_data, dataset_info)
+        
+        # Column-by-column analysis
+        print(f"\n--- COLUMN-BY-COLUMN ANALYSIS ---")
+        
+        profiles = {}
+        
+        def streamed_profiles():
+            # Streamed rows are profiled for every column in a single pass
+            if not profiles:
+                headers, data = dataset()
+                profiles.update(stream_column_profiles(data, headers, column_types(), budget))
+            return profiles
+        
+        for i, header in enumerate(headers):
+            def column_profile():
+                data = dataset()[1]
+                if args.pipeline:
+                    analyze_column(None, header, "Overall", profile=pipeline_result().profiles[header])
+                elif isinstance(data, CsvRows):
+                    analyze_column(None, header, "Overall", profile=streamed_profiles()[header])
+                elif header in loaded.get('packed', {}):
+                    analyze_column(None, header, "Overall", profile=BitProfile(loaded['packed'][header], column_types()[header]))
+                else:
+                    column_data = [row[i] if i < len(row) else '' for row in data]
+                    analyze_column(column_data, header, "Overall", column_type=column_types()[header])
+                return column_unique_counts.get(header)
             
-            # Group by Facebook_Id (equivalent to page_id)
-            analyze_grouped_data(data, headers, ['Facebook_Id'], "Facebook_Id")
+            unique_count = cache.run_collecting(cache.stage_key(stage='column_profile', column=header, position=i,
+                                                                full_type_scan=args.full_type_scan, **stage_base),
+                                                output_data, column_profile)
+            if unique_count is not None:
+                column_unique_counts[header] = unique_count
+        if schema:
+            print(f"\nColumn types: {schema['note']}")
+        
+        # A key column whose distinct count equals the row count identifies
+        # each row, so the finer grouping needs no hash group-by at all
+        unique_key = None
+        for col in ['Facebook_Id', 'post_id']:
+            if column_unique_counts.get(col) == total_rows:
+                unique_key = [col]
+        
+        computed = {}
+        
+        def grouping_sets():
+            # Compute both grouping sets in one scan; the coarser one is rolled up
+            if not computed:
+                headers, data = dataset()
+                groupby_memory_mb = args.groupby_memory_mb
+                if budget and not args.input_order and groupby_memory_mb is None:
+                    # Under --memory-limit the hash group-by spills once its worst case no longer fits
+                    groupby_memory_mb = groupby_spill_mb(budget, data, headers, ['Facebook_Id', 'post_id'], len(GROUP_NUMERIC_COLUMNS))
+                if args.input_order:
+                    # Clustered input streams one Facebook_Id at a time instead of hashing every group
+                    computed['sets'] = ordered_grouping_sets(data, headers, [['Facebook_Id', 'post_id'], ['Facebook_Id']], GROUP_NUMERIC_COLUMNS, ['Facebook_Id'],
+                                                             args.input_order, args.sort_run_size, histograms=histograms,
+                                                             leaderboards=leaderboards)
+                elif groupby_memory_mb is not None:
+                    # High-cardinality groups spill to disk once the budget is exceeded
+                    computed['sets'] = spill_grouping_sets(data, headers, [['Facebook_Id', 'post_id'], ['Facebook_Id']], GROUP_NUMERIC_COLUMNS,
+                                                           groupby_memory_mb, args.spill_partitions, histograms=histograms,
+                                                           leaderboards=leaderboards)
+                elif args.pipeline:
+                    # Aggregated batch by batch while the file was read
+                    computed['sets'] = pipeline_result().grouping_sets
+                else:
+                    computed['sets'] = compute_grouping_sets(data, headers, [['Facebook_Id', 'post_id'], ['Facebook_Id']], GROUP_NUMERIC_COLUMNS, unique_key=unique_key,
+                                                             histograms=histograms)
+            return computed['sets']
+        
+        group_settings = {'numeric': GROUP_NUMERIC_COLUMNS, 'input_order': args.input_order, 'histograms': args.histograms,
+                          'leaderboards': args.leaderboard, 'leaderboard_size': args.leaderboard_size}
+        
+        # Group by Facebook_Id (equivalent to page_id)
+        cache.run_collecting(cache.stage_key(stage='group_by', columns=['Facebook_Id'], **group_settings, **stage_base), output_data,
+                             lambda: analyze_grouped_data(grouping_sets(), ['Facebook_Id'], "Facebook_Id", HISTOGRAM_COLUMNS, leaderboards))
+        
+        # Group by Facebook_Id and post_id
+        cache.run_collecting(cache.stage_key(stage='group_by', columns=['Facebook_Id', 'post_id'], **group_settings, **stage_base), output_data,
+                             lambda: analyze_grouped_data(grouping_sets(), ['Facebook_Id', 'post_id'], "Facebook_Id + post_id", leaderboards=leaderboards))
+        
+        if args.flag_shares:
+            def flag_shares():
+                # Per-group popcounts of the bitmaps; streamed rows have none
+                headers, data = dataset()
+                if 'packed' not in loaded:
+                    return None
+                return group_true_shares(loaded['packed'], data, headers, ['Facebook_Id'])
             
-            # Group by Facebook_Id and post_id
-            analyze_grouped_data(data, headers, ['Facebook_Id', 'post_id'], "Facebook_Id + post_id")
+            # Pipelined runs have no bitmaps, so the mode is part of the key
+            cache.run_collecting(cache.stage_key(stage='flag_shares', columns=['Facebook_Id'], pipeline=args.pipeline,
+                                                 **stage_base), output_data,
+                                 lambda: analyze_flag_shares(flag_shares(), "Facebook_Id"))
+
+        if args.correlations:
+            def correlations():
+                # Pipelined runs accumulated the co-moments batch by batch; otherwise
+                # one pass over the rows (streamed from disk under a memory limit)
+                if args.pipeline:
+                    return pipeline_result().correlations
+                headers, data = dataset()
+                return correlation_pass(data, headers, CORRELATION_COLUMNS, CORRELATION_GROUP)
             
-            # Save results to CSV
-            output_file = save_output_to_csv("facebook_posts")
-            print(f"\n{'='*60}")
-            print(f"ANALYSIS COMPLETE")
-            print(f"Results saved to: {output_file}")
-            print(f"{'='*60}")
+            cache.run_collecting(cache.stage_key(stage='correlations', columns=CORRELATION_COLUMNS, group=CORRELATION_GROUP,
+                                                 **stage_base), output_data,
+                                 lambda: analyze_correlations(correlations()))
+        
+        if pipelined:
+            # Stall times show whether reading or computing held the pass back
+            print(f"\n--- PIPELINE ---")
+            print('\n'.join(pipelined['result'].stats.report()))
+        
+        if budget:
+            # Record the limit, the peaks and every downgrade so consumers know what is approximate
+            print(f"\n--- MEMORY BUDGET ---")
+            for column_name, metric, value in budget.metadata_rows():
+                print(f"{column_name} {metric}: {value}")
+                add_to_output("Run_Info", column_name, metric, value)
+            budget.stop()
+        
+        # Save results in the requested format
+        output_file = save_output("facebook_posts", args.output_format)
+        print(f"\n{'='*60}")
+        print(f"ANALYSIS COMPLETE")
+        print(f"Results saved to: {output_file}")
+        print(f"{'='*60}")
+        print(cache.summary())
                 
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
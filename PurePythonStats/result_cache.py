@@ -0,0 +1,150 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+DEFAULT_CACHE_DIR = os.path.join('.stats_cache', 'results')
+DEFAULT_CACHE_MB = 256
+
+_HASH_BLOCK = 1024 * 1024
+
+# Shared engine modules whose code shapes the pure scripts' results
+ENGINE_SOURCES = tuple(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                       for name in ('bit_columns.py', 'column_profiles.py', 'comoments.py', 'compressed_input.py',
+                                    'grouping_sets.py', 'histograms.py', 'leaderboards.py', 'message_pool.py',
+                                    'pipeline.py', 'sorted_groupby.py', 'spill_aggregation.py', 'type_inference.py'))
+
+
+class _Tee(io.TextIOBase):
+    """Write to the real stdout and keep a copy"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def code_version(*paths):
+    """Hash of the source files whose logic shapes a stage's results"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+class ResultCache:
+    """Content-addressed cache of analysis stages with size-bounded LRU eviction
+
+    Each stage is stored as one pickle named by the hash of its key (source
+    file hash, engine, dataset, code version and the stage's own settings)
+    and holds the stage's return value plus everything it printed, so a hit
+    replays the same console output. Reads refresh the file's mtime and the
+    oldest entries are evicted once the directory exceeds max_mb.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MB, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self, path):
+        """sha256 of a file's contents, remembered per (size, mtime) so unchanged files are not re-read"""
+        stat = os.stat(path)
+        memo_path = os.path.join(self.cache_dir, 'fingerprints.json')
+        memo = {}
+        if self.enabled and os.path.exists(memo_path):
+            with open(memo_path, 'r', encoding='utf-8') as memo_file:
+                memo = json.load(memo_file)
+        entry = memo.get(os.path.abspath(path))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(_HASH_BLOCK), b''):
+                digest.update(block)
+        value = digest.hexdigest()
+        if self.enabled:
+            memo[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns, value]
+            self._write_atomic(memo_path, json.dumps(memo).encode('utf-8'))
+        return value
+
+    def stage_key(self, **parts):
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def _write_atomic(self, path, payload):
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(payload)
+        os.replace(temp_path, path)
+
+    def run_stage(self, key, compute):
+        """Return compute()'s value from the cache, or run it and store value plus printed output"""
+        if self.enabled:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as entry:
+                    printed, value = pickle.load(entry)
+                os.utime(path)
+                self.hits += 1
+                sys.stdout.write(printed)
+                return value
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        self.misses += 1
+        tee = _Tee(sys.stdout)
+        with redirect_stdout(tee):
+            value = compute()
+        if self.enabled:
+            self._write_atomic(self._path(key), pickle.dumps((tee.copy.getvalue(), value), pickle.HIGHEST_PROTOCOL))
+            self.evict()
+        return value
+
+    def run_collecting(self, key, output_rows, compute):
+        """run_stage for a stage that appends result rows to output_rows; a hit appends the cached rows"""
+        def stage():
+            start = len(output_rows)
+            value = compute()
+            added = output_rows[start:]
+            del output_rows[start:]
+            return added, value
+
+        added, value = self.run_stage(key, stage)
+        output_rows.extend(added)
+        return value
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def summary(self):
+        if not self.enabled:
+            return "Result cache disabled"
+        return f"Result cache: {self.hits} stages reused, {self.misses} computed ({self.cache_dir})"
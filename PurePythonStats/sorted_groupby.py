@@ -0,0 +1,345 @@
+import argparse
+import csv
+import heapq
+import os
+import tempfile
+from array import array
+
+from compressed_input import open_input_text
+from grouping_sets import GroupStats, rollup_groups, safe_float
+
+# Rows buffered per sorted run before external_sort spills it to disk
+DEFAULT_RUN_SIZE = 100000
+
+
+class StreamedGrouping:
+    """Per-group summaries collected while a streaming group-by emits groups
+
+    Only scalars are kept per group (its size and column means), never rows,
+    and the largest groups are tracked with a bounded heap; groups that filled
+    histograms also keep those compact arrays. Given an empty
+    leaderboards.Leaderboards, every group is offered to it as it is emitted.
+    It answers the same sizes/largest/means/histograms/leaderboards questions
+    as grouping_sets.Grouping.
+
+    Groups are numbered in emission order unless add_group is given their
+    sequence, such as the input row that first showed them. Groups emitted
+    out of sequence order (an externally sorted input) are reported in
+    sequence order, so sizes, means and ties come out as the hash group-by's.
+    """
+
+    def __init__(self, value_columns, top_n=5, leaderboards=None):
+        self.top_n = top_n
+        self._sizes = array('q')
+        self._sequences = array('q')
+        self._means = {name: (array('q'), array('d')) for name in value_columns}
+        self._histograms = {}
+        self._largest = []  # min-heap of (size, -sequence, key)
+        self._leaderboards = leaderboards
+        self._in_order = True
+
+    def add_group(self, key, stats, sequence=None):
+        """Record one finished group, first seen at sequence (by default, after every group so far)"""
+        if sequence is None:
+            sequence = self._sequences[-1] + 1 if self._sequences else 0
+        elif self._sequences and sequence < self._sequences[-1]:
+            self._in_order = False
+        self._sizes.append(stats.size)
+        self._sequences.append(sequence)
+        for name, column_stats in stats.columns.items():
+            if column_stats.mean is not None:
+                sequences, means = self._means[name]
+                sequences.append(sequence)
+                means.append(column_stats.mean)
+            if column_stats.histogram is not None:
+                self._histograms.setdefault(name, []).append((sequence, key, column_stats.histogram))
+        if self._leaderboards is not None:
+            self._leaderboards.add_group(key, stats, sequence)
+
+        # Ties go to the group seen first, like a stable sort by size
+        entry = (stats.size, -sequence, key)
+        if len(self._largest) < self.top_n:
+            heapq.heappush(self._largest, entry)
+        elif entry > self._largest[0]:
+            heapq.heapreplace(self._largest, entry)
+
+    def _ordered(self, sequences, values):
+        if self._in_order:
+            return list(values)
+        return [values[i] for i in sorted(range(len(values)), key=sequences.__getitem__)]
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def sizes(self):
+        return self._ordered(self._sequences, self._sizes)
+
+    def largest(self, n):
+        ranked = sorted(self._largest, reverse=True)[:n]
+        return [(key, size) for size, _, key in ranked]
+
+    def means(self, column):
+        if column not in self._means:
+            return []
+        return self._ordered(*self._means[column])
+
+    def histograms(self, column):
+        entries = self._histograms.get(column, [])
+        if not self._in_order:
+            entries = sorted(entries, key=lambda entry: entry[0])
+        return [(key, histogram) for _, key, histogram in entries]
+
+    def leaderboards(self, template):
+        # The groups are gone, so only the leaderboards filled while emitting them
+        return self._leaderboards if self._leaderboards is not None else template.empty()
+
+def _key_of(row, indices):
+    return tuple(row[i] if i < len(row) else '' for i in indices)
+
+def detect_input_order(rows, key_indices):
+    """Return 'sorted', 'clustered' or 'unsorted' for rows keyed by key_indices
+
+    One pass that remembers the distinct keys seen, never the rows.
+    """
+    seen = set()
+    previous = None
+    is_sorted = True
+    for row in rows:
+        key = _key_of(row, key_indices)
+        if key != previous:
+            if key in seen:
+                return 'unsorted'
+            if previous is not None and key < previous:
+                is_sorted = False
+            seen.add(key)
+            previous = key
+    return 'sorted' if is_sorted else 'clustered'
+
+def _write_run(items, temp_dir):
+    """Write one sorted run of (row number, row) to a temporary CSV file and return its path"""
+    handle, path = tempfile.mkstemp(prefix='sort_run_', suffix='.csv', dir=temp_dir)
+    with os.fdopen(handle, 'w', newline='', encoding='utf-8') as run_file:
+        csv.writer(run_file).writerows(row + [row_number] for row_number, row in items)
+    return path
+
+def external_sort(rows, key_indices, run_size=DEFAULT_RUN_SIZE, temp_dir=None, numbered=False):
+    """Yield rows ordered by key_indices, spilling sorted runs to disk
+
+    Rows are buffered run_size at a time, sorted and written to temporary CSV
+    files, then k-way merged with heapq.merge. Rows with equal keys keep their
+    input order. Input that fits in one run is sorted in memory. With
+    numbered, (input row number, row) pairs are yielded instead of rows.
+    """
+    sort_key = lambda item: _key_of(item[1], key_indices)
+    run_paths = []
+    buffer = []
+    try:
+        for item in enumerate(rows):
+            buffer.append(item)
+            if len(buffer) >= run_size:
+                buffer.sort(key=sort_key)
+                run_paths.append(_write_run(buffer, temp_dir))
+                buffer = []
+
+        if not run_paths:
+            buffer.sort(key=sort_key)
+            yield from (buffer if numbered else (row for _, row in buffer))
+            return
+        if buffer:
+            buffer.sort(key=sort_key)
+            run_paths.append(_write_run(buffer, temp_dir))
+            buffer = []
+
+        run_files = [open(path, 'r', newline='', encoding='utf-8') for path in run_paths]
+        try:
+            # Each record carries its row number in a trailing cell
+            runs = (((int(record[-1]), record[:-1]) for record in csv.reader(run_file)) for run_file in run_files)
+            merged = heapq.merge(*runs, key=sort_key)
+            yield from (merged if numbered else (row for _, row in merged))
+        finally:
+            for run_file in run_files:
+                run_file.close()
+    finally:
+        for path in run_paths:
+            os.remove(path)
+
+def stream_grouping_sets(rows, headers, key_sets, value_columns, clustered_by, order='clustered',
+                         parse_value=safe_float, top_n=5, histograms=None, leaderboards=None, numbered=False):
+    """Sort-based grouping sets over rows that arrive clustered by clustered_by
+
+    Every key set must contain the clustered_by columns, so no group spans two
+    clusters. Rows of the current cluster are hashed on the finest key set and
+    each cluster's groups (and their rollups) are emitted as soon as the
+    cluster key changes, so memory holds one cluster at a time.
+
+    order is 'sorted' (cluster keys must not decrease) or 'clustered' (cluster
+    keys may not reappear once left); a violation raises ValueError. For
+    clustered input the groups come out in the same order as
+    compute_grouping_sets, so the reports are identical. histograms maps
+    value columns to bin schemes filled per group, as in compute_grouping_sets.
+    Each grouping set fills an empty copy of leaderboards, if given, as its
+    groups are emitted.
+
+    With numbered, rows are (input row number, row) pairs, as external_sort
+    yields them, and every group is reported at the row that first showed
+    it, so sorted input gives the same reports as the original order.
+
+    Returns {tuple(key_set): StreamedGrouping}.
+    """
+    if order not in ('sorted', 'clustered'):
+        raise ValueError(f"Unsupported input order {order!r}; sort the rows with external_sort first")
+    missing = [col for col in clustered_by if col not in headers]
+    if missing:
+        raise ValueError(f"Cluster columns not found in dataset: {missing}")
+
+    clustered_by = tuple(clustered_by)
+    present = {tuple(key_set): tuple(col for col in key_set if col in headers) for key_set in key_sets}
+    finest = max(present.values(), key=len)
+    for requested, columns in present.items():
+        if not set(clustered_by) <= set(columns):
+            raise ValueError(f"Grouping set {list(requested)} does not contain the cluster key {list(clustered_by)}")
+        outside = [col for col in columns if col not in finest]
+        if outside:
+            raise ValueError(f"Grouping set {list(requested)} is not a subset of {list(finest)}: {outside}")
+
+    value_columns = [col for col in value_columns if col in headers]
+    value_indices = [(col, headers.index(col)) for col in value_columns]
+    cluster_indices = [headers.index(col) for col in clustered_by]
+    finest_indices = [headers.index(col) for col in finest]
+    results = {requested: StreamedGrouping(value_columns, top_n, leaderboards.empty() if leaderboards is not None else None)
+               for requested in present}
+
+    def flush(cluster_groups, first_rows):
+        for requested, columns in present.items():
+            if columns == finest:
+                groups, firsts = cluster_groups, first_rows
+            else:
+                positions = [finest.index(col) for col in columns]
+                groups = rollup_groups(cluster_groups, positions, value_columns)
+                firsts = {}
+                if numbered:
+                    # Finer groups arrive in first-row order, so the first one kept is the earliest
+                    for group_key, first_row in first_rows.items():
+                        firsts.setdefault(tuple(group_key[i] for i in positions), first_row)
+            for group_key, stats in groups.items():
+                results[requested].add_group(group_key, stats, firsts.get(group_key))
+
+    current = None
+    seen_clusters = set()
+    cluster_groups = {}
+    first_rows = {}
+    for row in rows:
+        if numbered:
+            row_number, row = row
+        cluster_key = _key_of(row, cluster_indices)
+        if cluster_key != current:
+            if current is not None:
+                flush(cluster_groups, first_rows)
+                if order == 'sorted' and cluster_key < current:
+                    raise ValueError(f"Input is not sorted by {list(clustered_by)}")
+            if order == 'clustered':
+                if cluster_key in seen_clusters:
+                    raise ValueError(f"Input is not clustered by {list(clustered_by)}")
+                seen_clusters.add(cluster_key)
+            current = cluster_key
+            cluster_groups = {}
+            first_rows = {}
+
+        group_key = _key_of(row, finest_indices)
+        stats = cluster_groups.get(group_key)
+        if stats is None:
+            stats = cluster_groups[group_key] = GroupStats(value_columns, histograms)
+            if numbered:
+                first_rows[group_key] = row_number
+        stats.size += 1
+        for col_name, col_idx in value_indices:
+            stats.columns[col_name].add(parse_value(row[col_idx]) if col_idx < len(row) else None)
+
+    if current is not None:
+        flush(cluster_groups, first_rows)
+    return results
+
+def ordered_grouping_sets(rows, headers, key_sets, value_columns, clustered_by, order='auto',
+                          run_size=DEFAULT_RUN_SIZE, temp_dir=None, histograms=None, leaderboards=None):
+    """Detect or accept the input order, sort if needed and stream the grouping sets
+
+    order is 'auto', 'sorted', 'clustered' or 'unsorted'. 'auto' needs rows to
+    be re-iterable (a list); unsorted input goes through external_sort, and
+    its groups are still reported in first-appearance order.
+    """
+    cluster_indices = [headers.index(col) for col in clustered_by if col in headers]
+    if order == 'auto':
+        order = detect_input_order(rows, cluster_indices)
+        print(f"Detected input order by {list(clustered_by)}: {order}")
+    numbered = order == 'unsorted'
+    if numbered:
+        rows = external_sort(rows, cluster_indices, run_size, temp_dir, numbered=True)
+        order = 'sorted'
+    return stream_grouping_sets(rows, headers, key_sets, value_columns, clustered_by, order, histograms=histograms,
+                                leaderboards=leaderboards, numbered=numbered)
+
+def analyze_csv_grouped(filename, key_sets, value_columns, clustered_by, order='auto',
+                        run_size=DEFAULT_RUN_SIZE, temp_dir=None):
+    """Streaming grouping sets straight from a CSV file that may not fit in RAM
+
+    With order='auto' the file is read twice: once to detect the order (keeping
+    only the distinct cluster keys) and once to aggregate.
+    Returns (headers, {tuple(key_set): StreamedGrouping}).
+    """
+    with open_input_text(filename, newline='') as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        if order == 'auto':
+            cluster_indices = [headers.index(col) for col in clustered_by if col in headers]
+            order = detect_input_order(reader, cluster_indices)
+            print(f"Detected input order by {list(clustered_by)}: {order}")
+    # Compressed input cannot seek back, so the aggregating pass reopens the file
+    with open_input_text(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        return headers, ordered_grouping_sets(reader, headers, key_sets, value_columns, clustered_by,
+                                              order, run_size, temp_dir)
+
+def print_grouping_summary(group_columns, grouping):
+    """Print the analyze_grouped_data style summary for one streamed grouping"""
+    print(f"\n{'='*60}")
+    print(f"ANALYSIS GROUPED BY {' + '.join(group_columns)}")
+    print(f"{'='*60}")
+    print(f"Number of groups: {len(grouping)}")
+    sizes = grouping.sizes()
+    if sizes:
+        print(f"Group size - Min: {min(sizes)}, Max: {max(sizes)}, Mean: {sum(sizes)/len(sizes):.2f}")
+    print("\nTop 5 largest groups:")
+    for i, (group_key, group_size) in enumerate(grouping.largest(5)):
+        group_display = " | ".join(f"{group_columns[j]}={group_key[j]}" for j in range(len(group_key)))
+        print(f"{i+1}. {group_display}: {group_size} records")
+
+def main():
+    """Command-line streaming group-by for CSV files larger than memory"""
+    parser = argparse.ArgumentParser(description="Sort-based streaming group-by over a CSV file")
+    parser.add_argument('filename', help="CSV file to analyze")
+    parser.add_argument('--cluster-by', nargs='+', required=True,
+                        help="Columns the rows are (or will be sorted to be) clustered by")
+    parser.add_argument('--group', nargs='+', action='append', required=True,
+                        help="One grouping set; repeat for several (each must contain --cluster-by)")
+    parser.add_argument('--values', nargs='*', default=[], help="Numeric columns to aggregate per group")
+    parser.add_argument('--order', choices=['auto', 'sorted', 'clustered', 'unsorted'], default='auto',
+                        help="Declared input order by --cluster-by (default: detect); unsorted input is sorted externally "
+                             "and its groups still reported in first-appearance order")
+    parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help="Rows per sorted run when an external sort is needed")
+    parser.add_argument('--temp-dir', default=None, help="Directory for external sort runs")
+    args = parser.parse_args()
+
+    headers, grouping_sets = analyze_csv_grouped(args.filename, args.group, args.values, args.cluster_by,
+                                                 args.order, args.run_size, args.temp_dir)
+    for group_columns in args.group:
+        grouping = grouping_sets[tuple(group_columns)]
+        print_grouping_summary(group_columns, grouping)
+        for col_name in args.values:
+            means = grouping.means(col_name)
+            if means:
+                print(f"  {col_name} (group means): Count={len(means)}, Mean={sum(means)/len(means):.4f}, Min={min(means):.4f}, Max={max(means):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+
+from grouping_sets import GroupStats, safe_float
+from sorted_groupby import StreamedGrouping
+
+DEFAULT_MEMORY_LIMIT_MB = 512
+DEFAULT_PARTITIONS = 16
+
+# Rough per-accumulator cost used by the memory estimate (RunningStats plus dict slot)
+_COLUMN_BYTES = 320
+_GROUP_BYTES = 200
+# An empty Histogram with its two bin dicts, and each non-empty bin (dict entry, int index and count)
+_HISTOGRAM_BYTES = 400
+_BIN_BYTES = 100
+
+
+def _estimate_group_bytes(key, value_count, histogram_count=0):
+    """Approximate memory held by one in-memory group, before its histograms hold any bins"""
+    return (sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + _GROUP_BYTES
+            + value_count * _COLUMN_BYTES + histogram_count * _HISTOGRAM_BYTES)
+
+def estimate_groups_mb(groups, sample_key, value_count):
+    """Approximate MB an in-memory group-by of groups keys shaped like sample_key would hold"""
+    return groups * _estimate_group_bytes(tuple(sample_key), value_count) / (1024 * 1024)
+
+def _read_records(path):
+    """Yield every pickled record appended to path"""
+    with open(path, 'rb') as spill_file:
+        while True:
+            try:
+                yield pickle.load(spill_file)
+            except EOFError:
+                return
+
+class SpillingAggregator:
+    """Partitioned hash aggregation that spills partitions to disk over a memory budget
+
+    Groups are hashed into num_partitions partitions on partition_indices.
+    Whenever the estimated size of the in-memory groups exceeds
+    memory_limit_mb, the largest partition's accumulators are appended to that
+    partition's temporary file and dropped from memory. Each partition is later
+    merged on its own, so peak memory is about one partition. The estimate
+    includes each group's histogram bins as its values fill them.
+    """
+
+    def __init__(self, key_indices, partition_indices, value_indices, parse_value=safe_float,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, num_partitions=DEFAULT_PARTITIONS, temp_dir=None,
+                 histograms=None):
+        if num_partitions < 1:
+            raise ValueError(f"Spilling needs at least one partition, not {num_partitions}")
+        self.key_indices = key_indices
+        self.partition_indices = partition_indices
+        self.value_indices = value_indices
+        self.value_columns = [name for name, _ in value_indices]
+        self.parse_value = parse_value
+        self.histograms = histograms
+        self.histogram_columns = [name for name in self.value_columns if name in (histograms or {})]
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.num_partitions = num_partitions
+        self.temp_dir = tempfile.mkdtemp(prefix='spill_agg_', dir=temp_dir)
+        self.partitions = [{} for _ in range(num_partitions)]
+        self.partition_bytes = [0] * num_partitions
+        self.spill_paths = {}
+        self.memory_used = 0
+        self.rows_seen = 0
+        self.spill_count = 0
+        self.groups_spilled = 0
+
+    def add_row(self, row):
+        """Aggregate one row, spilling a partition if the budget is exceeded"""
+        key = tuple(row[i] if i < len(row) else '' for i in self.key_indices)
+        partition_key = tuple(row[i] if i < len(row) else '' for i in self.partition_indices)
+        partition = hash(partition_key) % self.num_partitions
+        groups = self.partitions[partition]
+
+        entry = groups.get(key)
+        if entry is None:
+            # entry is [first row number, accumulators]
+            entry = groups[key] = [self.rows_seen, GroupStats(self.value_columns, self.histograms)]
+            size = _estimate_group_bytes(key, len(self.value_columns), len(self.histogram_columns))
+            self.partition_bytes[partition] += size
+            self.memory_used += size
+        stats = entry[1]
+        stats.size += 1
+        if self.histogram_columns:
+            bins = self._histogram_bins(stats)
+        for col_name, col_idx in self.value_indices:
+            stats.columns[col_name].add(self.parse_value(row[col_idx]) if col_idx < len(row) else None)
+        if self.histogram_columns:
+            # Histograms grow with every new bin a group's values fall in
+            size = (self._histogram_bins(stats) - bins) * _BIN_BYTES
+            self.partition_bytes[partition] += size
+            self.memory_used += size
+        self.rows_seen += 1
+
+        if self.memory_used > self.memory_limit:
+            self._spill(max(range(self.num_partitions), key=lambda p: self.partition_bytes[p]))
+
+    def _histogram_bins(self, stats):
+        return sum(stats.columns[col_name].histogram.bin_count() for col_name in self.histogram_columns)
+
+    def _spill(self, partition):
+        """Append one partition's accumulators to its spill file and free them"""
+        path = self.spill_paths.get(partition)
+        if path is None:
+            path = self.spill_paths[partition] = os.path.join(self.temp_dir, f'partition_{partition}.pkl')
+        with open(path, 'ab') as spill_file:
+            for key, (first_seen, stats) in self.partitions[partition].items():
+                pickle.dump((key, first_seen, stats), spill_file, pickle.HIGHEST_PROTOCOL)
+        self.groups_spilled += len(self.partitions[partition])
+        self.spill_count += 1
+        self.memory_used -= self.partition_bytes[partition]
+        self.partition_bytes[partition] = 0
+        self.partitions[partition] = {}
+
+    def merged_partitions(self):
+        """Yield each partition's fully merged {key: [first_seen, GroupStats]} in turn"""
+        for partition in range(self.num_partitions):
+            groups = self.partitions[partition]
+            self.partitions[partition] = {}
+            path = self.spill_paths.get(partition)
+            if path is not None:
+                for key, first_seen, stats in _read_records(path):
+                    entry = groups.get(key)
+                    if entry is None:
+                        groups[key] = [first_seen, stats]
+                    else:
+                        entry[0] = min(entry[0], first_seen)
+                        entry[1].merge(stats)
+                os.remove(path)
+            yield groups
+
+    def cleanup(self):
+        """Remove the temporary directory and any spill files left in it"""
+        for path in self.spill_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        for name in os.listdir(self.temp_dir):
+            os.remove(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+
+def spill_grouping_sets(rows, headers, key_sets, value_columns, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                        num_partitions=DEFAULT_PARTITIONS, temp_dir=None, parse_value=safe_float, top_n=5,
+                        histograms=None, leaderboards=None):
+    """Grouping sets with out-of-core hash aggregation for high-cardinality keys
+
+    Rows are partitioned on the columns every key set shares, so each coarser
+    grouping set can be rolled up inside its partition. Finished groups are
+    written per partition in first-appearance order and merged back on that
+    order, which makes the reports identical to compute_grouping_sets.
+    histograms maps value columns to bin schemes filled per group; they are
+    spilled and merged with the rest of each group's accumulators. Each
+    grouping set fills an empty copy of leaderboards, if given, as its merged
+    groups are read back.
+
+    Returns {tuple(key_set): StreamedGrouping}.
+    """
+    present = {tuple(key_set): tuple(col for col in key_set if col in headers) for key_set in key_sets}
+    finest = max(present.values(), key=len)
+    for requested, columns in present.items():
+        outside = [col for col in columns if col not in finest]
+        if outside:
+            raise ValueError(f"Grouping set {list(requested)} is not a subset of {list(finest)}: {outside}")
+    shared = [col for col in finest if all(col in columns for columns in present.values())]
+    if not shared:
+        raise ValueError("Spilled grouping sets need at least one key column shared by every set")
+
+    value_columns = [col for col in value_columns if col in headers]
+    aggregator = SpillingAggregator(
+        [headers.index(col) for col in finest],
+        [headers.index(col) for col in shared],
+        [(col, headers.index(col)) for col in value_columns],
+        parse_value, memory_limit_mb, num_partitions, temp_dir, histograms)
+
+    try:
+        for row in rows:
+            aggregator.add_row(row)
+
+        # Write each partition's groups, per grouping set, sorted by first appearance
+        done_paths = {requested: [] for requested in present}
+        for partition, groups in enumerate(aggregator.merged_partitions()):
+            for set_number, (requested, columns) in enumerate(present.items()):
+                if columns == finest:
+                    level = groups
+                else:
+                    positions = [finest.index(col) for col in columns]
+                    level = {}
+                    for key, (first_seen, stats) in groups.items():
+                        coarse_key = tuple(key[i] for i in positions)
+                        entry = level.get(coarse_key)
+                        if entry is None:
+                            entry = level[coarse_key] = [first_seen, GroupStats(value_columns)]
+                        entry[0] = min(entry[0], first_seen)
+                        entry[1].merge(stats)
+                path = os.path.join(aggregator.temp_dir, f'done_{set_number}_{partition}.pkl')
+                with open(path, 'wb') as done_file:
+                    for key, (first_seen, stats) in sorted(level.items(), key=lambda item: item[1][0]):
+                        pickle.dump((first_seen, key, stats), done_file, pickle.HIGHEST_PROTOCOL)
+                done_paths[requested].append(path)
+
+        results = {}
+        for requested, paths in done_paths.items():
+            grouping = StreamedGrouping(value_columns, top_n, leaderboards.empty() if leaderboards is not None else None)
+            for first_seen, key, stats in heapq.merge(*(_read_records(path) for path in paths),
+                                                      key=lambda record: record[0]):
+                grouping.add_group(key, stats)
+            results[requested] = grouping
+
+        print(f"Spill aggregation: {aggregator.rows_seen} rows, {aggregator.spill_count} spills, "
+              f"{aggregator.groups_spilled} group accumulators written to disk")
+        return results
+    finally:
+        aggregator.cleanup()
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import random
+import tempfile
+
+from grouping_sets import safe_float
+
+NUMERIC = 'numeric'
+CATEGORICAL = 'categorical'
+
+# A column is numeric when more than this share of its values parse as numbers
+NUMERIC_SHARE = 0.5
+
+DEFAULT_HEAD_ROWS = 1000
+DEFAULT_SAMPLE_BLOCKS = 8
+DEFAULT_BLOCK_ROWS = 250
+
+# Standard errors the sampled numeric share must clear NUMERIC_SHARE by to be trusted
+DEFAULT_CONFIDENCE_Z = 4.0
+
+
+def numeric_values(column_data):
+    """Floats of the values that parse as numbers, parsing each value once"""
+    values = []
+    for value in column_data:
+        number = safe_float(value)
+        if number is not None:
+            values.append(number)
+    return values
+
+def count_numeric(column_data):
+    return sum(1 for value in column_data if safe_float(value) is not None)
+
+def classify_share(numeric, total, exact=False, z=DEFAULT_CONFIDENCE_Z):
+    """NUMERIC, CATEGORICAL or None when a sample of total values is too close to call
+
+    exact marks a full column, which is always decided by the plain
+    "more than half numeric" rule.
+    """
+    if exact or total == 0:
+        return NUMERIC if numeric > total * NUMERIC_SHARE else CATEGORICAL
+    share = numeric / total
+    # Worst-case (p = 0.5) standard error of the sampled share
+    margin = z * math.sqrt(0.25 / total)
+    if share - NUMERIC_SHARE > margin:
+        return NUMERIC
+    if NUMERIC_SHARE - share > margin:
+        return CATEGORICAL
+    return None
+
+def sample_positions(num_rows, head_rows=DEFAULT_HEAD_ROWS, blocks=DEFAULT_SAMPLE_BLOCKS,
+                     block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Row positions to sample: the head plus randomly placed contiguous blocks
+
+    Blocks keep the reads local while still reaching past a sorted or
+    clustered head. Returns every row when the sample would cover the file.
+    """
+    if head_rows + blocks * block_rows >= num_rows:
+        return list(range(num_rows))
+    positions = set(range(head_rows))
+    rng = random.Random(seed)
+    for _ in range(blocks):
+        start = rng.randrange(head_rows, num_rows - block_rows + 1)
+        positions.update(range(start, start + block_rows))
+    return sorted(positions)
+
+def infer_column_types(headers, data, head_rows=DEFAULT_HEAD_ROWS, blocks=DEFAULT_SAMPLE_BLOCKS,
+                       block_rows=DEFAULT_BLOCK_ROWS, z=DEFAULT_CONFIDENCE_Z, seed=0):
+    """Infer NUMERIC/CATEGORICAL per column from a sample of the rows
+
+    Returns (types, validated) where validated lists the columns whose sample
+    was ambiguous and were therefore checked against every row.
+    """
+    positions = sample_positions(len(data), head_rows, blocks, block_rows, seed)
+    exact = len(positions) == len(data)
+    types = {}
+    validated = []
+    for i, header in enumerate(headers):
+        sample = [data[position][i] if i < len(data[position]) else '' for position in positions]
+        column_type = classify_share(count_numeric(sample), len(sample), exact, z)
+        if column_type is None:
+            column = [row[i] if i < len(row) else '' for row in data]
+            column_type = classify_share(count_numeric(column), len(column), exact=True)
+            validated.append(header)
+        types[header] = column_type
+    return types, validated
+
+def load_schema(schema_path, key):
+    """Cached column types for key, or None"""
+    if not schema_path or not os.path.exists(schema_path):
+        return None
+    try:
+        with open(schema_path, 'r', encoding='utf-8') as schema_file:
+            return json.load(schema_file).get(key)
+    except (OSError, ValueError):
+        return None
+
+def save_schema(schema_path, key, types):
+    """Store column types under key, replacing the file atomically"""
+    schemas = {}
+    if os.path.exists(schema_path):
+        try:
+            with open(schema_path, 'r', encoding='utf-8') as schema_file:
+                schemas = json.load(schema_file)
+        except (OSError, ValueError):
+            schemas = {}
+    schemas[key] = types
+    directory = os.path.dirname(schema_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+        json.dump(schemas, temp_file)
+    os.replace(temp_path, schema_path)
+
+def dataset_schema(headers, data, fingerprint=None, schema_path=None, full_scan=False):
+    """Column types for a dataset, from the schema cache when the fingerprint was seen before
+
+    full_scan applies the rule to every value of every column instead of
+    sampling. Returns (types, a one-line description of how they were found).
+    """
+    key = f"{fingerprint}:{'full' if full_scan else 'sampled'}" if fingerprint else None
+    cached = load_schema(schema_path, key) if key else None
+    if cached is not None and list(cached) == list(headers):
+        return cached, f"reused the cached schema of {len(headers)} columns"
+
+    if full_scan:
+        types = infer_column_types(headers, data, head_rows=len(data), blocks=0)[0]
+        validated = list(headers)
+    else:
+        types, validated = infer_column_types(headers, data)
+    if key and schema_path:
+        save_schema(schema_path, key, types)
+    numeric = sum(1 for column_type in types.values() if column_type == NUMERIC)
+    return types, (f"{numeric} numeric, {len(types) - numeric} categorical, "
+                   f"{len(validated)} checked against every row")
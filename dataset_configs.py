@@ -0,0 +1,88 @@
+import os
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The three election datasets and the columns every engine treats specially.
+# Scripts read the CSV from the working directory, so data_dir defaults to '.'.
+DATASETS = {
+    'fb_ads': {
+        'filename': '2024_fb_ads_president_scored_anon.csv',
+        'id_columns': ['page_id', 'ad_id'],
+        'bloom_columns': ['page_id', 'ad_id'],
+        'key_sets': [['page_id', 'ad_id'], ['page_id']],
+        'numeric_columns': ['estimated_audience_size', 'estimated_impressions', 'estimated_spend'],
+        'date_columns': ['ad_creation_time'],
+        'scripts': {
+            'pure': 'PurePythonStats/pure_python_stats_fb_ads.py',
+            'pandas': 'PandasStats/pandas_stats_fb_ads.py',
+            'polar': 'PolarStats/polar_stats_fb_ads.py'
+        }
+    },
+    'fb_posts': {
+        'filename': '2024_fb_posts_president_scored_anon.csv',
+        'id_columns': ['Facebook_Id', 'post_id'],
+        'bloom_columns': ['Facebook_Id', 'post_id'],
+        'key_sets': [['Facebook_Id', 'post_id'], ['Facebook_Id']],
+        'numeric_columns': ['Total Interactions', 'Likes', 'Comments', 'Shares', 'Post Views', 'Total Views'],
+        'date_columns': ['Post Created', 'Post Created Date'],
+        'scripts': {
+            'pure': 'PurePythonStats/pure_python_stats_fb_posts.py',
+            'pandas': 'PandasStats/pandas_stats_fb_posts.py',
+            'polar': 'PolarStats/polar_stats_fb_posts.py'
+        }
+    },
+    'tw_posts': {
+        'filename': '2024_tw_posts_president_scored_anon.csv',
+        'id_columns': ['source', 'id'],
+        'bloom_columns': ['id'],
+        'key_sets': [['source', 'id'], ['source']],
+        'numeric_columns': ['retweetCount', 'replyCount', 'likeCount', 'quoteCount', 'viewCount', 'bookmarkCount'],
+        'date_columns': ['createdAt'],
+        'scripts': {
+            'pure': 'PurePythonStats/pure_python_stats_tw_posts.py',
+            'pandas': 'PandasStats/python_stats_tw_posts.py',
+            'polar': 'PolarStats/polar_stats_tw_posts.py'
+        }
+    }
+}
+
+ENGINES = ('pure', 'pandas', 'polar')
+
+# Where derived copies of the datasets (Parquet cache, indexes) are kept, relative to data_dir
+CACHE_DIRNAME = '.stats_cache'
+
+# Compressed copies the analysis scripts read in place of a missing CSV
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+def dataset_config(name):
+    """Return the DATASETS entry for name, with a clear error for typos"""
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset {name!r}; choose one of {sorted(DATASETS)}")
+    return DATASETS[name]
+
+def dataset_path(name, data_dir='.'):
+    """Path of a dataset's source CSV"""
+    return os.path.join(data_dir, dataset_config(name)['filename'])
+
+def dataset_input_path(name, data_dir='.'):
+    """Path the analysis scripts read for a dataset: the CSV, or its .gz/.zst copy when only that exists"""
+    path = dataset_path(name, data_dir)
+    if not os.path.exists(path):
+        for suffix in COMPRESSED_SUFFIXES:
+            if os.path.exists(path + suffix):
+                return path + suffix
+    return path
+
+def cache_dir(data_dir='.'):
+    """Directory for derived dataset files, created on demand"""
+    path = os.path.join(data_dir, CACHE_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def script_path(name, engine):
+    """Absolute path of the analysis script for one dataset and engine"""
+    scripts = dataset_config(name)['scripts']
+    if engine not in scripts:
+        raise ValueError(f"Unknown engine {engine!r}; choose one of {ENGINES}")
+    return os.path.join(REPO_ROOT, scripts[engine])
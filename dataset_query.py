@@ -0,0 +1,413 @@
+import argparse
+import csv
+import math
+import os
+import statistics
+import time
+from collections import Counter
+
+from dataset_configs import DATASETS, dataset_config, dataset_path
+from id_index import read_records_at, verified_positions
+from stats_query_service import parse_cell, parse_filter
+from zone_maps import DEFAULT_BLOCK_SIZE, block_cache_paths, build_block_cache, matching_blocks
+
+ENGINES = ('csv', 'parquet', 'polars')
+
+# Same vocabulary as the analysis scripts
+AGGREGATIONS = ('count', 'mean', 'median', 'sum', 'std', 'min', 'max', 'nunique', 'mode')
+
+
+def _compare(value, operator, expected):
+    """Evaluate one predicate against a parsed cell; nulls never match a range"""
+    if operator == '==':
+        return value == expected
+    if operator == '!=':
+        return value != expected
+    if value is None or expected is None:
+        return False
+    try:
+        if operator == '>':
+            return value > expected
+        if operator == '>=':
+            return value >= expected
+        if operator == '<':
+            return value < expected
+        return value <= expected
+    except TypeError:
+        return False
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def aggregate_column(values, aggregation):
+    """Apply one of AGGREGATIONS to a group's values, skipping nulls like pandas"""
+    present = [value for value in values if value is not None]
+    if aggregation == 'count':
+        return len(present)
+    if aggregation == 'nunique':
+        return len(set(present))
+    if aggregation == 'mode':
+        if not present:
+            return None
+        counts = Counter(present)
+        top = max(counts.values())
+        # Ties go to the smallest value, as pandas Series.mode()[0] does
+        return min((value for value, count in counts.items() if count == top), key=lambda value: (str(type(value)), value))
+
+    numbers = [value for value in present if _is_number(value)]
+    if aggregation == 'sum':
+        if all(isinstance(value, int) for value in numbers):
+            return sum(numbers)
+        return math.fsum(numbers)
+    if not numbers:
+        return None
+    if aggregation == 'mean':
+        return math.fsum(numbers) / len(numbers)
+    if aggregation == 'median':
+        return float(statistics.median(numbers))
+    if aggregation == 'std':
+        return statistics.stdev(numbers) if len(numbers) > 1 else None
+    if aggregation == 'min':
+        return min(numbers)
+    if aggregation == 'max':
+        return max(numbers)
+    raise ValueError(f"Unknown aggregation {aggregation!r}; choose from {AGGREGATIONS}")
+
+def aggregate_rows(rows, group_by, aggregations):
+    """Group row dicts by group_by (first-seen order) and aggregate each group"""
+    groups = {}
+    for row in rows:
+        key = tuple(row[col] for col in group_by)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'rows': 0, 'values': {col: [] for col in aggregations}}
+        group['rows'] += 1
+        for col in aggregations:
+            group['values'][col].append(row[col])
+
+    if not group_by and not groups:
+        groups[()] = {'rows': 0, 'values': {col: [] for col in aggregations}}
+
+    results = []
+    for key, group in groups.items():
+        result = dict(zip(group_by, key))
+        result['rows'] = group['rows']
+        for col, aggs in aggregations.items():
+            for agg in aggs:
+                result[f'{col}_{agg}'] = aggregate_column(group['values'][col], agg)
+        results.append(result)
+    return results
+
+def scan_csv(path, filters, columns, report, offsets=None):
+    """Yield {column: value} for rows matching every filter, parsing only what is needed
+
+    Predicate columns are parsed first and the row is dropped on the first
+    failing predicate; the remaining requested columns are parsed only for
+    matching rows. Group-by columns keep their raw text. With offsets (from
+    the ID index) only the records at those byte offsets are read.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        missing = [col for col in list(columns) + [col for col, _, _ in filters] if col not in headers]
+        if missing:
+            raise ValueError(f"Columns not found in {os.path.basename(path)}: {missing}")
+        predicates = [(headers.index(col), operator, expected) for col, operator, expected in filters]
+        wanted = [(col, headers.index(col), raw) for col, raw in columns.items()]
+
+        records = reader if offsets is None else read_records_at(path, offsets)
+        for record in records:
+            report['rows_scanned'] += 1
+            width = len(record)
+            if not all(_compare(parse_cell(record[i]) if i < width else None, operator, expected)
+                       for i, operator, expected in predicates):
+                continue
+            report['rows_matched'] += 1
+            row = {}
+            for col, i, raw in wanted:
+                text = record[i] if i < width else ''
+                row[col] = text if raw else parse_cell(text)
+            yield row
+
+# Cell text of a boolean column, as pandas writes it and the CSV engine compares it
+BOOLEAN_LITERALS = {'True': True, 'False': False}
+
+def _typed_literal(value, kind):
+    """Coerce a filter literal to the column's kind ('string', 'boolean' or 'number') so pyarrow/polars can compare it"""
+    if value is None:
+        return None
+    if kind == 'string':
+        return str(value)
+    if kind == 'boolean':
+        if not isinstance(value, str) or value not in BOOLEAN_LITERALS:
+            raise ValueError(f"Cannot compare a boolean column with {value!r}; use True or False")
+        return BOOLEAN_LITERALS[value]
+    if isinstance(value, str):
+        raise ValueError(f"Cannot compare a numeric column with {value!r}")
+    return value
+
+def _arrow_kind(arrow_type):
+    import pyarrow as pa
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'string'
+    return 'boolean' if pa.types.is_boolean(arrow_type) else 'number'
+
+def _polars_kind(pl, dtype):
+    if dtype == pl.String:
+        return 'string'
+    return 'boolean' if dtype == pl.Boolean else 'number'
+
+def _arrow_condition(pc, col, operator, literal):
+    """pyarrow expression for one predicate; != keeps nulls like the CSV engine"""
+    field = pc.field(col)
+    if literal is None:
+        if operator in ('==', '!='):
+            return field.is_null() if operator == '==' else ~field.is_null()
+        # Nothing is ordered against a null
+        return pc.scalar(False)
+    if operator == '!=':
+        return (field != literal) | field.is_null()
+    return {'==': field == literal, '>': field > literal, '>=': field >= literal,
+            '<': field < literal, '<=': field <= literal}[operator]
+
+def _polars_condition(pl, col, operator, literal):
+    """Polars expression for one predicate, null-aware like _arrow_condition"""
+    column = pl.col(col)
+    if literal is None:
+        if operator in ('==', '!='):
+            return column.is_null() if operator == '==' else column.is_not_null()
+        return pl.lit(False)
+    if operator == '!=':
+        return (column != literal) | column.is_null()
+    return {'==': column == literal, '>': column > literal, '>=': column >= literal,
+            '<': column < literal, '<=': column <= literal}[operator]
+
+def scan_parquet(dataset, data_dir, filters, columns, report, block_size=DEFAULT_BLOCK_SIZE, bloom=True,
+                 row_numbers=None):
+    """Yield matching rows from the zone-mapped block cache
+
+    Blocks whose min/max/null counts or bloom filters rule out a predicate are
+    never read; the rest are read with column projection and filtered. With
+    row_numbers (from the ID index) only the blocks holding them are read.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet
+
+    zone_map = build_block_cache(dataset, data_dir, block_size, bloom)
+    parquet_path = block_cache_paths(dataset, data_dir)[0]
+    parquet_file = pyarrow.parquet.ParquetFile(parquet_path)
+    schema = parquet_file.schema_arrow
+    missing = [col for col in list(columns) + [col for col, _, _ in filters] if col not in schema.names]
+    if missing:
+        raise ValueError(f"Columns not found in {dataset}: {missing}")
+
+    typed = [(col, operator, _typed_literal(expected, _arrow_kind(schema.field(col).type)))
+             for col, operator, expected in filters]
+    kept = matching_blocks(zone_map, typed)
+    if row_numbers is not None:
+        indexed_blocks = set(row // zone_map['block_size'] for row in row_numbers)
+        kept = [i for i in kept if i in indexed_blocks]
+    report['blocks_total'] = len(zone_map['blocks'])
+    report['blocks_skipped'] = len(zone_map['blocks']) - len(kept)
+    report['rows_scanned'] += sum(zone_map['blocks'][i]['rows'] for i in kept)
+    if not kept:
+        return
+
+    read_columns = list(dict.fromkeys(list(columns) + [col for col, _, _ in typed]))
+    table = parquet_file.read_row_groups(kept, columns=read_columns)
+    if typed:
+        condition = None
+        for col, operator, literal in typed:
+            part = _arrow_condition(pc, col, operator, literal)
+            condition = part if condition is None else condition & part
+        table = table.filter(condition)
+    report['rows_matched'] += table.num_rows
+    for record in table.select(list(columns)).to_pylist():
+        for col, raw in columns.items():
+            value = record[col]
+            if raw:
+                record[col] = '' if value is None else str(value)
+            elif isinstance(value, float) and math.isnan(value):
+                record[col] = None
+        yield record
+
+def _polars_aggregation(pl, col, agg):
+    expr = pl.col(col)
+    named = f'{col}_{agg}'
+    if agg == 'nunique':
+        return expr.drop_nulls().n_unique().alias(named)
+    if agg == 'mode':
+        return expr.drop_nulls().mode().sort().first().alias(named)
+    if agg == 'std':
+        return expr.std(ddof=1).alias(named)
+    return getattr(expr, agg)().alias(named)
+
+def query_polars(path, filters, group_by, aggregations, report):
+    """Run the whole query as a lazy Polars plan so scan_csv prunes rows and columns"""
+    try:
+        import polars as pl
+    except ImportError:
+        raise ImportError("The polars engine needs polars (pip install polars)")
+
+    # The lazy plan never materialises skipped rows, so only matches are counted
+    report['rows_scanned'] = None
+    frame = pl.scan_csv(path, infer_schema_length=None)
+    schema = frame.collect_schema()
+    missing = [col for col in list(group_by) + list(aggregations) + [col for col, _, _ in filters]
+               if col not in schema]
+    if missing:
+        raise ValueError(f"Columns not found in {os.path.basename(path)}: {missing}")
+
+    for col, operator, expected in filters:
+        literal = _typed_literal(expected, _polars_kind(pl, schema[col]))
+        frame = frame.filter(_polars_condition(pl, col, operator, literal))
+
+    exprs = [pl.len().alias('rows')]
+    for col, aggs in aggregations.items():
+        exprs.extend(_polars_aggregation(pl, col, agg) for agg in aggs)
+    if group_by:
+        frame = frame.with_columns([pl.col(col).cast(pl.String) for col in group_by])
+        result = frame.group_by(list(group_by), maintain_order=True).agg(exprs).collect()
+    else:
+        result = frame.select(exprs).collect()
+    rows = result.to_dicts()
+    report['rows_matched'] += sum(row['rows'] for row in rows)
+    for row in rows:
+        for col in group_by:
+            if row[col] is None:
+                row[col] = ''
+    return rows
+
+def indexed_positions(dataset, data_dir, filters, report):
+    """[(row_number, byte_offset)] for the first equality predicate on an ID column, or None
+
+    The ID index is built on first use, extended when the CSV was appended to
+    and rebuilt when a record read back no longer holds the ID it was indexed by.
+    """
+    id_columns = dataset_config(dataset)['id_columns']
+    for col, operator, expected in filters:
+        if operator == '==' and expected is not None and col in id_columns:
+            report['index_column'] = col
+            return verified_positions(dataset, col, expected, data_dir)[0]
+    return None
+
+def run_query(dataset, where=(), group_by=(), aggregations=None, engine='csv', data_dir='.',
+              block_size=DEFAULT_BLOCK_SIZE, bloom=True, use_index=True):
+    """Filter + group-by + aggregate one dataset with predicates pushed into the reader
+
+    where holds 'column<op>value' strings or (column, op, value) tuples,
+    aggregations maps column -> list of AGGREGATIONS. Returns (rows, report):
+    one dict per group with the group columns, 'rows' and '<column>_<agg>'
+    values, and a report of the rows scanned/matched and time taken. The
+    parquet engine also reports the zone map blocks it skipped. An equality
+    predicate on an ID column is answered through the ID index unless
+    use_index is False.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; choose one of {ENGINES}")
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}; choose one of {sorted(DATASETS)}")
+    filters = [parse_filter(item) if isinstance(item, str) else tuple(item) for item in where]
+    group_by = list(group_by)
+    aggregations = {col: list(aggs) for col, aggs in (aggregations or {}).items()}
+    bad = sorted({agg for aggs in aggregations.values() for agg in aggs if agg not in AGGREGATIONS})
+    if bad:
+        raise ValueError(f"Unknown aggregations {bad}; choose from {AGGREGATIONS}")
+
+    report = {'dataset': dataset, 'engine': engine, 'rows_scanned': 0, 'rows_matched': 0}
+    start = time.perf_counter()
+    if engine == 'polars':
+        rows = query_polars(dataset_path(dataset, data_dir), filters, group_by, aggregations, report)
+    else:
+        # Group-by columns stay raw text; aggregated columns are parsed
+        columns = {col: True for col in group_by}
+        for col in aggregations:
+            columns.setdefault(col, False)
+        positions = indexed_positions(dataset, data_dir, filters, report) if use_index else None
+        if engine == 'csv':
+            offsets = None if positions is None else [offset for _, offset in positions]
+            matching = scan_csv(dataset_path(dataset, data_dir), filters, columns, report, offsets)
+        else:
+            row_numbers = None if positions is None else [row for row, _ in positions]
+            matching = scan_parquet(dataset, data_dir, filters, columns, report, block_size, bloom, row_numbers)
+        rows = aggregate_rows(matching, group_by, aggregations)
+    report['groups'] = len(rows) if group_by else 1
+    report['seconds'] = time.perf_counter() - start
+    return rows, report
+
+def parse_aggregation(text):
+    """Parse 'column:agg1,agg2' (column names may contain spaces)"""
+    column, separator, aggs = text.rpartition(':')
+    if not separator or not column:
+        raise argparse.ArgumentTypeError(f"Expected column:agg[,agg...], got {text!r}")
+    return column, [agg for agg in aggs.split(',') if agg]
+
+def print_rows(rows, limit):
+    """Print query results as an aligned text table"""
+    if not rows:
+        print("No matching groups")
+        return
+    headers = list(rows[0])
+    shown = rows[:limit] if limit else rows
+    cells = [[_format(row.get(col)) for col in headers] for row in shown]
+    widths = [max(len(col), *(len(line[i]) for line in cells)) for i, col in enumerate(headers)]
+    print("  ".join(col.ljust(width) for col, width in zip(headers, widths)))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+    if limit and len(rows) > limit:
+        print(f"... {len(rows) - limit} more groups")
+
+def _format(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
+
+def save_rows(rows, filename):
+    """Write query results to a CSV file"""
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]) if rows else ['rows'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    """Command-line filter + group-by + aggregate over one dataset"""
+    parser = argparse.ArgumentParser(description="Filter, group and aggregate one election dataset")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--where', action='append', default=[],
+                        help="Predicate such as fraud_illuminating==1 or currency==USD (repeat to AND)")
+    parser.add_argument('--group-by', nargs='+', default=[], help="Group-by columns")
+    parser.add_argument('--agg', action='append', type=parse_aggregation, default=[],
+                        help=f"column:agg[,agg...] with aggs from {', '.join(AGGREGATIONS)} (repeatable)")
+    parser.add_argument('--engine', choices=ENGINES, default='csv',
+                        help="csv (stdlib reader), parquet (zone-mapped block cache) or polars (scan_csv)")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="Rows per block in the parquet engine's cache")
+    parser.add_argument('--no-bloom', action='store_true', help="Build the block cache without bloom filters")
+    parser.add_argument('--no-index', action='store_true', help="Scan instead of using the ID index for ID == value")
+    parser.add_argument('--data-dir', default='.', help="Directory holding the dataset CSVs")
+    parser.add_argument('--limit', type=int, default=20, help="Groups to print (0 for all)")
+    parser.add_argument('--output', help="Also write every group to this CSV file")
+    args = parser.parse_args()
+
+    aggregations = {}
+    for column, aggs in args.agg:
+        aggregations.setdefault(column, []).extend(aggs)
+
+    rows, report = run_query(args.dataset, args.where, args.group_by, aggregations, args.engine, args.data_dir,
+                             args.block_size, not args.no_bloom, not args.no_index)
+    print_rows(rows, args.limit)
+    scanned = 'all' if report['rows_scanned'] is None else report['rows_scanned']
+    print(f"\n{report['engine']} engine: {report['rows_matched']} of {scanned} rows matched, "
+          f"{report['groups']} groups in {report['seconds']:.3f}s")
+    if 'index_column' in report:
+        print(f"Rows located through the {report['index_column']} index")
+    if 'blocks_total' in report:
+        print(f"Skipped {report['blocks_skipped']} of {report['blocks_total']} blocks")
+    if args.output:
+        save_rows(rows, args.output)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
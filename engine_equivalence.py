@@ -0,0 +1,335 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import tempfile
+
+from dataset_configs import DATASETS, ENGINES, cache_dir
+
+# Result files of each engine per dataset (CSV stems, written to the working directory).
+# pure: long-format results plus the label analyze_grouped_data gives each grouping.
+# pandas: describe() and categorical tables, and one table per grouping with the
+#         column holding the group size (None for the first-value tables).
+# polar: describe() and categorical tables, and one describe-style table per grouping.
+ENGINE_OUTPUTS = {
+    'fb_ads': {
+        'pure': {'results': 'fb_ads_analysis_results',
+                 'groupings': {'page_id': ('page_id',), 'page_id_ad_id': ('page_id', 'ad_id')}},
+        'pandas': {'numeric': 'fb_ads_numeric_analysis', 'categorical': 'fb_ads_categorical_analysis',
+                   'groupings': {('page_id',): ('fb_ads_page_id', 'total_ads'),
+                                 ('page_id', 'ad_id'): ('fb_ads_page_id_ad_id', None)}},
+        'polar': {'numeric': 'polar_fb_ads_numerical_analysis', 'categorical': 'polar_fb_ads_categorical_analysis',
+                  'groupings': {('page_id',): 'polar_fb_ads_page_groupby_analysis',
+                                ('page_id', 'ad_id'): 'polar_fb_ads_page_ad_groupby_analysis'}}
+    },
+    'fb_posts': {
+        'pure': {'results': 'facebook_posts_analysis_results',
+                 'groupings': {'Facebook_Id': ('Facebook_Id',), 'Facebook_Id + post_id': ('Facebook_Id', 'post_id')}},
+        'pandas': {'numeric': 'fb_posts_numeric_analysis', 'categorical': 'fb_posts_categorical_analysis',
+                   'groupings': {('Facebook_Id',): ('fb_posts_Facebook_Id_agg', 'post_id_count'),
+                                 ('Facebook_Id', 'post_id'): ('fb_posts_Facebook_Id_post_id_agg', None)}},
+        'polar': {'numeric': 'polar_fb_posts_numerical_analysis', 'categorical': 'polar_fb_posts_categorical_analysis',
+                  'groupings': {('Facebook_Id',): 'polar_fb_posts_facebook_id_groupby_analysis',
+                                ('Facebook_Id', 'post_id'): 'polar_fb_posts_facebook_post_groupby_analysis'}}
+    },
+    'tw_posts': {
+        'pure': {'results': 'twitter_posts_analysis_results',
+                 'groupings': {'source': ('source',), 'source + id': ('source', 'id')}},
+        'pandas': {'numeric': 'twitter_posts_numeric_analysis', 'categorical': 'twitter_posts_categorical_analysis',
+                   'groupings': {('source',): ('twitter_posts_source', 'total_posts'),
+                                 ('source', 'id'): ('twitter_posts_page_id_ad_id', None)}},
+        'polar': {'numeric': 'polar_twitter_numerical_analysis', 'categorical': 'polar_twitter_categorical_analysis',
+                  'groupings': {('source',): 'polar_twitter_source_groupby_analysis',
+                                ('source', 'id'): 'polar_twitter_source_id_groupby_analysis'}}
+    }
+}
+
+# Decimals the scripts round their group tables to; values carry half a unit of that as resolution
+PANDAS_GROUP_DECIMALS = 2
+POLAR_GROUP_DECIMALS = 4
+
+# How many of the largest groups are compared by size
+TOP_GROUPS = 5
+
+# Canonical metric names for the describe() rows and the group-table suffixes
+DESCRIBE_METRICS = {'count': 'count', 'mean': 'mean', 'std': 'std', 'min': 'min', 'max': 'max', '50%': 'median'}
+PANDAS_GROUP_METRICS = {'mean': 'mean', 'median': 'median', 'sum': 'sum', 'count': 'count', '<lambda>': 'mode'}
+POLAR_GROUP_METRICS = ('count', 'mean', 'median', 'std', 'min', 'max', 'nunique')
+
+
+def _number(text):
+    """Float of a result cell, or None for empty/NaN cells and non-numbers"""
+    if text is None or text == '':
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+def _key_text(text):
+    """Group key as text, with integral floats ('123.0') written as integers"""
+    value = _number(text)
+    if value is not None and value.is_integer() and not text.strip().isdigit():
+        return str(int(value))
+    return text
+
+def _read_table(path):
+    """(header, rows) of a CSV result file, all cells as text"""
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        return header, list(reader)
+
+def _add(facts, key, value, resolution=0.0):
+    facts[key] = (value, resolution)
+
+def _group_summaries(facts, grouping, sizes, means, resolution):
+    """Facts derivable from per-group sizes and per-group column means
+
+    sizes: {group key: rows} (may be empty); means: {column: {group key: mean}}.
+    These match what the pure engine reports per grouping.
+    """
+    if sizes:
+        ordered = sorted(sizes.values(), reverse=True)
+        _add(facts, ('groups', grouping, 'num_groups'), float(len(ordered)))
+        _add(facts, ('groups', grouping, 'group_size_min'), float(ordered[-1]))
+        _add(facts, ('groups', grouping, 'group_size_max'), float(ordered[0]))
+        _add(facts, ('groups', grouping, 'group_size_mean'), sum(ordered) / len(ordered))
+        for i, size in enumerate(ordered[:TOP_GROUPS]):
+            _add(facts, ('groups', grouping, f'top_size_{i + 1}'), float(size))
+    for column, group_means in means.items():
+        values = [value for value in group_means.values() if value is not None]
+        if not values:
+            continue
+        _add(facts, ('group_means', grouping, column, 'count'), float(len(values)))
+        _add(facts, ('group_means', grouping, column, 'mean'), sum(values) / len(values), resolution)
+        _add(facts, ('group_means', grouping, column, 'min'), min(values), resolution)
+        _add(facts, ('group_means', grouping, column, 'max'), max(values), resolution)
+
+def _describe_facts(facts, path):
+    """Overall numeric facts from a describe() table (statistics as rows, columns as columns)"""
+    header, rows = _read_table(path)
+    by_stat = {row[0]: row for row in rows}
+    for index, column in enumerate(header):
+        if index == 0:
+            continue
+        for stat, metric in DESCRIBE_METRICS.items():
+            if stat in by_stat:
+                _add(facts, ('column', column, metric), _number(by_stat[stat][index]))
+    return header, by_stat
+
+def canonical_pure(dataset, data_dir):
+    """Canonical facts from the pure engine's long-format results"""
+    spec = ENGINE_OUTPUTS[dataset]['pure']
+    _, rows = _read_table(os.path.join(data_dir, f"{spec['results']}.csv"))
+    facts = {}
+    most_frequent = {}
+    for analysis_type, _, column, metric, value in rows:
+        if analysis_type == 'Dataset_Info':
+            if metric == 'total_rows':
+                _add(facts, ('dataset', 'rows'), _number(value))
+        elif analysis_type == 'Overall':
+            if metric == 'non_null_count':
+                _add(facts, ('column', column, 'count'), _number(value))
+            elif metric in ('mean', 'std', 'min', 'max', 'unique_count'):
+                _add(facts, ('column', column, metric), _number(value))
+            elif metric.startswith('most_frequent_'):
+                label, _, count = value.rpartition(':')
+                most_frequent.setdefault(column, []).append((label, _number(count)))
+        elif analysis_type.startswith('Grouped_'):
+            grouping = spec['groupings'][analysis_type[len('Grouped_'):]]
+            if column == 'GROUP_SUMMARY':
+                _add(facts, ('groups', grouping, metric), _number(value))
+            elif column == 'TOP_GROUPS':
+                _add(facts, ('groups', grouping, metric.replace('top_group_', 'top_size_')),
+                     _number(value.rpartition(':')[2]))
+            elif metric.startswith('group_means_'):
+                _add(facts, ('group_means', grouping, column, metric[len('group_means_'):]), _number(value))
+
+    for column, values in most_frequent.items():
+        _add(facts, ('column', column, 'top_count'), values[0][1])
+        # A tied top value is arbitrary, so only an outright winner is comparable
+        if len(values) == 1 or values[1][1] < values[0][1]:
+            _add(facts, ('column', column, 'top_value'), values[0][0])
+    return facts
+
+def canonical_pandas(dataset, data_dir):
+    """Canonical facts from the pandas engine's describe, categorical and group tables"""
+    spec = ENGINE_OUTPUTS[dataset]['pandas']
+    facts = {}
+    _describe_facts(facts, os.path.join(data_dir, f"{spec['numeric']}.csv"))
+
+    header, rows = _read_table(os.path.join(data_dir, f"{spec['categorical']}.csv"))
+    for row in rows:
+        record = dict(zip(header, row))
+        column = record['column']
+        _add(facts, ('column', column, 'count'), _number(record['total_records']))
+        _add(facts, ('column', column, 'unique_count'), _number(record['unique_count']))
+        if record['most_frequent'] != '':
+            _add(facts, ('column', column, 'top_value'), record['most_frequent'])
+            _add(facts, ('column', column, 'top_count'), _number(record['most_frequent_count']))
+
+    resolution = 0.5 * 10 ** -PANDAS_GROUP_DECIMALS
+    for grouping, (stem, size_column) in spec['groupings'].items():
+        header, rows = _read_table(os.path.join(data_dir, f'{stem}.csv'))
+        width = len(grouping)
+        sizes, means = {}, {}
+        for row in rows:
+            key = tuple(_key_text(text) for text in row[:width])
+            for column_name, text in zip(header[width:], row[width:]):
+                value = _number(text)
+                if column_name == size_column:
+                    sizes[key] = value
+                    _add(facts, ('group', grouping, key, '*', 'size'), value)
+                elif size_column is None:
+                    # One row per group holding each column's first value
+                    _add(facts, ('group', grouping, key, column_name, 'first'), value, resolution)
+                else:
+                    column, _, suffix = column_name.rpartition('_')
+                    metric = PANDAS_GROUP_METRICS.get(suffix)
+                    if metric:
+                        _add(facts, ('group', grouping, key, column, metric), value, resolution)
+                        if metric == 'mean':
+                            means.setdefault(column, {})[key] = value
+        if size_column is None:
+            _add(facts, ('groups', grouping, 'num_groups'), float(len(rows)))
+        _group_summaries(facts, grouping, sizes, means, resolution)
+    return facts
+
+def canonical_polar(dataset, data_dir):
+    """Canonical facts from the Polars-named engine's describe, categorical and group tables"""
+    spec = ENGINE_OUTPUTS[dataset]['polar']
+    facts = {}
+    header, by_stat = _describe_facts(facts, os.path.join(data_dir, f"{spec['numeric']}.csv"))
+    total_rows = None
+    if len(header) > 1 and 'count' in by_stat and 'missing_count' in by_stat:
+        total_rows = (_number(by_stat['count'][1]) or 0.0) + (_number(by_stat['missing_count'][1]) or 0.0)
+        _add(facts, ('dataset', 'rows'), total_rows)
+
+    header, rows = _read_table(os.path.join(data_dir, f"{spec['categorical']}.csv"))
+    for row in rows:
+        record = dict(zip(header, row))
+        column = record['column']
+        _add(facts, ('column', column, 'unique_count'), _number(record['unique_count']))
+        if total_rows is not None:
+            _add(facts, ('column', column, 'count'), total_rows - _number(record['missing_count']))
+        if record['top_value'] != '':
+            _add(facts, ('column', column, 'top_value'), record['top_value'])
+            _add(facts, ('column', column, 'top_count'), _number(record['top_frequency']))
+
+    resolution = 0.5 * 10 ** -POLAR_GROUP_DECIMALS
+    for grouping, stem in spec['groupings'].items():
+        header, rows = _read_table(os.path.join(data_dir, f'{stem}.csv'))
+        width = len(grouping)
+        sizes, means = {}, {}
+        for row in rows:
+            key = tuple(_key_text(text) for text in row[:width])
+            group = {}
+            for column_name, text in zip(header[width:], row[width:]):
+                column, _, metric = column_name.rpartition('_')
+                if metric in POLAR_GROUP_METRICS:
+                    group.setdefault(column, {})[metric] = _number(text)
+            # Every row is in the group, so its size is the largest non-null count
+            sizes[key] = max((stats.get('count') or 0.0) for stats in group.values()) if group else 0.0
+            _add(facts, ('group', grouping, key, '*', 'size'), sizes[key])
+            for column, stats in group.items():
+                for metric, value in stats.items():
+                    _add(facts, ('group', grouping, key, column, metric), value, resolution)
+                if 'mean' in stats:
+                    means.setdefault(column, {})[key] = stats['mean']
+                    if sizes[key] == 1 and stats.get('count') == 1:
+                        # A single-row group's mean is its value, comparable with pandas' 'first'
+                        _add(facts, ('group', grouping, key, column, 'first'), stats['mean'], resolution)
+        _group_summaries(facts, grouping, sizes, means, resolution)
+    return facts
+
+CANONICALIZERS = {'pure': canonical_pure, 'pandas': canonical_pandas, 'polar': canonical_polar}
+
+def values_match(left, right, rel_tol, abs_tol):
+    """Compare two (value, resolution) facts; numbers within tolerance plus both roundings"""
+    (a, a_resolution), (b, b_resolution) = left, right
+    if a is None or b is None or isinstance(a, str) or isinstance(b, str):
+        return a == b
+    allowed = max(rel_tol * max(abs(a), abs(b)), abs_tol) + a_resolution + b_resolution
+    return abs(a - b) <= allowed
+
+def compare_facts(left, right, rel_tol=1e-9, abs_tol=1e-9):
+    """(compared count, [(key, left value, right value)], only-left count, only-right count)"""
+    shared = left.keys() & right.keys()
+    mismatches = [(key, left[key][0], right[key][0]) for key in sorted(shared, key=repr)
+                  if not values_match(left[key], right[key], rel_tol, abs_tol)]
+    return len(shared), mismatches, len(left.keys() - shared), len(right.keys() - shared)
+
+def check_equivalence(datasets, engines, data_dir, rel_tol=1e-9, abs_tol=1e-9, show=10):
+    """Print a cross-engine comparison for every dataset and engine pair; returns the mismatch count"""
+    total_mismatches = 0
+    for dataset in datasets:
+        facts = {engine: CANONICALIZERS[engine](dataset, data_dir) for engine in engines}
+        print(f"\n{dataset}: " + ', '.join(f"{engine} {len(facts[engine])} facts" for engine in engines))
+        for i, left in enumerate(engines):
+            for right in engines[i + 1:]:
+                compared, mismatches, only_left, only_right = compare_facts(facts[left], facts[right], rel_tol, abs_tol)
+                status = 'OK' if not mismatches else f'{len(mismatches)} MISMATCHES'
+                print(f"  {left} vs {right}: {compared} shared facts, {status} "
+                      f"({only_left} only in {left}, {only_right} only in {right})")
+                for key, a, b in mismatches[:show]:
+                    print(f"    {key}: {left}={a!r} {right}={b!r}")
+                if len(mismatches) > show:
+                    print(f"    ... {len(mismatches) - show} more")
+                total_mismatches += len(mismatches)
+    return total_mismatches
+
+def run_engines(datasets, engines, data_dir, jobs):
+    """Run the scripts concurrently with CSV output; returns the names of failed jobs"""
+    from run_all import plan_jobs, run_jobs
+    log_dir = os.path.join(cache_dir(data_dir), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    job_list = plan_jobs(datasets, engines, data_dir, log_dir, ['--output-format', 'csv'])
+    results, wall = run_jobs(job_list, max(1, min(jobs, len(job_list))), data_dir)
+    print(f"Ran {len(results)} jobs in {wall:.2f}s (logs in {log_dir})")
+    return [result['name'] for result in results if result['status'] != 'ok']
+
+def main():
+    """Run the engines on synthetic (or given) data and diff their normalized results"""
+    parser = argparse.ArgumentParser(description="Check that the pure, pandas and polar engines produce equivalent results")
+    parser.add_argument('--data-dir', default=None,
+                        help="Directory holding the dataset CSVs (default: synthetic data in a temporary directory)")
+    parser.add_argument('--rows', type=int, default=None, help="Rows per synthetic dataset")
+    parser.add_argument('--seed', type=int, default=None, help="Seed of the synthetic datasets")
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS), default=list(DATASETS))
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--skip-run', action='store_true', help="Compare the result files already in --data-dir")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes for the runs")
+    parser.add_argument('--rel-tol', type=float, default=1e-9, help="Relative float tolerance")
+    parser.add_argument('--abs-tol', type=float, default=1e-9, help="Absolute float tolerance")
+    parser.add_argument('--show', type=int, default=10, help="Mismatches listed per engine pair")
+    args = parser.parse_args()
+
+    if len(args.engines) < 2:
+        parser.error("--engines needs at least two engines to compare")
+    data_dir = args.data_dir
+    if data_dir is None:
+        if args.skip_run:
+            parser.error("--skip-run needs --data-dir")
+        from synthetic_datasets import DEFAULT_ROWS, DEFAULT_SEED, write_synthetic_datasets
+        data_dir = tempfile.mkdtemp(prefix='engine_equivalence_')
+        rows = args.rows or DEFAULT_ROWS
+        write_synthetic_datasets(data_dir, rows, DEFAULT_SEED if args.seed is None else args.seed, args.datasets)
+        print(f"Synthetic datasets ({rows} rows each) in {data_dir}")
+
+    if not args.skip_run:
+        failed = run_engines(args.datasets, args.engines, data_dir, args.jobs)
+        if failed:
+            print(f"Failed: {', '.join(failed)}")
+            sys.exit(2)
+
+    mismatches = check_equivalence(args.datasets, args.engines, data_dir, args.rel_tol, args.abs_tol, args.show)
+    print(f"\n{'All engines equivalent' if not mismatches else f'{mismatches} mismatching facts'} "
+          f"(rel_tol={args.rel_tol}, abs_tol={args.abs_tol})")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+
+from dataset_configs import DATASETS, cache_dir, dataset_config, dataset_path
+
+# Bytes before the indexed end of the file that must be unchanged for an append-only update
+_TAIL_BYTES = 4096
+_BATCH_ROWS = 50000
+
+
+def index_path(dataset, data_dir='.'):
+    return os.path.join(cache_dir(data_dir), f'{dataset}.idindex.sqlite')
+
+def iter_records(file, start):
+    """Yield (offset, record bytes) for each CSV record from byte offset start
+
+    A record ends at a newline outside quotes, so quoted multi-line messages
+    stay one record. An unterminated final record is yielded as well.
+    """
+    file.seek(start)
+    offset = start
+    record_start = start
+    pending = []
+    quotes = 0
+    for line in file:
+        if not pending:
+            record_start = offset
+        pending.append(line)
+        quotes += line.count(b'"')
+        offset += len(line)
+        if quotes % 2 == 0:
+            yield record_start, b''.join(pending)
+            pending = []
+            quotes = 0
+
+def parse_record(data):
+    """Split one record's bytes into its fields"""
+    return next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), [])
+
+def _tail_hash(file, end):
+    file.seek(max(0, end - _TAIL_BYTES))
+    return hashlib.sha1(file.read(min(end, _TAIL_BYTES))).hexdigest()
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    connection.execute("CREATE TABLE IF NOT EXISTS id_rows (column_name TEXT, value TEXT, "
+                       "row_number INTEGER, byte_offset INTEGER)")
+    connection.execute("CREATE INDEX IF NOT EXISTS id_rows_lookup ON id_rows (column_name, value)")
+    return connection
+
+def _read_meta(connection):
+    return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM meta")}
+
+def _index_records(connection, file, start, first_row, indices):
+    """Insert (column, value, row, offset) for every record from start; returns (rows, end, terminated)"""
+    batch = []
+    row_number = first_row
+    end = start
+    terminated = True
+    for offset, data in iter_records(file, start):
+        record = parse_record(data)
+        for col_name, col_idx in indices:
+            if col_idx < len(record) and record[col_idx] != '':
+                batch.append((col_name, record[col_idx], row_number, offset))
+        row_number += 1
+        end = offset + len(data)
+        terminated = data.endswith(b'\n')
+        if len(batch) >= _BATCH_ROWS:
+            connection.executemany("INSERT INTO id_rows VALUES (?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        connection.executemany("INSERT INTO id_rows VALUES (?, ?, ?, ?)", batch)
+    return row_number - first_row, end, terminated
+
+def update_id_index(dataset, data_dir='.', columns=None, verbose=False, rebuild=False):
+    """Build the ID index for a dataset, or extend it if the CSV was only appended to
+
+    The index maps each value of the ID columns to its row numbers and the
+    byte offsets of those rows in the CSV. It is current when the file's size
+    and modification time are those it was indexed at. An append is detected
+    when the file grew, the bytes just before the indexed end are unchanged
+    and the last indexed record ended with a newline; anything else, or
+    rebuild, rebuilds the index. Edits these checks cannot see, such as a
+    rewrite inside the file that keeps its size and tail, are caught when
+    rows are read back by verified_positions().
+
+    Only dataset_query.py and the query service use the index; the analysis
+    scripts read every row anyway and neither build nor consult it.
+    Returns {'mode': 'current'|'append'|'build', 'rows_added': n, 'rows': total}.
+    """
+    columns = list(columns or dataset_config(dataset)['id_columns'])
+    source = dataset_path(dataset, data_dir)
+    stat = os.stat(source)
+    size = stat.st_size
+    start_time = time.perf_counter()
+    connection = _connect(index_path(dataset, data_dir))
+    try:
+        with open(source, 'rb') as file:
+            header_offset, header_bytes = next(iter_records(file, 0), (0, b''))
+            headers = parse_record(header_bytes)
+            missing = [col for col in columns if col not in headers]
+            if missing:
+                raise ValueError(f"ID columns not found in {os.path.basename(source)}: {missing}")
+            indices = [(col, headers.index(col)) for col in columns]
+
+            meta = _read_meta(connection)
+            mode = 'build'
+            if (not rebuild and meta.get('headers') == headers and meta.get('columns') == columns
+                    and meta.get('terminated') and meta.get('indexed_size', -1) <= size
+                    and meta.get('tail_hash') == _tail_hash(file, meta['indexed_size'])):
+                if meta['indexed_size'] < size:
+                    mode = 'append'
+                elif meta.get('mtime_ns') == stat.st_mtime_ns:
+                    mode = 'current'
+
+            if mode == 'current':
+                return {'mode': mode, 'rows_added': 0, 'rows': meta['rows']}
+            if mode == 'build':
+                connection.execute("DELETE FROM id_rows")
+                start, first_row = header_offset + len(header_bytes), 0
+            else:
+                start, first_row = meta['indexed_size'], meta['rows']
+
+            added, end, terminated = _index_records(connection, file, start, first_row, indices)
+            if added == 0:
+                end = start
+            meta = {
+                'headers': headers,
+                'columns': columns,
+                'rows': first_row + added,
+                'indexed_size': end,
+                'terminated': terminated,
+                'tail_hash': _tail_hash(file, end),
+                'mtime_ns': stat.st_mtime_ns
+            }
+        connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [(key, json.dumps(value)) for key, value in meta.items()])
+        connection.commit()
+    finally:
+        connection.close()
+    if verbose:
+        print(f"ID index for {dataset} ({mode}): {added} rows added, {meta['rows']} indexed "
+              f"in {time.perf_counter() - start_time:.2f}s")
+    return {'mode': mode, 'rows_added': added, 'rows': meta['rows']}
+
+def indexed_columns(dataset, data_dir='.'):
+    """ID columns covered by an existing index, or [] when there is none"""
+    path = index_path(dataset, data_dir)
+    if not os.path.exists(path):
+        return []
+    connection = _connect(path)
+    try:
+        return _read_meta(connection).get('columns', [])
+    finally:
+        connection.close()
+
+def lookup_positions(dataset, column, value, data_dir='.'):
+    """[(row_number, byte_offset)] of the rows whose column equals value, in file order"""
+    connection = _connect(index_path(dataset, data_dir))
+    try:
+        return connection.execute(
+            "SELECT row_number, byte_offset FROM id_rows WHERE column_name = ? AND value = ? ORDER BY row_number",
+            (column, str(value))).fetchall()
+    finally:
+        connection.close()
+
+def read_records_at(path, offsets):
+    """Yield the parsed CSV records starting at each byte offset"""
+    with open(path, 'rb') as file:
+        for offset in offsets:
+            _, data = next(iter_records(file, offset))
+            yield parse_record(data)
+
+def _read_headers(source):
+    with open(source, 'rb') as file:
+        return parse_record(next(iter_records(file, 0), (0, b''))[1])
+
+def verified_positions(dataset, column, value, data_dir='.'):
+    """lookup_positions() after refreshing the index, with every record checked as it is read back
+
+    Each position is re-read and its column compared with value. A mismatch
+    means the CSV changed in a way the size/mtime/tail checks missed, so the
+    index is rebuilt and the lookup repeated. Returns (positions, records).
+    """
+    source = dataset_path(dataset, data_dir)
+    for rebuild in (False, True):
+        update_id_index(dataset, data_dir, rebuild=rebuild)
+        headers = _read_headers(source)
+        if column not in headers:
+            return [], []
+        column_index = headers.index(column)
+        positions = lookup_positions(dataset, column, value, data_dir)
+        records = list(read_records_at(source, [offset for _, offset in positions]))
+        if all(column_index < len(record) and record[column_index] == str(value) for record in records):
+            break
+    return positions, records
+
+def lookup_rows(dataset, column, value, data_dir='.'):
+    """All rows with column == value as dicts, refreshing the index first if needed"""
+    headers = _read_headers(dataset_path(dataset, data_dir))
+    _, records = verified_positions(dataset, column, value, data_dir)
+    return [dict(zip(headers, record)) for record in records]
+
+def main():
+    """Build/update a dataset's ID index and look up rows by ID"""
+    parser = argparse.ArgumentParser(description="Persistent ID -> row index for the election datasets")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--data-dir', default='.', help="Directory holding the dataset CSVs")
+    parser.add_argument('--lookup', nargs=2, metavar=('COLUMN', 'VALUE'), help="Print the rows with COLUMN == VALUE")
+    parser.add_argument('--columns', nargs='+', help="Columns to print for each row (default: all)")
+    args = parser.parse_args()
+
+    update_id_index(args.dataset, args.data_dir, verbose=True)
+    if args.lookup:
+        start = time.perf_counter()
+        rows = lookup_rows(args.dataset, args.lookup[0], args.lookup[1], args.data_dir)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print({col: row.get(col) for col in args.columns} if args.columns else row)
+        print(f"{len(rows)} rows with {args.lookup[0]}={args.lookup[1]} in {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
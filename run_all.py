@@ -0,0 +1,200 @@
+import argparse
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+
+from dataset_configs import DATASETS, ENGINES, cache_dir, dataset_input_path, dataset_path, script_path
+
+# Rough seconds per MB of input for each engine, only used to order the jobs
+ENGINE_COST = {'pure': 3.0, 'pandas': 1.0, 'polar': 1.5, 'prepare': 0.6}
+
+# Engines whose scripts load the dataset with pd.read_csv and can share one parsed frame
+FRAME_ENGINES = ('pandas', 'polar')
+
+
+def frame_cache_path(dataset, data_dir):
+    return os.path.join(cache_dir(data_dir), f'{dataset}.frame.pkl')
+
+def _install_shared_read_csv(shared_frames):
+    """Make pd.read_csv(path) load the pickled frame prepared for that CSV
+
+    Only plain pd.read_csv(path) calls are redirected, and only while the
+    pickle is newer than the CSV; anything else falls through to pandas.
+    """
+    import pandas as pd
+
+    read_csv = pd.read_csv
+    if not hasattr(read_csv, 'shared_frames'):
+        original = read_csv
+
+        def read_csv(filepath_or_buffer, *args, **kwargs):
+            if not args and not kwargs and isinstance(filepath_or_buffer, str):
+                frame_path = read_csv.shared_frames.get(os.path.abspath(filepath_or_buffer))
+                if (frame_path and os.path.exists(frame_path)
+                        and os.stat(frame_path).st_mtime >= os.stat(filepath_or_buffer).st_mtime):
+                    return pd.read_pickle(frame_path)
+            return original(filepath_or_buffer, *args, **kwargs)
+
+        read_csv.shared_frames = {}
+        pd.read_csv = read_csv
+    read_csv.shared_frames.update(shared_frames)
+
+def _init_worker(data_dir):
+    """Scripts read the datasets from, and write their results to, the working directory"""
+    os.chdir(data_dir)
+
+def prepare_frame(job):
+    """Parse a dataset CSV once and pickle the DataFrame for the pandas and polar jobs"""
+    start = time.perf_counter()
+    import pandas as pd
+    df = pd.read_csv(job['csv_path'])
+    df.to_pickle(job['frame_path'])
+    return {'name': job['name'], 'status': 'ok', 'error': None,
+            'seconds': time.perf_counter() - start, 'pid': os.getpid()}
+
+def run_script(job):
+    """Run one analysis script in this worker, logging its output to job['log_path']"""
+    start = time.perf_counter()
+    if job['shared_frames']:
+        _install_shared_read_csv(job['shared_frames'])
+
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    sys.argv = [job['script']] + job['args']
+    sys.path.insert(0, os.path.dirname(job['script']))
+    status, error = 'ok', None
+    try:
+        with open(job['log_path'], 'w', encoding='utf-8') as log, redirect_stdout(log), redirect_stderr(log):
+            try:
+                runpy.run_path(job['script'], run_name='__main__')
+            except SystemExit as exit_error:
+                if exit_error.code not in (None, 0):
+                    status, error = 'failed', f"exit status {exit_error.code}"
+            except Exception as exception:
+                status, error = 'failed', f"{type(exception).__name__}: {exception}"
+                traceback.print_exc()
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+    return {'name': job['name'], 'status': status, 'error': error,
+            'seconds': time.perf_counter() - start, 'pid': os.getpid()}
+
+def plan_jobs(datasets, engines, data_dir, log_dir, script_args, share_inputs=True):
+    """Build the job list: one per dataset x engine, plus a frame-preparing job per shared dataset
+
+    Each job gets an estimated cost (input MB x ENGINE_COST) and a priority
+    equal to the longest chain of work it starts, so a prepare job ranks by
+    its own cost plus its most expensive dependent.
+    """
+    jobs = []
+    for dataset in datasets:
+        csv_path = os.path.abspath(dataset_path(dataset, data_dir))
+        size_mb = os.stat(dataset_input_path(dataset, data_dir)).st_size / (1024 * 1024)
+        frame_engines = [engine for engine in engines if engine in FRAME_ENGINES]
+        # A compressed copy is streamed by each script, so there is no plain read_csv(path) to share
+        share = share_inputs and len(frame_engines) > 1 and os.path.exists(csv_path)
+
+        prepare = None
+        shared_frames = {}
+        if share:
+            frame_path = os.path.abspath(frame_cache_path(dataset, data_dir))
+            shared_frames = {csv_path: frame_path}
+            prepare = {'name': f'{dataset}/prepare', 'kind': 'prepare', 'dataset': dataset,
+                       'csv_path': csv_path, 'frame_path': frame_path,
+                       'cost': size_mb * ENGINE_COST['prepare'], 'depends_on': None}
+            jobs.append(prepare)
+
+        for engine in engines:
+            uses_frame = share and engine in FRAME_ENGINES
+            jobs.append({
+                'name': f'{dataset}/{engine}', 'kind': 'script', 'dataset': dataset, 'engine': engine,
+                'script': script_path(dataset, engine), 'args': list(script_args),
+                'log_path': os.path.abspath(os.path.join(log_dir, f'{dataset}_{engine}.log')),
+                'shared_frames': shared_frames if uses_frame else {},
+                'cost': size_mb * ENGINE_COST[engine],
+                'depends_on': prepare['name'] if uses_frame else None
+            })
+
+    for job in jobs:
+        job['priority'] = job['cost']
+    for job in jobs:
+        if job['depends_on']:
+            parent = next(candidate for candidate in jobs if candidate['name'] == job['depends_on'])
+            parent['priority'] = max(parent['priority'], parent['cost'] + job['cost'])
+    return jobs
+
+def run_jobs(jobs, max_workers, data_dir):
+    """Run jobs on a bounded process pool, highest priority first, printing progress as they finish"""
+    waiting = {job['name']: job for job in jobs if job['depends_on']}
+    ready = [job for job in jobs if not job['depends_on']]
+    results = []
+    running = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(os.path.abspath(data_dir),)) as pool:
+        while ready or running:
+            ready.sort(key=lambda job: job['priority'], reverse=True)
+            while ready and len(running) < max_workers:
+                job = ready.pop(0)
+                target = prepare_frame if job['kind'] == 'prepare' else run_script
+                running[pool.submit(target, job)] = job
+                print(f"[{time.perf_counter() - start:7.2f}s] started  {job['name']} "
+                      f"(estimated cost {job['cost']:.1f})", flush=True)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exception:
+                    result = {'name': job['name'], 'status': 'failed', 'seconds': 0.0, 'pid': None,
+                              'error': f"{type(exception).__name__}: {exception}"}
+                results.append(result)
+                note = f" - {result['error']}" if result['error'] else ''
+                print(f"[{time.perf_counter() - start:7.2f}s] finished {job['name']} {result['status']} "
+                      f"in {result['seconds']:.2f}s ({len(results)}/{len(jobs)}){note}", flush=True)
+
+                # Dependents run either way; without the pickle they parse the CSV themselves
+                for name in [name for name, child in waiting.items() if child['depends_on'] == job['name']]:
+                    ready.append(waiting.pop(name))
+
+    return results, time.perf_counter() - start
+
+def main():
+    """Run every dataset x engine analysis concurrently"""
+    parser = argparse.ArgumentParser(description="Run the pure, pandas and polar analyses of all datasets concurrently")
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS), default=list(DATASETS))
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--data-dir', default='.', help="Directory holding the dataset CSVs; results are written here")
+    parser.add_argument('--log-dir', default=None, help="Per-job output logs (default: <data-dir>/.stats_cache/logs)")
+    parser.add_argument('--output-format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    parser.add_argument('--no-share', action='store_true',
+                        help="Let every pandas/polar job parse its CSV instead of sharing one parsed frame")
+    args = parser.parse_args()
+
+    log_dir = args.log_dir or os.path.join(cache_dir(args.data_dir), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    jobs = plan_jobs(args.datasets, args.engines, args.data_dir, log_dir,
+                     ['--output-format', args.output_format], not args.no_share)
+    workers = max(1, min(args.jobs, len(jobs)))
+    print(f"Running {len(jobs)} jobs on {workers} worker processes (logs in {log_dir})")
+
+    results, wall = run_jobs(jobs, workers, args.data_dir)
+
+    print(f"\n{'job':<22}{'status':<9}{'seconds':>9}")
+    for result in sorted(results, key=lambda result: result['seconds'], reverse=True):
+        print(f"{result['name']:<22}{result['status']:<9}{result['seconds']:>9.2f}")
+    longest = max(result['seconds'] for result in results)
+    print(f"\nWall time {wall:.2f}s for {sum(result['seconds'] for result in results):.2f}s of work "
+          f"(longest job {longest:.2f}s)")
+    failed = [result['name'] for result in results if result['status'] != 'ok']
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
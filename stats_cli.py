@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Only the stdlib and the static dataset registry are imported up front;
+# pandas, pyarrow and the engines load when a command actually needs them.
+from dataset_configs import DATASETS, ENGINES, REPO_ROOT, dataset_input_path, dataset_path, script_path
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f'stats_worker_{os.getuid()}.sock')
+
+# Modules a warm worker imports before accepting jobs
+WARM_MODULES = ('numpy', 'pandas', 'pyarrow', 'pyarrow.parquet', 'grouping_sets', 'output_formats',
+                'sorted_groupby', 'spill_aggregation', 'pandas_grouping_sets', 'pandas_output_formats')
+
+# Marks the end of a worker's streamed output; followed by the exit status
+_EXIT_MARKER = b'\0EXIT '
+
+ENGINE_DIRS = ('PurePythonStats', 'PandasStats')
+
+# Subcommands that hand their arguments to another tool's main(): name -> (module, help)
+DELEGATED = {
+    'query': ('dataset_query', "Filter/group-by/aggregate query (dataset_query.py)"),
+    'run-all': ('run_all', "Run every dataset x engine concurrently (run_all.py)"),
+    'serve': ('stats_query_service', "HTTP query service over the results (stats_query_service.py)"),
+    'index': ('id_index', "Build or query the ID index (id_index.py)"),
+    'zone-maps': ('zone_maps', "Build the zone-mapped block cache (zone_maps.py)"),
+    'check': ('engine_equivalence', "Cross-engine result equivalence check (engine_equivalence.py)")
+}
+
+
+def run_local(script, script_args):
+    """Run an analysis script in this process; returns its exit status"""
+    import runpy
+    sys.argv = [script] + script_args
+    sys.path.insert(0, os.path.dirname(script))
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as exit_error:
+        return exit_error.code if isinstance(exit_error.code, int) else (0 if exit_error.code is None else 1)
+    return 0
+
+def run_warm(script, script_args, socket_path):
+    """Send a job to the warm worker and stream its output; returns the exit status"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError as error:
+        raise SystemExit(f"No warm worker on {socket_path} ({error}); start one with: stats_cli.py worker")
+    request = {'script': script, 'args': script_args, 'cwd': os.getcwd()}
+    client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+    out = sys.stdout.buffer
+    pending = b''
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        pending += chunk
+        # Hold back enough bytes that a split exit marker is never printed
+        keep = len(_EXIT_MARKER) + 12
+        if len(pending) > keep:
+            out.write(pending[:-keep])
+            pending = pending[-keep:]
+    client.close()
+
+    body, marker, status = pending.rpartition(_EXIT_MARKER)
+    if not marker:
+        out.write(pending)
+        out.flush()
+        print("Warm worker closed the connection without an exit status", file=sys.stderr)
+        return 1
+    out.write(body)
+    out.flush()
+    return int(status.strip() or 0)
+
+def serve_worker(socket_path, modules=WARM_MODULES):
+    """Import the heavy modules once, then fork a child per job on a Unix socket
+
+    Each child inherits the warm interpreter, changes to the client's working
+    directory, runs the script with runpy and streams stdout/stderr back. The
+    fork keeps jobs isolated: nothing a script does leaks into the next one.
+    """
+    import importlib
+    import io
+    import runpy
+    import socketserver
+    from contextlib import redirect_stderr, redirect_stdout
+
+    for directory in ENGINE_DIRS:
+        sys.path.insert(0, os.path.join(REPO_ROOT, directory))
+    start = time.perf_counter()
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    print(f"Warm worker imported {', '.join(loaded)} in {time.perf_counter() - start:.2f}s")
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            output = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+            status = 0
+            with redirect_stdout(output), redirect_stderr(output):
+                try:
+                    os.chdir(request['cwd'])
+                    status = run_local(request['script'], request['args'])
+                except Exception:
+                    import traceback
+                    traceback.print_exc()
+                    status = 1
+            output.flush()
+            self.wfile.write(_EXIT_MARKER + str(status).encode('ascii') + b'\n')
+
+    class ForkingUnixServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+        pass
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with ForkingUnixServer(socket_path, JobHandler) as server:
+        print(f"Warm worker listening on {socket_path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+def _timed(command, cwd):
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise SystemExit(f"{' '.join(command)} failed with exit status {completed.returncode}")
+    return elapsed
+
+def bench_startup(dataset, engines, repeat, data_dir):
+    """Measure cold (new interpreter) versus warm (worker) starts for each engine
+
+    Every run writes the engine's normal result files into data_dir.
+    """
+    cli = os.path.abspath(__file__)
+    data_dir = os.path.abspath(data_dir)
+    if not os.path.exists(dataset_input_path(dataset, data_dir)):
+        raise SystemExit(f"{dataset_path(dataset, data_dir)} not found; pass --data-dir")
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='stats_bench_'), 'worker.sock')
+    worker = subprocess.Popen([sys.executable, cli, 'worker', '--socket', socket_path],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        waited = time.perf_counter()
+        while not os.path.exists(socket_path):
+            if worker.poll() is not None or time.perf_counter() - waited > 60:
+                raise SystemExit("Warm worker did not start")
+            time.sleep(0.05)
+
+        rows = []
+        help_times = [_timed([sys.executable, cli, 'run', dataset, 'pandas', '--', '--help'], data_dir)
+                      for _ in range(repeat)]
+        import_times = [_timed([sys.executable, '-c', 'import pandas'], data_dir) for _ in range(repeat)]
+        rows.append(('pandas script --help', statistics.median(help_times), None))
+        rows.append(("python -c 'import pandas'", statistics.median(import_times), None))
+        for engine in engines:
+            cold = [_timed([sys.executable, cli, 'run', dataset, engine], data_dir) for _ in range(repeat)]
+            warm = [_timed([sys.executable, cli, 'run', dataset, engine, '--warm', '--socket', socket_path], data_dir)
+                    for _ in range(repeat)]
+            rows.append((f'{dataset} {engine}', statistics.median(cold), statistics.median(warm)))
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    print(f"\nMedian of {repeat} runs")
+    print(f"{'command':<28}{'cold (s)':>10}{'warm (s)':>10}{'saved':>8}")
+    for name, cold, warm in rows:
+        if warm is None:
+            print(f"{name:<28}{cold:>10.3f}{'':>10}{'':>8}")
+        else:
+            print(f"{name:<28}{cold:>10.3f}{warm:>10.3f}{(1 - warm / cold) * 100:>7.0f}%")
+
+def _delegate(module_name, prog, arguments):
+    """Run another tool's main() with arguments, importing it only now"""
+    import importlib
+    sys.argv = [prog] + arguments
+    importlib.import_module(module_name).main()
+
+def main():
+    """Single entry point for the analysis scripts and the root-level tools"""
+    parser = argparse.ArgumentParser(description="Unified, fast-starting CLI for the election dataset analyses")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('datasets', help="List the datasets, ID columns and analysis scripts")
+
+    run_parser = commands.add_parser('run', help="Run one dataset's analysis with one engine")
+    run_parser.add_argument('dataset', choices=sorted(DATASETS))
+    run_parser.add_argument('engine', choices=ENGINES)
+    run_parser.add_argument('--warm', action='store_true', help="Run on the warm worker instead of in this process")
+    run_parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Warm worker socket path")
+    run_parser.add_argument('script_args', nargs='*',
+                            help="Arguments for the script after --, e.g. -- --output-format parquet")
+
+    worker_parser = commands.add_parser('worker', help="Start a warm worker daemon on a Unix socket")
+    worker_parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Socket path to listen on")
+
+    bench_parser = commands.add_parser('bench-startup', help="Measure cold versus warm start times")
+    bench_parser.add_argument('--dataset', choices=sorted(DATASETS), default='tw_posts')
+    bench_parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    bench_parser.add_argument('--repeat', type=int, default=3)
+    bench_parser.add_argument('--data-dir', default='.', help="Directory holding the dataset CSVs")
+
+    for name, (_, help_text) in DELEGATED.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+
+    argv = sys.argv[1:]
+    if argv[:1] and argv[0] in DELEGATED:
+        # Delegated tools parse their own arguments, options and --help included
+        _delegate(DELEGATED[argv[0]][0], f'stats_cli.py {argv[0]}', argv[1:])
+        return
+    script_args = []
+    if argv[:1] == ['run'] and '--' in argv:
+        # Everything after -- belongs to the analysis script, not to this CLI
+        split = argv.index('--')
+        argv, script_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+
+    if args.command == 'datasets':
+        for name, config in DATASETS.items():
+            print(f"{name}: {config['filename']}")
+            print(f"  ID columns: {', '.join(config['id_columns'])}")
+            for engine, script in config['scripts'].items():
+                print(f"  {engine}: {script}")
+    elif args.command == 'run':
+        script = script_path(args.dataset, args.engine)
+        script_args = args.script_args + script_args
+        status = run_warm(script, script_args, args.socket) if args.warm else run_local(script, script_args)
+        sys.exit(status)
+    elif args.command == 'worker':
+        serve_worker(args.socket)
+    elif args.command == 'bench-startup':
+        bench_startup(args.dataset, args.engines, args.repeat, args.data_dir)
+
+if __name__ == "__main__":
+    main()
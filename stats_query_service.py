@@ -0,0 +1,547 @@
+import argparse
+import asyncio
+import csv
+import heapq
+import json
+import math
+import os
+import random
+import statistics
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from dataset_configs import DATASETS, dataset_config
+from id_index import lookup_rows
+
+# Result tables written by the PandasStats and PolarStats scripts: name -> (file stem, key column)
+RESULT_TABLES = {
+    'pandas_fb_ads_pages': ('PandasStats/fb_ads_page_id', 'page_id'),
+    'pandas_fb_ads_ads': ('PandasStats/fb_ads_page_id_ad_id', 'page_id'),
+    'pandas_fb_posts_pages': ('PandasStats/fb_posts_Facebook_Id_agg', 'Facebook_Id'),
+    'pandas_fb_posts_posts': ('PandasStats/fb_posts_Facebook_Id_post_id_agg', 'Facebook_Id'),
+    'pandas_tw_sources': ('PandasStats/twitter_posts_source', 'source'),
+    'pandas_tw_posts': ('PandasStats/twitter_posts_page_id_ad_id', 'source'),
+    'polar_fb_ads_pages': ('PolarStats/polar_fb_ads_page_groupby_analysis', 'page_id'),
+    'polar_fb_ads_ads': ('PolarStats/polar_fb_ads_page_ad_groupby_analysis', 'page_id'),
+    'polar_fb_posts_pages': ('PolarStats/polar_fb_posts_facebook_id_groupby_analysis', 'Facebook_Id'),
+    'polar_fb_posts_posts': ('PolarStats/polar_fb_posts_facebook_post_groupby_analysis', 'Facebook_Id'),
+    'polar_tw_sources': ('PolarStats/polar_twitter_source_groupby_analysis', 'source'),
+    'polar_tw_posts': ('PolarStats/polar_twitter_source_id_groupby_analysis', 'source')
+}
+
+RESULT_EXTENSIONS = ('.csv', '.parquet', '.arrow')
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+AGGREGATIONS = ('count', 'sum', 'mean', 'median', 'std', 'min', 'max')
+
+# Longest operators first so '>=' is not read as '>'
+FILTER_OPERATORS = ('>=', '<=', '!=', '==', '>', '<', '=')
+
+
+def parse_cell(text):
+    """Turn one CSV cell into an int, float, string or None"""
+    if text == '':
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        value = float(text)
+    except ValueError:
+        return text
+    return None if math.isnan(value) else value
+
+def clean_value(value):
+    """Make a Parquet/Arrow value JSON-safe (NaN becomes None)"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def _read_csv_rows(path, key_column):
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        headers = next(reader, [])
+        rows = []
+        for record in reader:
+            row = {}
+            for name, text in zip(headers, record):
+                # Keys stay strings so lookups match the URL text exactly
+                row[name] = text if name == key_column else parse_cell(text)
+            rows.append(row)
+    return headers, rows
+
+def _read_columnar_rows(path, key_column):
+    try:
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow results need pyarrow (pip install pyarrow)")
+    if path.endswith('.parquet'):
+        table = pyarrow.parquet.read_table(path)
+    else:
+        table = pyarrow.feather.read_table(path)
+    rows = []
+    for record in table.to_pylist():
+        row = {name: clean_value(value) for name, value in record.items()}
+        if row.get(key_column) is not None:
+            row[key_column] = str(row[key_column])
+        rows.append(row)
+    return table.column_names, rows
+
+def find_result_file(root, stem):
+    """Return the newest of stem.csv/.parquet/.arrow under root, or None"""
+    candidates = []
+    for extension in RESULT_EXTENSIONS:
+        path = os.path.join(root, stem + extension)
+        if os.path.exists(path):
+            candidates.append((os.stat(path).st_mtime_ns, path))
+    return max(candidates)[1] if candidates else None
+
+class ResultTable:
+    """One precomputed result file held in memory and indexed by its key column"""
+
+    def __init__(self, name, stem, key_column):
+        self.name = name
+        self.stem = stem
+        self.key_column = key_column
+        self.path = None
+        self.mtime = None
+        self.headers = []
+        self.rows = []
+        self.index = {}
+        self.version = 0
+
+    def signature(self, root):
+        """(path, mtime) of the file that should be loaded now"""
+        path = find_result_file(root, self.stem)
+        if path is None:
+            return None, None
+        return path, os.stat(path).st_mtime_ns
+
+    def load(self, path, mtime):
+        """Read path and rebuild the key index; the swap is a single assignment"""
+        if path.endswith('.csv'):
+            headers, rows = _read_csv_rows(path, self.key_column)
+        else:
+            headers, rows = _read_columnar_rows(path, self.key_column)
+        index = {}
+        for row in rows:
+            index.setdefault(row.get(self.key_column), []).append(row)
+        self.headers, self.rows, self.index = headers, rows, index
+        self.path, self.mtime = path, mtime
+        self.version += 1
+
+    def lookup(self, key):
+        return self.index.get(key, [])
+
+    def describe(self):
+        return {
+            'table': self.name,
+            'key': self.key_column,
+            'path': self.path,
+            'rows': len(self.rows),
+            'keys': len(self.index),
+            'version': self.version
+        }
+
+class LRUCache:
+    """Least-recently-used cache for ad-hoc query results"""
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, table_name):
+        """Drop every entry computed from table_name"""
+        for key in [key for key in self.entries if key[0] == table_name]:
+            del self.entries[key]
+
+    def describe(self):
+        return {'size': len(self.entries), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses}
+
+def parse_filter(text):
+    """Parse 'column>=value' into (column, operator, value)"""
+    for operator in FILTER_OPERATORS:
+        column, separator, value = text.partition(operator)
+        if separator and column:
+            return column, '==' if operator == '=' else operator, parse_cell(value)
+    raise ValueError(f"Cannot parse filter {text!r}; use column<op>value with one of {FILTER_OPERATORS}")
+
+def _matches(row, filters):
+    for column, operator, expected in filters:
+        value = row.get(column)
+        if operator == '==':
+            if value != expected:
+                return False
+        elif operator == '!=':
+            if value == expected:
+                return False
+        else:
+            if value is None or expected is None:
+                return False
+            try:
+                if operator == '>' and not value > expected:
+                    return False
+                if operator == '<' and not value < expected:
+                    return False
+                if operator == '>=' and not value >= expected:
+                    return False
+                if operator == '<=' and not value <= expected:
+                    return False
+            except TypeError:
+                return False
+    return True
+
+def aggregate_values(values, aggregation):
+    """Apply one of AGGREGATIONS to the non-null numeric values"""
+    values = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if aggregation == 'count':
+        return len(values)
+    if not values:
+        return None
+    if aggregation == 'sum':
+        return math.fsum(values)
+    if aggregation == 'mean':
+        return math.fsum(values) / len(values)
+    if aggregation == 'median':
+        return statistics.median(values)
+    if aggregation == 'std':
+        return statistics.stdev(values) if len(values) > 1 else None
+    if aggregation == 'min':
+        return min(values)
+    if aggregation == 'max':
+        return max(values)
+    raise ValueError(f"Unknown aggregation {aggregation!r}; choose from {AGGREGATIONS}")
+
+class QueryError(Exception):
+    """A bad request, reported to the client with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class StatsQueryService:
+    """In-memory query layer over the result tables with reload-on-change"""
+
+    def __init__(self, root, cache_size=DEFAULT_CACHE_SIZE, tables=RESULT_TABLES, data_dir='.'):
+        self.root = root
+        self.data_dir = data_dir
+        self.tables = {name: ResultTable(name, stem, key) for name, (stem, key) in tables.items()}
+        self.cache = LRUCache(cache_size)
+
+    def stale_tables(self):
+        """Yield (table, path, mtime) for every table whose result file changed"""
+        for table in self.tables.values():
+            path, mtime = table.signature(self.root)
+            if path is not None and (path, mtime) != (table.path, table.mtime):
+                yield table, path, mtime
+
+    def reload(self):
+        """Synchronously load every changed table; returns the names reloaded"""
+        reloaded = []
+        for table, path, mtime in list(self.stale_tables()):
+            table.load(path, mtime)
+            self.cache.invalidate(table.name)
+            reloaded.append(table.name)
+        return reloaded
+
+    def _table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            raise QueryError(404, f"Unknown table {name!r}")
+        if table.path is None:
+            raise QueryError(503, f"Table {name!r} has no result file yet")
+        return table
+
+    def list_tables(self):
+        return {'tables': [table.describe() for table in self.tables.values()], 'cache': self.cache.describe()}
+
+    def get_key(self, table_name, key):
+        """All rows of a table for one key value"""
+        table = self._table(table_name)
+        rows = table.lookup(key)
+        if not rows:
+            raise QueryError(404, f"{table.key_column}={key!r} not found in {table_name}")
+        return {'table': table_name, 'key': key, 'rows': rows}
+
+    def top(self, table_name, by, n=10, order='desc'):
+        """The n rows with the largest (or smallest) value of column by"""
+        table = self._table(table_name)
+        if by not in table.headers:
+            raise QueryError(400, f"Unknown column {by!r} in {table_name}")
+        cache_key = (table_name, table.version, 'top', by, n, order)
+        result = self.cache.get(cache_key)
+        if result is None:
+            candidates = [row for row in table.rows if isinstance(row.get(by), (int, float))]
+            pick = heapq.nlargest if order == 'desc' else heapq.nsmallest
+            result = {'table': table_name, 'by': by, 'order': order,
+                      'rows': pick(n, candidates, key=lambda row: row[by])}
+            self.cache.put(cache_key, result)
+        return result
+
+    def aggregate(self, table_name, filters, columns, aggregations, group_by=None):
+        """Filtered aggregation over a result table, optionally per group_by value"""
+        table = self._table(table_name)
+        unknown = [column for column in columns + [column for column, _, _ in filters] + ([group_by] if group_by else [])
+                   if column not in table.headers]
+        if unknown:
+            raise QueryError(400, f"Unknown columns {unknown} in {table_name}")
+        bad = [aggregation for aggregation in aggregations if aggregation not in AGGREGATIONS]
+        if bad:
+            raise QueryError(400, f"Unknown aggregations {bad}; choose from {AGGREGATIONS}")
+
+        cache_key = (table_name, table.version, 'aggregate', tuple(filters), tuple(columns), tuple(aggregations), group_by)
+        result = self.cache.get(cache_key)
+        if result is None:
+            groups = {}
+            for row in table.rows:
+                if _matches(row, filters):
+                    groups.setdefault(row.get(group_by) if group_by else None, []).append(row)
+            summary = {}
+            for group_key, rows in groups.items():
+                summary[group_key] = {
+                    'rows': len(rows),
+                    'columns': {column: {aggregation: aggregate_values([row.get(column) for row in rows], aggregation)
+                                         for aggregation in aggregations}
+                                for column in columns}
+                }
+            if group_by:
+                result = {'table': table_name, 'group_by': group_by,
+                          'groups': [dict(key=group_key, **values) for group_key, values in summary.items()]}
+            else:
+                result = dict(table=table_name, **summary.get(None, {'rows': 0, 'columns': {}}))
+            self.cache.put(cache_key, result)
+        return result
+
+    def dataset_rows(self, dataset, column, value):
+        """Raw dataset rows for one ID value, read through the persistent ID index"""
+        if dataset not in DATASETS:
+            raise QueryError(404, f"Unknown dataset {dataset!r}")
+        if column not in dataset_config(dataset)['id_columns']:
+            raise QueryError(400, f"{column!r} is not an indexed ID column of {dataset}")
+        try:
+            rows = lookup_rows(dataset, column, value, self.data_dir)
+        except FileNotFoundError:
+            raise QueryError(503, f"Dataset file for {dataset} not found in {self.data_dir}")
+        if not rows:
+            raise QueryError(404, f"{column}={value!r} not found in {dataset}")
+        return {'dataset': dataset, 'column': column, 'value': value, 'rows': rows}
+
+    @staticmethod
+    def reads_dataset(target):
+        """True for /datasets/ targets, which read the dataset CSV and may (re)build its ID index"""
+        return urlsplit(target).path.lstrip('/').startswith('datasets/')
+
+    def handle(self, target):
+        """Route one GET request target to a query; returns (status, payload)"""
+        parts = urlsplit(target)
+        segments = [unquote(segment) for segment in parts.path.split('/') if segment]
+        params = parse_qs(parts.query)
+
+        def param(name, default=None):
+            return params.get(name, [default])[0]
+
+        def param_list(name):
+            return [item for value in params.get(name, []) for item in value.split(',') if item]
+
+        try:
+            if not segments or segments == ['tables']:
+                return 200, self.list_tables()
+            if len(segments) == 4 and segments[0] == 'tables' and segments[2] == 'keys':
+                return 200, self.get_key(segments[1], segments[3])
+            if len(segments) == 3 and segments[0] == 'tables' and segments[2] == 'top':
+                by = param('by')
+                if not by:
+                    raise QueryError(400, "top needs ?by=<column>")
+                order = param('order', 'desc')
+                if order not in ('asc', 'desc'):
+                    raise QueryError(400, "order must be asc or desc")
+                return 200, self.top(segments[1], by, int(param('n', 10)), order)
+            if len(segments) == 3 and segments[0] == 'tables' and segments[2] == 'aggregate':
+                filters = [parse_filter(text) for text in params.get('where', [])]
+                columns = param_list('columns')
+                if not columns:
+                    raise QueryError(400, "aggregate needs ?columns=<column>[,<column>...]")
+                aggregations = param_list('aggs') or ['count', 'mean']
+                return 200, self.aggregate(segments[1], filters, columns, aggregations, param('group_by'))
+            if len(segments) == 5 and segments[0] == 'datasets' and segments[2] == 'rows':
+                return 200, self.dataset_rows(segments[1], segments[3], segments[4])
+            raise QueryError(404, f"No route for {parts.path}")
+        except QueryError as error:
+            return error.status, {'error': str(error)}
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 GET requests on one keep-alive connection"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                break
+            if method != 'GET':
+                status, payload = 405, {'error': f"{method} is not supported"}
+            elif service.reads_dataset(target):
+                # Disk reads and index builds run off the event loop, like table reloads
+                status, payload = await loop.run_in_executor(None, service.handle, target)
+            else:
+                status, payload = service.handle(target)
+
+            body = json.dumps(payload, default=str).encode('utf-8')
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def watch_results(service, interval):
+    """Reload tables whose result files changed, loading off the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        for table, path, mtime in list(service.stale_tables()):
+            try:
+                await loop.run_in_executor(None, table.load, path, mtime)
+            except (OSError, ValueError, ImportError) as error:
+                print(f"Reload of {table.name} from {path} failed: {error}")
+                continue
+            service.cache.invalidate(table.name)
+            print(f"Reloaded {table.name} from {path} ({len(table.rows)} rows)")
+
+async def start_service(service, host, port, reload_interval):
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    watcher = asyncio.create_task(watch_results(service, reload_interval)) if reload_interval > 0 else None
+    return server, watcher
+
+async def serve(service, host, port, reload_interval):
+    server, watcher = await start_service(service, host, port, reload_interval)
+    address = server.sockets[0].getsockname()
+    print(f"Serving stats on http://{address[0]}:{address[1]}/tables")
+    async with server:
+        await server.serve_forever()
+
+async def _get(reader, writer, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+async def benchmark(service, requests):
+    """Time key lookups over one local keep-alive connection and print p50/p99"""
+    server, _ = await start_service(service, '127.0.0.1', 0, 0)
+    port = server.sockets[0].getsockname()[1]
+    targets = [f"/tables/{table.name}/keys/{quote(key, safe='')}" for table in service.tables.values()
+               for key in table.index if key is not None]
+    if not targets:
+        print("No result tables loaded; run the PandasStats/PolarStats scripts first")
+        server.close()
+        return
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    latencies = []
+    for _ in range(requests):
+        target = random.choice(targets)
+        start = time.perf_counter()
+        status = await _get(reader, writer, target)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            print(f"Unexpected status {status} for {target}")
+    writer.close()
+    await writer.wait_closed()
+    await asyncio.sleep(0.01)
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    print(f"{requests} key lookups: p50={percentile(0.50):.3f} ms, p95={percentile(0.95):.3f} ms, "
+          f"p99={percentile(0.99):.3f} ms, max={latencies[-1]:.3f} ms")
+
+def main():
+    """Load the result tables and serve per-key, top-N and filtered aggregate queries"""
+    parser = argparse.ArgumentParser(description="HTTP query service over the precomputed stats outputs")
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Repository root containing PandasStats/ and PolarStats/ results")
+    parser.add_argument('--data-dir', default='.',
+                        help="Directory holding the dataset CSVs for /datasets/<dataset>/rows lookups")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Entries kept in the LRU cache for top-N and aggregate queries")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between result file change checks (0 disables reloading)")
+    parser.add_argument('--benchmark', type=int, metavar='N', default=0,
+                        help="Time N random key lookups against a local instance and exit")
+    args = parser.parse_args()
+
+    service = StatsQueryService(args.root, args.cache_size, data_dir=args.data_dir)
+    start = time.perf_counter()
+    loaded = service.reload()
+    print(f"Loaded {len(loaded)} of {len(service.tables)} result tables in {time.perf_counter() - start:.2f}s")
+    for table in service.tables.values():
+        if table.path is None:
+            print(f"  {table.name}: no {table.stem}.csv/.parquet/.arrow yet")
+
+    if args.benchmark:
+        asyncio.run(benchmark(service, args.benchmark))
+    else:
+        try:
+            asyncio.run(serve(service, args.host, args.port, args.reload_interval))
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import csv
+import hashlib
+import os
+import random
+
+from dataset_configs import DATASETS, dataset_path
+
+DEFAULT_ROWS = 3000
+DEFAULT_SEED = 7
+
+# 0/1 classifier columns shared by all three datasets
+FLAG_COLUMNS = [
+    'election_integrity_Truth_illuminating', 'advocacy_msg_type_illuminating', 'issue_msg_type_illuminating',
+    'attack_msg_type_illuminating', 'image_msg_type_illuminating', 'cta_msg_type_illuminating',
+    'engagement_cta_subtype_illuminating', 'fundraising_cta_subtype_illuminating', 'voting_cta_subtype_illuminating',
+    'covid_topic_illuminating', 'economy_topic_illuminating', 'education_topic_illuminating',
+    'environment_topic_illuminating', 'foreign_policy_topic_illuminating', 'governance_topic_illuminating',
+    'health_topic_illuminating', 'immigration_topic_illuminating', 'lgbtq_issues_topic_illuminating',
+    'military_topic_illuminating', 'race_and_ethnicity_topic_illuminating', 'safety_topic_illuminating',
+    'social_and_cultural_topic_illuminating', 'technology_and_privacy_topic_illuminating',
+    'womens_issue_topic_illuminating', 'incivility_illuminating', 'scam_illuminating', 'freefair_illuminating',
+    'fraud_illuminating'
+]
+
+FB_ADS_COLUMNS = ['page_id', 'ad_id', 'ad_creation_time', 'bylines', 'currency', 'delivery_by_region',
+                  'demographic_distribution', 'estimated_audience_size', 'estimated_impressions', 'estimated_spend',
+                  'publisher_platforms', 'illuminating_scored_message', 'illuminating_mentions'] + FLAG_COLUMNS
+
+FB_POSTS_COLUMNS = ['Facebook_Id', 'post_id', 'Page Category', 'Page Admin Top Country', 'Post Created',
+                    'Post Created Date', 'Post Created Time', 'Type', 'Total Interactions', 'Likes', 'Comments',
+                    'Shares', 'Love', 'Wow', 'Haha', 'Sad', 'Angry', 'Care', 'Video Share Status', 'Is Video Owner?',
+                    'Post Views', 'Total Views', 'Total Views For All Crossposts', 'Video Length', 'Sponsor Id',
+                    'Sponsor Name', 'Sponsor Category', 'Overperforming Score', 'illuminating_scored_message'] + FLAG_COLUMNS
+
+TW_POSTS_COLUMNS = ['id', 'url', 'source', 'retweetCount', 'replyCount', 'likeCount', 'quoteCount', 'viewCount',
+                    'createdAt', 'lang', 'bookmarkCount', 'isReply', 'isRetweet', 'isQuote', 'isConversationControlled',
+                    'quoteId', 'inReplyToId', 'month_year', 'illuminating_scored_message'] + FLAG_COLUMNS
+
+
+def _anon_id(label):
+    """64-hex-digit ID shaped like the anonymised IDs of the real datasets"""
+    return hashlib.sha256(label.encode('utf-8')).hexdigest()
+
+def _flags(rng):
+    return [str(rng.choice([0, 0, 0, 1])) for _ in FLAG_COLUMNS]
+
+def fb_ads_rows(rng, rows):
+    """Ads clustered by page_id with a skewed number of ads per page, sorted like the real file"""
+    pages = [_anon_id(f'page{i}') for i in range(60)]
+    messages = [f'Vote now! {i}' for i in range(40)]
+    data = []
+    for i in range(rows):
+        data.append([
+            pages[min(int(rng.expovariate(0.1)), len(pages) - 1)], _anon_id(f'ad{i}'),
+            f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.choice(['Org A', 'Org B', '']),
+            rng.choice(['USD', 'USD', 'EUR']), "{'CA': 0.5}", "[{'age': '18-24'}]",
+            str(rng.choice([1000, 5000, 1000001, 0])), str(rng.choice([499, 3999, 27499, 1000000])),
+            str(rng.choice([49, 249, 1249, 74999])), "['facebook']", rng.choice(messages), "['Trump']"
+        ] + _flags(rng))
+    data.sort(key=lambda row: row[0])
+    return data
+
+def fb_posts_rows(rng, rows):
+    """Posts from about 40 pages in random order, with empty all-null columns and signed floats"""
+    messages = [f'Vote now! {i}' for i in range(40)]
+    data = []
+    for i in range(rows):
+        data.append([
+            _anon_id(f'facebook{rng.randint(0, 40)}'), _anon_id(f'post{i}'), 'POLITICIAN', 'US',
+            '2024-01-01 10:00:00 EST', f'2024-01-{rng.randint(1, 28):02d}', '10:00:00', rng.choice(['Photo', 'Link']),
+            str(rng.randint(0, 5000)), str(rng.randint(0, 3000)), str(rng.randint(0, 500)), str(rng.randint(0, 200)),
+            '1', '2', '3', '4', '5', '6', '', '', str(rng.choice([0, 0, 12000])), '0', '0', '', '', '', '',
+            f'{rng.uniform(-5, 5):.2f}', rng.choice(messages)
+        ] + _flags(rng))
+    return data
+
+def tw_posts_rows(rng, rows):
+    """Tweets from three sources with a heavy-tailed viewCount and a quoted multi-line message"""
+    data = []
+    for i in range(rows):
+        data.append([
+            _anon_id(f'tweet{i}'), f'https://x.com/{i}',
+            rng.choice(['Twitter for iPhone', 'Twitter Web App', 'Twitter for Android']),
+            str(rng.randint(0, 900)), str(rng.randint(0, 90)), str(rng.randint(0, 9000)), str(rng.randint(0, 50)),
+            str(int(rng.paretovariate(1.2) * 1000)), 'Tue Jan 02 2024', 'en', str(rng.randint(0, 40)),
+            rng.choice(['True', 'False']), rng.choice(['True', 'False']), 'False', 'False', '', '', '2024-01',
+            'text "quoted", with\nnewline'
+        ] + _flags(rng))
+    return data
+
+GENERATORS = {
+    'fb_ads': (FB_ADS_COLUMNS, fb_ads_rows),
+    'fb_posts': (FB_POSTS_COLUMNS, fb_posts_rows),
+    'tw_posts': (TW_POSTS_COLUMNS, tw_posts_rows)
+}
+
+def write_synthetic_datasets(data_dir, rows=DEFAULT_ROWS, seed=DEFAULT_SEED, datasets=None):
+    """Write small synthetic CSVs with the real datasets' names and columns into data_dir
+
+    The values are random but deterministic for a seed, so every engine can be
+    run on them in seconds and compared run to run. Returns the paths written.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    paths = []
+    for name in datasets or list(DATASETS):
+        columns, generate = GENERATORS[name]
+        path = dataset_path(name, data_dir)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            writer.writerows(generate(random.Random(f'{seed}:{name}'), rows))
+        paths.append(path)
+    return paths
+
+def main():
+    """Write the synthetic datasets"""
+    parser = argparse.ArgumentParser(description="Write small synthetic versions of the election datasets")
+    parser.add_argument('--data-dir', default='.', help="Directory to write the CSVs to")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="Rows per dataset")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS), default=list(DATASETS))
+    args = parser.parse_args()
+
+    for path in write_synthetic_datasets(args.data_dir, args.rows, args.seed, args.datasets):
+        print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
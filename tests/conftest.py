@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The engines import their sibling modules by name, as when run from their directories
+for directory in (REPO_ROOT, os.path.join(REPO_ROOT, 'PurePythonStats'), os.path.join(REPO_ROOT, 'PandasStats')):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+from synthetic_datasets import write_synthetic_datasets
+
+
+@pytest.fixture(scope='session')
+def synthetic_dir(tmp_path_factory):
+    """Directory holding the synthetic datasets, written once per test session"""
+    data_dir = str(tmp_path_factory.mktemp('datasets'))
+    write_synthetic_datasets(data_dir)
+    return data_dir
+
+@pytest.fixture
+def data_dir(synthetic_dir, tmp_path, monkeypatch):
+    """A private copy of the synthetic datasets, also the working directory the scripts write results to"""
+    for name in os.listdir(synthetic_dir):
+        source = os.path.join(synthetic_dir, name)
+        if os.path.isfile(source):
+            with open(source, 'rb') as src, open(tmp_path / name, 'wb') as dst:
+                dst.write(src.read())
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path)
@@ -0,0 +1,30 @@
+import copy
+import random
+
+from bit_columns import group_true_shares, pack_boolean_columns
+
+HEADERS = ['page', 'flag', 'label', 'text']
+
+
+def make_rows(rows=1000):
+    rng = random.Random(4)
+    return [[f'p{rng.randrange(7)}', rng.choice(['0', '1', '']), rng.choice(['True', 'False']), rng.choice(['a', 'b', 'c'])]
+            for _ in range(rows)]
+
+def test_packing_leaves_the_rows_unchanged():
+    rows = make_rows()
+    before = copy.deepcopy(rows)
+    packed = pack_boolean_columns(HEADERS, rows)
+    assert sorted(packed) == ['flag', 'label']
+    assert rows == before
+
+def test_group_true_shares_match_counting_the_cells():
+    rows = make_rows()
+    shares = group_true_shares(pack_boolean_columns(HEADERS, rows), rows, HEADERS, ['page'])
+    for column, true_label in [('flag', '1'), ('label', 'True')]:
+        i = HEADERS.index(column)
+        groups = {}
+        for row in rows:
+            if row[i]:
+                groups.setdefault(row[0], []).append(row[i] == true_label)
+        assert shares[column] == [sum(flags) / len(flags) for flags in groups.values()]
@@ -0,0 +1,43 @@
+import pytest
+
+from dataset_query import ENGINES, run_query
+
+
+def _rounded(rows):
+    return [{key: round(value, 6) if isinstance(value, float) else value for key, value in row.items()}
+            for row in rows]
+
+def _all_engines(data_dir, dataset, **query):
+    results = {engine: _rounded(run_query(dataset, engine=engine, data_dir=data_dir, **query)[0])
+               for engine in ENGINES}
+    return results
+
+@pytest.mark.parametrize('literal', ['True', 'False'])
+def test_bool_column_filter_matches_across_engines(data_dir, literal):
+    results = _all_engines(data_dir, 'tw_posts', where=[f'isReply=={literal}'], group_by=['source'],
+                           aggregations={'likeCount': ['count', 'sum']})
+    assert results['csv']
+    assert results['parquet'] == results['csv']
+    assert results['polars'] == results['csv']
+
+def test_bool_column_rejects_other_literals(data_dir):
+    with pytest.raises(ValueError):
+        run_query('tw_posts', where=['isReply==yes'], engine='parquet', data_dir=data_dir)
+
+def test_empty_text_cells_are_null_on_every_engine(data_dir):
+    results = _all_engines(data_dir, 'fb_ads', aggregations={'bylines': ['count', 'nunique']})
+    assert results['csv'][0]['bylines_nunique'] == 2
+    assert results['parquet'] == results['csv']
+    assert results['polars'] == results['csv']
+
+def test_numeric_filter_and_group_by_match_across_engines(data_dir):
+    results = _all_engines(data_dir, 'fb_ads', where=['estimated_spend>=1000'], group_by=['currency'],
+                           aggregations={'estimated_impressions': ['count', 'mean', 'median', 'min', 'max']})
+    assert results['parquet'] == results['csv']
+    assert results['polars'] == results['csv']
+
+@pytest.mark.parametrize('where', ['bylines==Org A', 'bylines!=Org A', 'bylines==', 'bylines!=', 'bylines>'])
+def test_nullable_text_comparisons_match_across_engines(data_dir, where):
+    results = _all_engines(data_dir, 'fb_ads', where=[where], aggregations={'estimated_spend': ['count', 'sum']})
+    assert results['parquet'] == results['csv']
+    assert results['polars'] == results['csv']
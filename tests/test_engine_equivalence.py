@@ -0,0 +1,8 @@
+from dataset_configs import DATASETS, ENGINES
+from engine_equivalence import check_equivalence, run_engines
+
+
+def test_engines_produce_equivalent_results(data_dir):
+    datasets, engines = list(DATASETS), list(ENGINES)
+    assert run_engines(datasets, engines, data_dir, jobs=4) == []
+    assert check_equivalence(datasets, engines, data_dir) == 0
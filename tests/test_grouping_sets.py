@@ -0,0 +1,67 @@
+import random
+import statistics
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from grouping_sets import RunningStats, compute_grouping_sets
+from leaderboards import Leaderboards
+from pandas_grouping_sets import grouping_sets_agg, grouping_sets_describe
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(3)
+    rows = 5000
+    df = pd.DataFrame({'page': rng.integers(0, 20, rows), 'ad': rng.integers(0, 40, rows),
+                       # A large mean with a small spread cancels catastrophically in sum-of-squares variance
+                       'spend': 1e9 + rng.normal(0, 1, rows), 'views': rng.integers(0, 100, rows).astype(float)})
+    df.loc[rng.random(rows) < 0.1, 'views'] = np.nan
+    return df
+
+@pytest.mark.parametrize('keys', [('page', 'ad'), ('page',)])
+def test_grouping_set_std_matches_groupby(frame, keys):
+    results = grouping_sets_agg(frame, [('page', 'ad'), ('page',)], ['spend', 'views'])
+    expected = frame.groupby(list(keys))[['spend', 'views']].agg(['count', 'mean', 'std', 'min', 'max'])
+    pd.testing.assert_frame_equal(results[keys], expected, check_exact=False, rtol=1e-6, check_dtype=False)
+
+def test_single_row_groups_have_no_std(frame):
+    results = grouping_sets_agg(frame.head(1), [('page', 'ad'), ('page',)], ['spend'])
+    assert results[('page',)][('spend', 'std')].isna().all()
+    assert results[('page',)][('spend', 'count')].iloc[0] == 1
+
+def test_describe_with_unique_key_matches_groupby(frame):
+    frame = frame.assign(ad_id=np.arange(len(frame)).astype(str), kind=np.where(frame['ad'] % 2, 'a', 'b'))
+    results = grouping_sets_describe(frame, [('page', 'ad_id'), ('page',)], ['spend'], ['kind'], unique_key=['ad_id'])
+    expected = frame.groupby('page').agg({'spend': ['count', 'mean', 'median', 'std', 'min', 'max'],
+                                          'kind': ['count', 'nunique']})
+    pd.testing.assert_frame_equal(results[('page',)], expected, check_exact=False, rtol=1e-6, check_dtype=False)
+    assert len(results[('page', 'ad_id')]) == len(frame)
+
+@pytest.fixture
+def large_mean_rows():
+    rng = random.Random(9)
+    return [[str(rng.randrange(5)), str(i), repr(1e9 + rng.gauss(0, 1))] for i in range(5000)]
+
+def test_pure_rollup_std_matches_stdev(large_mean_rows):
+    results = compute_grouping_sets(large_mean_rows, ['page', 'ad', 'spend'], [['page', 'ad'], ['page']], ['spend'])
+    for key, stats in results[('page',)].items():
+        values = [float(row[2]) for row in large_mean_rows if (row[0],) == key]
+        assert stats.columns['spend'].std == pytest.approx(statistics.stdev(values), rel=1e-12)
+
+def test_merged_std_matches_single_pass(large_mean_rows):
+    values = [float(row[2]) for row in large_mean_rows]
+    whole, left, right = RunningStats(), RunningStats(), RunningStats()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 3 else right).add(value)
+    left.merge(right)
+    assert left.std == whole.std == pytest.approx(statistics.stdev(values), rel=1e-12)
+
+def test_std_leaderboard_ranks_exact_std(large_mean_rows):
+    results = compute_grouping_sets(large_mean_rows, ['page', 'ad', 'spend'], [['page']], ['spend'])
+    board = results[('page',)].leaderboards(Leaderboards([('std', 'spend')], size=5)).boards[('std', 'spend')]
+    for key, std in board.top():
+        values = [float(row[2]) for row in large_mean_rows if (row[0],) == key]
+        assert std == pytest.approx(statistics.stdev(values), rel=1e-12)
@@ -0,0 +1,39 @@
+import pickle
+
+import pytest
+
+from histograms import MAX_BINS, Histogram, parse_scheme
+
+
+def test_fine_fixed_bins_only_hold_the_bins_hit():
+    histogram = Histogram(parse_scheme('fixed:1'))
+    for value in (1.5, 1e9, -3e8, 0.0, 1e9 + 0.25):
+        histogram.add(value)
+    assert histogram.bin_count() == 3
+    assert len(pickle.dumps(histogram)) < 1024
+    assert [count for _, _, count in histogram.bins()] == [1, 1, 1, 2]
+
+def test_too_many_bins_are_rejected():
+    histogram = Histogram(parse_scheme('fixed:1'))
+    with pytest.raises(ValueError, match='too fine'):
+        for value in range(MAX_BINS + 1):
+            histogram.add(value + 0.5)
+
+@pytest.mark.parametrize('text', ['fixed:0', 'fixed:-5', 'fixed:inf', 'fixed:nan', 'fixed', 'log:0', 'hdr:9'])
+def test_bad_schemes_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_scheme(text)
+
+def test_merge_is_order_independent():
+    values = [(-1) ** i * (i * 37 % 1000) * 1.7 for i in range(500)]
+    whole = Histogram(parse_scheme('hdr:2'))
+    for value in values:
+        whole.add(value)
+    parts = [Histogram(parse_scheme('hdr:2')) for _ in range(3)]
+    for i, value in enumerate(values):
+        parts[i % 3].add(value)
+    merged = parts[2].copy()
+    merged.merge(parts[0])
+    merged.merge(parts[1])
+    assert merged.bins() == whole.bins()
+    assert merged.quantile(0.5) == whole.quantile(0.5)
@@ -0,0 +1,51 @@
+import csv
+import os
+
+from dataset_configs import dataset_path
+from id_index import lookup_rows, update_id_index
+
+DATASET = 'fb_ads'
+
+
+def read_table(data_dir):
+    with open(dataset_path(DATASET, data_dir), newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    return rows[0], rows[1:]
+
+def write_table(data_dir, headers, rows, mode='w'):
+    with open(dataset_path(DATASET, data_dir), mode, newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if mode == 'w':
+            writer.writerow(headers)
+        writer.writerows(rows)
+
+def test_lookup_matches_a_scan_and_is_then_current(data_dir):
+    headers, rows = read_table(data_dir)
+    ad_id = rows[10][headers.index('ad_id')]
+    assert update_id_index(DATASET, data_dir)['mode'] == 'build'
+    assert [row['ad_id'] for row in lookup_rows(DATASET, 'ad_id', ad_id, data_dir)] == [ad_id]
+    assert update_id_index(DATASET, data_dir)['mode'] == 'current'
+
+def test_appended_rows_extend_the_index(data_dir):
+    headers, rows = read_table(data_dir)
+    update_id_index(DATASET, data_dir)
+    extra = [list(rows[0])]
+    extra[0][headers.index('ad_id')] = 'appended-ad'
+    write_table(data_dir, headers, extra, mode='a')
+    assert update_id_index(DATASET, data_dir)['mode'] == 'append'
+    assert len(lookup_rows(DATASET, 'ad_id', 'appended-ad', data_dir)) == 1
+
+def test_same_size_rewrite_is_detected(data_dir):
+    headers, rows = read_table(data_dir)
+    update_id_index(DATASET, data_dir)
+    # Swap two early rows: same size, same tail, but every offset of theirs moved
+    ad = headers.index('ad_id')
+    first, second = rows[0][ad], rows[1][ad]
+    rows[0][ad], rows[1][ad] = second, first
+    path = dataset_path(DATASET, data_dir)
+    stat = os.stat(path)
+    write_table(data_dir, headers, rows)
+    # Even with the old modification time restored, reading back catches the stale offsets
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert [row['ad_id'] for row in lookup_rows(DATASET, 'ad_id', first, data_dir)] == [first]
+    assert update_id_index(DATASET, data_dir)['mode'] == 'current'
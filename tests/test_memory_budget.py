@@ -0,0 +1,65 @@
+import os
+import random
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+import memory_budget
+from column_profiles import SpaceSaving
+from memory_budget import MIN_SPILL_MB, SPILL_FLOOR_MB, groupby_spill_mb
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PurePythonStats',
+                      'pure_python_stats_fb_ads.py')
+
+
+class FixedBudget:
+    """The parts of MemoryBudget groupby_spill_mb uses, with a set headroom"""
+
+    def __init__(self, headroom):
+        self.headroom = headroom
+        self.downgrades = []
+
+    def headroom_mb(self):
+        return self.headroom
+
+    def downgrade(self, stage, change, reason):
+        self.downgrades.append((stage, change, reason))
+
+@pytest.mark.parametrize('headroom', [2.0, MIN_SPILL_MB, 100.0])
+def test_spill_budget_never_exceeds_headroom(monkeypatch, headroom):
+    monkeypatch.setattr(memory_budget, 'estimate_groups_mb', lambda groups, key, values: 1e6)
+    spill_mb = groupby_spill_mb(FixedBudget(headroom), [['a', 'b']], ['page', 'ad'], ['page', 'ad'], 2)
+    assert spill_mb <= headroom
+    assert spill_mb == min(headroom, max(MIN_SPILL_MB, headroom / 2))
+
+@pytest.mark.parametrize('headroom', [-3.0, 0.0, 0.1])
+def test_spent_budget_still_spills(monkeypatch, headroom):
+    monkeypatch.setattr(memory_budget, 'estimate_groups_mb', lambda groups, key, values: 1e6)
+    budget = FixedBudget(headroom)
+    assert groupby_spill_mb(budget, [['a', 'b']], ['page', 'ad'], ['page', 'ad'], 2) == SPILL_FLOOR_MB
+    assert budget.downgrades
+
+def test_zero_headroom_run_takes_the_spill_path(data_dir):
+    run = subprocess.run([sys.executable, SCRIPT, '--memory-limit', '5', '--no-cache'], cwd=data_dir, check=True,
+                         capture_output=True, text=True)
+    assert "in-memory hash -> spilling partitions" in run.stdout
+    assert "Spill aggregation:" in run.stdout
+
+def test_hash_group_by_kept_when_it_fits(monkeypatch):
+    monkeypatch.setattr(memory_budget, 'estimate_groups_mb', lambda groups, key, values: 1.0)
+    assert groupby_spill_mb(FixedBudget(50.0), [['a', 'b']], ['page', 'ad'], ['page', 'ad'], 2) is None
+
+def test_space_saving_reports_lower_bounds():
+    rng = random.Random(5)
+    values = [f'v{min(int(rng.paretovariate(1.1)), 500)}' for _ in range(20000)]
+    top = SpaceSaving(capacity=20)
+    for value in values:
+        top.add(value)
+    truth = Counter(values)
+    reported = top.most_common(10)
+    assert reported[0][0] == truth.most_common(1)[0][0]
+    for value, count in reported:
+        assert count <= truth[value]
+        assert top.counts[value] >= truth[value]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from message_pool import MessagePool, distinct_per_group
+from pandas_message_pool import pool_messages
+
+
+def frame():
+    return pd.DataFrame({'page_id': ['p1', 'p1', 'p2', 'p2', 'p3'],
+                         'ad_creative_body': ['Vote now', 'Donate', None, 'Vote now', 'Donate']})
+
+def test_pooled_column_keeps_values_and_tie_order():
+    df = frame()
+    original = df['ad_creative_body'].copy()
+    assert pool_messages(df, 'ad_creative_body')
+    assert list(df['ad_creative_body'].cat.categories) == ['Vote now', 'Donate']
+    assert df['ad_creative_body'].astype(object).equals(original)
+    pd.testing.assert_series_equal(df['ad_creative_body'].value_counts().astype('int64'),
+                                   original.value_counts().astype('int64'), check_index_type=False,
+                                   check_categorical=False)
+
+def test_hash_collisions_fall_back_to_the_text(monkeypatch):
+    # Every body hashes alike, as if all of them collided
+    monkeypatch.setattr(pd.util, 'hash_array', lambda values, categorize=False: np.zeros(len(values), dtype=np.uint64))
+    df = frame()
+    assert pool_messages(df, 'ad_creative_body')
+    assert list(df['ad_creative_body'].cat.categories) == ['Vote now', 'Donate']
+    assert df['ad_creative_body'].astype(object).equals(frame()['ad_creative_body'])
+
+def test_pure_pool_counts_distinct_messages_per_group():
+    df = frame().fillna('')
+    rows = df.values.tolist()
+    pool = MessagePool()
+    for row in rows:
+        row[1] = pool.add(row[1])
+    assert len(pool) == 2
+    assert pool.message_rows() == 4
+    assert distinct_per_group(pool, rows, list(df.columns), ['page_id']) == [(('p1',), 2), (('p2',), 1), (('p3',), 1)]
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from pandas_output_formats import save_frame
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def mixed_frame():
+    # most_frequent holds the top value of every categorical column, whatever its type
+    return pd.DataFrame({'column': ['isReply', 'lang', 'bylines'], 'most_frequent': [True, 'en', None],
+                         'unique_count': [2, 5, 0]})
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_mixed_object_columns_are_written_as_text(tmp_path, monkeypatch, mixed_frame, output_format):
+    monkeypatch.chdir(tmp_path)
+    path = save_frame(mixed_frame, 'categorical', output_format, index=False)
+    read = pd.read_parquet(path) if output_format == 'parquet' else pd.read_feather(path)
+    assert read['most_frequent'].tolist() == ['True', 'en', None]
+    assert read['unique_count'].tolist() == [2, 5, 0]
+
+def test_mixed_index_is_written_as_text(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    frame = pd.DataFrame({'count': [3, 4]}, index=pd.Index([True, 'Org A'], name='bylines'))
+    read = pd.read_parquet(save_frame(frame, 'grouped', 'parquet'))
+    assert read.index.tolist() == ['True', 'Org A']
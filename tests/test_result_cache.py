@@ -0,0 +1,54 @@
+import csv
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PurePythonStats',
+                      'pure_python_stats_fb_ads.py')
+RESULTS = 'fb_ads_analysis_results.csv'
+
+
+def run_script(data_dir, *args):
+    subprocess.run([sys.executable, SCRIPT, '--cache-dir', os.path.join(data_dir, 'cache'), *args],
+                   cwd=data_dir, check=True, capture_output=True)
+    with open(os.path.join(data_dir, RESULTS), newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def flag_share_rows(rows):
+    return [row for row in rows if row['metric'].startswith('group_true_share')]
+
+def test_cached_run_matches_fresh_run(data_dir):
+    fresh = run_script(data_dir, '--no-cache')
+    assert run_script(data_dir) == fresh
+    # The second cached run replays every stage
+    assert run_script(data_dir) == fresh
+
+def test_cache_invalidated_when_input_changes(data_dir):
+    before = run_script(data_dir)
+    path = os.path.join(data_dir, '2024_fb_ads_president_scored_anon.csv')
+    with open(path, newline='', encoding='utf-8') as file:
+        lines = file.readlines()
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        file.writelines(lines[:len(lines) // 2])
+    after = run_script(data_dir)
+    assert after == run_script(data_dir, '--no-cache')
+    assert after != before
+
+def test_unavailable_flag_shares_are_not_replayed(data_dir):
+    assert not flag_share_rows(run_script(data_dir, '--flag-shares', '--pipeline'))
+    in_memory = flag_share_rows(run_script(data_dir, '--flag-shares'))
+    assert in_memory
+    assert in_memory == flag_share_rows(run_script(data_dir, '--flag-shares', '--no-cache'))
+
+def test_disabled_cache_never_hashes_the_input(data_dir, monkeypatch):
+    import pure_python_stats_fb_ads
+    from result_cache import ResultCache
+
+    def fingerprint(self, path):
+        raise AssertionError("fingerprint computed with the cache disabled")
+
+    monkeypatch.setattr(ResultCache, 'fingerprint', fingerprint)
+    monkeypatch.setattr(sys, 'argv', [SCRIPT, '--no-cache'])
+    monkeypatch.setattr(pure_python_stats_fb_ads, 'output_data', [])
+    pure_python_stats_fb_ads.main()
+    assert os.path.exists(os.path.join(data_dir, RESULTS))
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from grouping_sets import compute_grouping_sets
+from histograms import parse_scheme
+from leaderboards import Leaderboards
+from sorted_groupby import external_sort, ordered_grouping_sets
+from synthetic_datasets import FB_ADS_COLUMNS, fb_ads_rows
+
+KEY_SETS = [['page_id', 'ad_id'], ['page_id']]
+VALUES = ['estimated_spend', 'estimated_impressions']
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rows = fb_ads_rows(random.Random(7), 2000)
+    random.Random(3).shuffle(rows)
+    return rows
+
+def summary(grouping, template):
+    boards = grouping.leaderboards(template).boards
+    return {
+        'sizes': grouping.sizes(),
+        'largest': grouping.largest(5),
+        'means': {col: grouping.means(col) for col in VALUES},
+        'histograms': {col: [(key, histogram.compact()) for key, histogram in grouping.histograms(col)]
+                       for col in VALUES},
+        'leaderboards': {metric: (board.top(), board.bottom()) for metric, board in boards.items()}
+    }
+
+def test_external_sort_numbers_rows_in_input_order(rows, tmp_path):
+    page = [FB_ADS_COLUMNS.index('page_id')]
+    numbered = list(external_sort(rows, page, run_size=300, temp_dir=str(tmp_path), numbered=True))
+    assert sorted(numbered) == sorted(enumerate(rows))
+    assert [row for _, row in numbered] == list(external_sort(rows, page, run_size=300, temp_dir=str(tmp_path)))
+
+def test_unsorted_input_matches_hash_grouping_sets(rows, tmp_path):
+    histograms = {col: parse_scheme('log:10') for col in VALUES}
+    template = Leaderboards([('size', None), ('sum', 'estimated_spend')], size=3)
+    hashed = compute_grouping_sets(rows, FB_ADS_COLUMNS, KEY_SETS, VALUES, histograms=histograms)
+    # Runs far smaller than the input make the sort merge several files from disk
+    streamed = ordered_grouping_sets(rows, FB_ADS_COLUMNS, KEY_SETS, VALUES, ['page_id'], order='unsorted',
+                                     run_size=300, temp_dir=str(tmp_path), histograms=histograms,
+                                     leaderboards=template)
+    for key_set in KEY_SETS:
+        assert summary(streamed[tuple(key_set)], template) == summary(hashed[tuple(key_set)], template)
@@ -0,0 +1,65 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from grouping_sets import compute_grouping_sets
+from histograms import parse_scheme
+from spill_aggregation import SpillingAggregator, spill_grouping_sets
+from synthetic_datasets import FB_ADS_COLUMNS, fb_ads_rows
+
+KEY_SETS = [['page_id', 'ad_id'], ['page_id']]
+VALUES = ['estimated_spend', 'estimated_impressions']
+
+
+@pytest.fixture(scope='module')
+def rows():
+    return fb_ads_rows(random.Random(11), 2000)
+
+def summary(grouping):
+    return {
+        'sizes': grouping.sizes(),
+        'largest': grouping.largest(5),
+        'means': {col: grouping.means(col) for col in VALUES},
+        'histograms': {col: [(key, histogram.compact()) for key, histogram in grouping.histograms(col)]
+                       for col in VALUES}
+    }
+
+def test_spilled_grouping_sets_match_hash_grouping_sets(rows, tmp_path):
+    histograms = {col: parse_scheme('log:10') for col in VALUES}
+    hashed = compute_grouping_sets(rows, FB_ADS_COLUMNS, KEY_SETS, VALUES, histograms=histograms)
+    # A budget far below the groups' size makes every partition spill
+    spilled = spill_grouping_sets(rows, FB_ADS_COLUMNS, KEY_SETS, VALUES, memory_limit_mb=0.01, num_partitions=4,
+                                  temp_dir=str(tmp_path), histograms=histograms)
+    for key_set in KEY_SETS:
+        assert summary(spilled[tuple(key_set)]) == summary(hashed[tuple(key_set)])
+
+def test_histogram_bins_count_towards_the_budget(rows, tmp_path):
+    index = FB_ADS_COLUMNS.index
+    value_indices = [(col, index(col)) for col in VALUES]
+    plain = SpillingAggregator([index('page_id')], [index('page_id')], value_indices, temp_dir=str(tmp_path))
+    binned = SpillingAggregator([index('page_id')], [index('page_id')], value_indices, temp_dir=str(tmp_path),
+                                histograms={col: parse_scheme('fixed:1') for col in VALUES})
+    try:
+        for row in rows:
+            plain.add_row(row)
+            binned.add_row(row)
+        assert binned.memory_used > plain.memory_used
+    finally:
+        plain.cleanup()
+        binned.cleanup()
+
+def test_spilling_needs_a_partition(tmp_path):
+    with pytest.raises(ValueError):
+        SpillingAggregator([0], [0], [('estimated_spend', 1)], num_partitions=0, temp_dir=str(tmp_path))
+
+@pytest.mark.parametrize('option', [['--spill-partitions', '0'], ['--spill-partitions', '-2'],
+                                    ['--groupby-memory-mb', '0']])
+def test_scripts_reject_bad_spill_settings(data_dir, option):
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PurePythonStats',
+                          'pure_python_stats_fb_ads.py')
+    run = subprocess.run([sys.executable, script, '--no-cache', *option], cwd=data_dir, capture_output=True, text=True)
+    assert run.returncode == 2
+    assert option[0] in run.stderr
@@ -0,0 +1,49 @@
+import asyncio
+import csv
+import json
+import threading
+
+from dataset_configs import dataset_path
+from stats_query_service import StatsQueryService, start_service
+
+
+async def fetch(port, target):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def serve_one(service, target):
+    async def run():
+        server, _ = await start_service(service, '127.0.0.1', 0, 0)
+        try:
+            return await fetch(server.sockets[0].getsockname()[1], target)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+def test_dataset_rows_are_read_off_the_event_loop(data_dir, tmp_path):
+    with open(dataset_path('fb_ads', data_dir), newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    ad_id = rows[5]['ad_id']
+    service = StatsQueryService(str(tmp_path / 'no_results'), tables={}, data_dir=data_dir)
+    threads = []
+    lookup = service.dataset_rows
+
+    def recording_lookup(*args):
+        threads.append(threading.current_thread())
+        return lookup(*args)
+
+    service.dataset_rows = recording_lookup
+    status, payload = serve_one(service, f'/datasets/fb_ads/rows/ad_id/{ad_id}')
+    assert status == 200
+    assert [row['ad_id'] for row in payload['rows']] == [ad_id]
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_unknown_dataset_is_not_found(data_dir, tmp_path):
+    service = StatsQueryService(str(tmp_path / 'no_results'), tables={}, data_dir=data_dir)
+    assert serve_one(service, '/datasets/nope/rows/ad_id/1')[0] == 404
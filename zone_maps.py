@@ -0,0 +1,227 @@
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+
+from dataset_configs import DATASETS, cache_dir, dataset_config, dataset_path
+
+# Rows per Parquet row group, and so per zone map block
+DEFAULT_BLOCK_SIZE = 16384
+
+# Bloom filter sizing: bits per distinct value and hash functions (about 1% false positives)
+BLOOM_BITS_PER_VALUE = 10
+BLOOM_HASHES = 7
+
+# Bumped whenever read_source_table reads the CSV differently, so older caches are rebuilt
+ZONE_MAP_VERSION = 2
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, stable across processes (blake2b, not hash())"""
+
+    def __init__(self, num_bits, num_hashes=BLOOM_HASHES, bits=None):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+
+    @classmethod
+    def for_values(cls, values):
+        """Size a filter for the distinct non-null values and add them"""
+        distinct = set(str(value) for value in values if value is not None)
+        bloom = cls(len(distinct) * BLOOM_BITS_PER_VALUE)
+        for value in distinct:
+            bloom.add(value)
+        return bloom
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        # Kirsch-Mitzenmacher double hashing
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def to_dict(self):
+        return {'num_bits': self.num_bits, 'num_hashes': self.num_hashes,
+                'bits': base64.b64encode(bytes(self.bits)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['num_bits'], data['num_hashes'], bytearray(base64.b64decode(data['bits'])))
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The block cache needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+def _json_value(value):
+    """Zone map bounds as JSON scalars; dates and timestamps become ISO strings"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def block_cache_paths(dataset, data_dir='.'):
+    """(parquet path, zone map path) of a dataset's block cache"""
+    directory = cache_dir(data_dir)
+    return (os.path.join(directory, f'{dataset}.parquet'),
+            os.path.join(directory, f'{dataset}.zonemap.json'))
+
+def read_source_table(dataset, data_dir='.'):
+    """Read a dataset CSV with pyarrow, keeping ID and date columns as strings
+
+    The whole file is one read block so column types are inferred from every
+    row rather than the first few thousand. Keeping IDs and dates as text,
+    and empty cells of text columns as nulls, makes filters and aggregates
+    see them exactly as the CSV engine does.
+    """
+    pa = _require_pyarrow()
+    config = dataset_config(dataset)
+    source = dataset_path(dataset, data_dir)
+    text_columns = config['id_columns'] + config['date_columns']
+    return pa.csv.read_csv(
+        source,
+        read_options=pa.csv.ReadOptions(block_size=os.stat(source).st_size + 1),
+        parse_options=pa.csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa.csv.ConvertOptions(column_types={col: pa.string() for col in text_columns},
+                                              strings_can_be_null=True))
+
+def column_zone(pa, column):
+    """min/max/null count of one column chunk"""
+    nulls = column.null_count
+    if nulls == len(column) or not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                                     or pa.types.is_string(column.type) or pa.types.is_temporal(column.type)
+                                     or pa.types.is_boolean(column.type)):
+        return {'min': None, 'max': None, 'nulls': nulls}
+    bounds = pa.compute.min_max(column)
+    return {'min': _json_value(bounds['min'].as_py()), 'max': _json_value(bounds['max'].as_py()), 'nulls': nulls}
+
+def build_block_cache(dataset, data_dir='.', block_size=DEFAULT_BLOCK_SIZE, bloom=True, refresh=False):
+    """Write the dataset as Parquet row groups of block_size rows plus a zone map
+
+    The zone map (JSON beside the Parquet file) holds per-block min, max and
+    null count for every column, and bloom filters for the dataset's
+    bloom_columns when bloom is set. The cache is rebuilt when the CSV is newer,
+    the block size or bloom setting changes, or the cache predates the current
+    ZONE_MAP_VERSION. Returns the loaded zone map.
+    """
+    pa = _require_pyarrow()
+    source = dataset_path(dataset, data_dir)
+    parquet_path, zone_map_path = block_cache_paths(dataset, data_dir)
+    if not refresh and os.path.exists(parquet_path) and os.path.exists(zone_map_path):
+        zone_map = load_zone_map(dataset, data_dir)
+        if (zone_map.get('version') == ZONE_MAP_VERSION
+                and zone_map['block_size'] == block_size and zone_map['bloom'] == bloom
+                and zone_map['source_mtime'] >= os.stat(source).st_mtime):
+            return zone_map
+
+    table = read_source_table(dataset, data_dir)
+    bloom_columns = [col for col in dataset_config(dataset).get('bloom_columns', []) if col in table.column_names] if bloom else []
+    blocks = []
+    for offset in range(0, table.num_rows, block_size):
+        block = table.slice(offset, block_size)
+        blocks.append({
+            'rows': block.num_rows,
+            'columns': {name: column_zone(pa, block.column(name)) for name in table.column_names},
+            'bloom': {name: BloomFilter.for_values(block.column(name).to_pylist()).to_dict() for name in bloom_columns}
+        })
+
+    pa.parquet.write_table(table, parquet_path, row_group_size=block_size, compression='zstd')
+    zone_map = {
+        'dataset': dataset,
+        'version': ZONE_MAP_VERSION,
+        'source_mtime': os.stat(source).st_mtime,
+        'num_rows': table.num_rows,
+        'block_size': block_size,
+        'bloom': bloom,
+        'blocks': blocks
+    }
+    with open(zone_map_path, 'w', encoding='utf-8') as file:
+        json.dump(zone_map, file)
+    print(f"Cached {source} as {parquet_path}: {len(blocks)} blocks of {block_size} rows, "
+          f"bloom filters on {bloom_columns or 'no columns'}")
+    return zone_map
+
+def load_zone_map(dataset, data_dir='.'):
+    with open(block_cache_paths(dataset, data_dir)[1], 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _zone_excludes(zone, rows, operator, expected):
+    """True when no value within [min, max] (plus nulls) can satisfy the predicate"""
+    lowest, highest, nulls = zone['min'], zone['max'], zone['nulls']
+    if operator == '!=':
+        return nulls == 0 and lowest is not None and lowest == highest == expected
+    if expected is None:
+        return operator == '==' and nulls == 0
+    if nulls == rows:
+        return True
+    try:
+        if operator == '==':
+            return expected < lowest or expected > highest
+        if operator == '>':
+            return highest <= expected
+        if operator == '>=':
+            return highest < expected
+        if operator == '<':
+            return lowest >= expected
+        if operator == '<=':
+            return lowest > expected
+    except TypeError:
+        # A literal of another type than the column: let the reader decide
+        return False
+    return False
+
+def block_may_match(block, filters):
+    """False when the block's zone map or bloom filters rule out every row"""
+    for column, operator, expected in filters:
+        zone = block['columns'].get(column)
+        if zone is not None and _zone_excludes(zone, block['rows'], operator, expected):
+            return False
+        bloom = block['bloom'].get(column)
+        if bloom is not None and operator == '==' and expected is not None:
+            if not BloomFilter.from_dict(bloom).might_contain(expected):
+                return False
+    return True
+
+def matching_blocks(zone_map, filters):
+    """Indices of the blocks that may hold rows matching every filter"""
+    return [i for i, block in enumerate(zone_map['blocks']) if block_may_match(block, filters)]
+
+def main():
+    """Build a dataset's block cache and zone map, optionally testing filters against it"""
+    parser = argparse.ArgumentParser(description="Build the zone-mapped Parquet block cache for a dataset")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--data-dir', default='.', help="Directory holding the dataset CSVs")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help="Rows per block")
+    parser.add_argument('--no-bloom', action='store_true', help="Skip bloom filters on the ID columns")
+    parser.add_argument('--refresh', action='store_true', help="Rebuild even if the cache is current")
+    parser.add_argument('--where', action='append', default=[], help="Report blocks that may match these predicates")
+    args = parser.parse_args()
+
+    zone_map = build_block_cache(args.dataset, args.data_dir, args.block_size, not args.no_bloom, args.refresh)
+    print(f"{zone_map['num_rows']} rows in {len(zone_map['blocks'])} blocks of {zone_map['block_size']}")
+    if args.where:
+        from stats_query_service import parse_filter
+        kept = matching_blocks(zone_map, [parse_filter(text) for text in args.where])
+        print(f"Blocks that may match: {len(kept)}, skipped: {len(zone_map['blocks']) - len(kept)}")
+
+if __name__ == "__main__":
+    main()